@@ -1,35 +1,34 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Request, Query
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from fastapi.responses import StreamingResponse
-from jose import JWTError, jwt
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func, or_
-from typing import List, Optional
+from fastapi.responses import StreamingResponse, Response, JSONResponse
+from sqlalchemy.orm import selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, insert, or_
+from typing import List, Optional, Literal
 from datetime import datetime
-from passlib.context import CryptContext
-from pydantic import BaseModel, EmailStr
-from app.utils.database import get_db
-from app.utils.models import Admin, Student, ReportCard, SubjectScore, TeacherComment, ReadingMaterial, News
-from app.utils.schemas import StudentResponse, AdminResponse, StudentUpdate, DashboardInfo, ReportCardResponse, NewsResponse
-from app.utils.token import create_access_token
-from dotenv import load_dotenv
-from io import BytesIO
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from app.utils.email import send_mail, EMAIL_SENDER
-import os, uuid
-
-
-# Password hashing setup
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-load_dotenv()
-
-JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY')
-ALGORITHM = os.getenv('ALGORITHM')
-ACCESS_TOKEN_EXPIRE_MINUTES = os.getenv('ACCESS_TOKEN_EXPIRE_MINUTES')
+from pydantic import BaseModel, EmailStr, ValidationError
+from app.utils.database import get_db, get_read_db, upsert
+from app.utils.models import Admin, Student, ReportCard, SubjectScore, TeacherComment, ReadingMaterial, News, ClassResult
+from app.utils.schemas import StudentCreate, StudentResponse, AdminResponse, StudentUpdate, DashboardInfo, ReportCardResponse, SubjectScoreResponse, NewsResponse, ClassResultResponse, SearchResult
+from app.utils.token import create_access_token, decode_access_token
+from app.utils.email import send_mail, send_mails, EMAIL_SENDER
+from app.utils.hashing import hash_password, hash_passwords, verify_password
+from app.utils.storage import blob_store
+from app.utils.responses import binary_response, CACHE_PUBLIC_MATERIAL, CACHE_NEWS_IMAGE, CACHE_STUDENT_IMAGE, CACHE_REPORT_CARD, CACHE_IMMUTABLE_IMAGE, CACHE_IMMUTABLE_STUDENT_IMAGE
+from app.utils.thumbnails import save_image, image_response, versioned_url, student_image_url
+from app.utils.report_pdf import build_report_card_data, render_report_card, report_card_cache_key, get_cached_pdf, store_pdf
+from app.utils.report_batches import start_batch, stream_zip, get_batch, batch_info, jobs as report_batch_jobs
+from app.utils.pagination import paginate, split_page, parse_fields, page_response, schema_columns, with_columns, row_dicts, rows_response, MAX_PAGE_SIZE
+from app.utils.principal_cache import get_principal, invalidate_principal
+from app.utils.ranking import refresh_rankings, recompute_class
+from app.utils.broadsheet import read_broadsheet, BroadsheetError
+from app.utils.admissions import allocate_admission_numbers, welcome_email
+from app.utils.dashboard import get_dashboard, invalidate_dashboard
+from app.utils.search import search, invalidate_search_index, SEARCH_TYPES
+from app.utils.news_cache import cached_response, invalidate_news_cache, NEWS_CACHE_MAX_ENTRY_BYTES, NEWS_CACHE_FEED_BYTES
+from app.utils.exports import export_response, ExportFormat
+import asyncio, uuid
+
 
 router = APIRouter(tags=["Admin"])
 
@@ -86,19 +85,30 @@ class TeacherCommentUpdate(BaseModel):
     comment: str
 
 class ReportCardUpdate(BaseModel):
-    term: Optional[str]
-    session: Optional[str]
-    class_name: Optional[str]
-    position_in_class: Optional[int]
-    total_students: Optional[int]
-    attendance: Optional[int]
-    teacher_name: Optional[str]
-    principal_name: Optional[str]
-    teacher_remark: Optional[str]
-    principal_remark: Optional[str]
+    term: Optional[str] = None
+    session: Optional[str] = None
+    class_name: Optional[str] = None
+    position_in_class: Optional[int] = None
+    total_students: Optional[int] = None
+    attendance: Optional[int] = None
+    teacher_name: Optional[str] = None
+    principal_name: Optional[str] = None
+    teacher_remark: Optional[str] = None
+    principal_remark: Optional[str] = None
     subjects: Optional[List[SubjectScoreUpdate]] = []
     comments: Optional[List[TeacherCommentUpdate]] = []
 
+class ClassTerm(BaseModel):
+    class_name: str
+    session: str
+    term: str
+
+class ReportCardBatchCreate(ClassTerm):
+    output: Literal["zip", "pdf"] = "zip"
+
+class StudentEnrollment(BaseModel):
+    students: List[StudentCreate]
+
 class ReadingMaterialCreate(BaseModel):
     title: str
     description: str
@@ -108,40 +118,47 @@ class ReadingMaterialCreate(BaseModel):
     session: str
 
 
+MAX_ENROLLMENT = 1000
+
+MATERIAL_FIELDS = (
+    "id", "title", "description", "subject", "class_assigned",
+    "term", "session", "file_name", "file_type", "upload_date"
+)
+
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="admin/token")
 
 async def get_current_admin(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> Admin:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-        role: str = payload.get("role")
-        if role is None:
-            raise credentials_exception
-    except JWTError:
+    payload = decode_access_token(token)
+    if payload is None:
+        raise credentials_exception
+    username: str = payload.get("sub")
+    if username is None:
+        raise credentials_exception
+    role: str = payload.get("role")
+    if role is None:
         raise credentials_exception
 
-    admin = db.query(Admin).filter(Admin.username == username).first()
+    admin = await get_principal(db, Admin, Admin.username, username)
     if admin is None:
         raise credentials_exception
     return admin
 
 
 @router.post("/admin/reset-password")
-async def reset_admin_password(request: ResetAdminPassword, current_admin: Admin = Depends(get_current_admin), db: Session = Depends(get_db)):
+async def reset_admin_password(request: ResetAdminPassword, current_admin: Admin = Depends(get_current_admin), db: AsyncSession = Depends(get_db)):
         
-    admin = db.query(Admin).filter(Admin.username == request.username).first()
+    admin = await db.scalar(select(Admin).where(Admin.username == request.username))
     if not admin:
-        admin = db.query(Admin).filter(Admin.email == request.username).first()
+        admin = await db.scalar(select(Admin).where(Admin.email == request.username))
     
     if not admin:
         raise HTTPException(
@@ -150,12 +167,13 @@ async def reset_admin_password(request: ResetAdminPassword, current_admin: Admin
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    hashed_password=pwd_context.hash(request.new_password)
+    hashed_password = await hash_password(request.new_password)
 
     admin.hashed_password = hashed_password
 
-    db.commit()
-    db.refresh(admin)
+    await db.commit()
+    await db.refresh(admin)
+    await invalidate_principal(Admin, admin.username)
 
     return { "message": "Password has been updated successfully! You can now login with your new password."}
 
@@ -164,10 +182,10 @@ async def reset_admin_password(request: ResetAdminPassword, current_admin: Admin
 @router.post("/admin/token")
 async def admin_login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     # Find admin by username
-    admin = db.query(Admin).filter(Admin.username == form_data.username).first()
+    admin = await db.scalar(select(Admin).where(Admin.username == form_data.username))
     if not admin:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -182,7 +200,7 @@ async def admin_login(
         )
     
     # Verify password
-    if not pwd_context.verify(form_data.password, admin.hashed_password):
+    if not await verify_password(form_data.password, admin.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -203,11 +221,13 @@ async def admin_login(
 
 
 @router.post("/admin/register", response_model=dict)
-async def register_admin(admin: AdminCreate, db: Session = Depends(get_db)):
+async def register_admin(admin: AdminCreate, db: AsyncSession = Depends(get_db)):
     # Check if username or email already exists
-    existing_admin = db.query(Admin).filter(
-        (Admin.username == admin.username) | (Admin.email == admin.email)
-    ).first()
+    existing_admin = await db.scalar(
+        select(Admin).where(
+            (Admin.username == admin.username) | (Admin.email == admin.email)
+        )
+    )
     
     if existing_admin:
         raise HTTPException(
@@ -220,7 +240,7 @@ async def register_admin(admin: AdminCreate, db: Session = Depends(get_db)):
         username=admin.username.strip(),
         email=admin.email,
         full_name=admin.full_name,
-        hashed_password=pwd_context.hash(admin.password),
+        hashed_password=await hash_password(admin.password),
         role=admin.role,
         is_active=False # New teachers that are registering will have to be confirmed by the admin
     )
@@ -252,11 +272,11 @@ async def register_admin(admin: AdminCreate, db: Session = Depends(get_db)):
     
     try:
         db.add(db_admin)
-        db.commit()
-        db.refresh(db_admin)
+        await db.commit()
+        await db.refresh(db_admin)
         return {"message": f"{admin.role.capitalize()} registered successfully, the school admin has been notified. You'll be able to login once your account is verified."}
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
@@ -266,9 +286,9 @@ async def register_admin(admin: AdminCreate, db: Session = Depends(get_db)):
 async def verify_an_admin(
     request: AdminVerify,
     current_admin: Admin = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    existing_admin = db.query(Admin).filter(Admin.username == request.username).first()
+    existing_admin = await db.scalar(select(Admin).where(Admin.username == request.username))
     
     if existing_admin:
         existing_admin.is_active = True
@@ -278,8 +298,9 @@ async def verify_an_admin(
             detail="Invalid admin username!"
         )
     
-    db.commit()
-    db.refresh(existing_admin)
+    await db.commit()
+    await db.refresh(existing_admin)
+    await invalidate_principal(Admin, existing_admin.username)
 
     return { "message": f"Admin with username {request.username} has been verified successfully!"}
 
@@ -288,10 +309,10 @@ async def verify_an_admin(
 async def create_report_card(
     report_card: ReportCardCreate,
     current_admin: Admin = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     # Verify student exists
-    student = db.query(Student).filter(Student.admission_number == report_card.admission_number).first()
+    student = await db.scalar(select(Student).where(Student.admission_number == report_card.admission_number))
     if not student:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -305,8 +326,6 @@ async def create_report_card(
         term=report_card.term,
         session=report_card.session,
         class_name=report_card.class_name,
-        position_in_class=report_card.position_in_class,
-        total_students=report_card.total_students,
         attendance=report_card.attendance,
         teacher_name=report_card.teacher_name,
         principal_name=report_card.principal_name,
@@ -317,8 +336,8 @@ async def create_report_card(
     
     try:
         db.add(db_report_card)
-        db.commit()
-        db.refresh(db_report_card)
+        await db.commit()
+        await db.refresh(db_report_card)
         
         # Add subject scores
         for subject in report_card.subjects:
@@ -342,25 +361,174 @@ async def create_report_card(
                 comment=comment.comment
             )
             db.add(db_comment)
+
+        # Totals and positions are computed from the subject scores
+        await db.flush()
+        await refresh_rankings(db, db_report_card)
         
-        db.commit()
+        await db.commit()
+        invalidate_dashboard()
         return {"message": "Report card created successfully"}
     except Exception as e:
-        db.rollback()
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+@router.post("/admin/report-cards/import", response_model=dict)
+async def import_report_cards(
+    class_name: str = Form(...),
+    session: str = Form(...),
+    term: str = Form(...),
+    file: UploadFile = File(...),
+    current_admin: Admin = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Creates the report cards of a whole class from a CSV or XLSX broadsheet,
+    see app.utils.broadsheet for the columns. Nothing is written unless
+    every row is valid, otherwise the errors of each row are returned.
+    """
+    try:
+        records = await asyncio.to_thread(lambda: list(read_broadsheet(file.file, file.filename or "")))
+    except BroadsheetError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    if not records:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="The broadsheet has no students"
+        )
+
+    row_errors = {}
+    report_cards = []
+    for row_number, record in records:
+        try:
+            report_cards.append((row_number, ReportCardCreate(
+                **record,
+                class_name=class_name,
+                session=session,
+                term=term,
+                position_in_class=None,
+                total_students=None
+            )))
+        except ValidationError as e:
+            row_errors[row_number] = [
+                f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+                for error in e.errors()
+            ]
+
+    # Check students and existing cards for the whole sheet at once
+    admission_numbers = [report_card.admission_number for _, report_card in report_cards]
+    known_students = set((await db.scalars(
+        select(Student.admission_number).where(Student.admission_number.in_(admission_numbers))
+    )).all())
+    existing_cards = set((await db.scalars(
+        select(ReportCard.student_id).where(
+            ReportCard.class_name == class_name,
+            ReportCard.session == session,
+            ReportCard.term == term,
+            ReportCard.student_id.in_(admission_numbers)
+        )
+    )).all())
+
+    seen = set()
+    for row_number, report_card in report_cards:
+        if report_card.admission_number not in known_students:
+            row_errors.setdefault(row_number, []).append("Student not found")
+        elif report_card.admission_number in existing_cards:
+            row_errors.setdefault(row_number, []).append("Student already has a report card for this term")
+        elif report_card.admission_number in seen:
+            row_errors.setdefault(row_number, []).append("Student appears more than once")
+        seen.add(report_card.admission_number)
+
+    if row_errors:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail={
+                "message": "The broadsheet has errors, nothing was imported",
+                "errors": [
+                    {"row": row_number, "errors": errors}
+                    for row_number, errors in sorted(row_errors.items())
+                ]
+            }
+        )
+
+    card_rows, subject_rows, comment_rows = [], [], []
+    date_generated = datetime.now().date()
+    for _, report_card in report_cards:
+        report_card_id = str(uuid.uuid4())
+        card_rows.append({
+            "id": report_card_id,
+            "student_id": report_card.admission_number,
+            "term": term,
+            "session": session,
+            "class_name": class_name,
+            "attendance": report_card.attendance,
+            "teacher_name": report_card.teacher_name,
+            "principal_name": report_card.principal_name,
+            "teacher_remark": report_card.teacher_remark,
+            "principal_remark": report_card.principal_remark,
+            "date_generated": date_generated,
+            "version": 1,
+        })
+        for subject in report_card.subjects:
+            subject_rows.append({
+                "id": str(uuid.uuid4()),
+                "report_card_id": report_card_id,
+                "subject_name": subject.subject_name,
+                "ca_score": subject.ca_score,
+                "exam_score": subject.exam_score,
+                "total_score": subject.ca_score + subject.exam_score,
+                "grade": subject.grade,
+                "teacher_remark": subject.teacher_remark,
+            })
+        for comment in report_card.comments:
+            comment_rows.append({
+                "report_card_id": report_card_id,
+                "comment_type": comment.comment_type,
+                "comment": comment.comment,
+            })
+
+    try:
+        # One executemany per table, all in a single transaction
+        await db.execute(insert(ReportCard), card_rows)
+        if subject_rows:
+            await db.execute(insert(SubjectScore), subject_rows)
+        if comment_rows:
+            await db.execute(insert(TeacherComment), comment_rows)
+        await recompute_class(db, class_name, session, term)
+
+        await db.commit()
+        invalidate_dashboard()
+    except Exception as e:
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
 
+    return {
+        "message": "Report cards imported successfully",
+        "report_cards": len(card_rows),
+        "subjects": len(subject_rows),
+        "comments": len(comment_rows)
+    }
+
 
 @router.put("/admin/report-cards/{report_card_id}", response_model=dict)
 async def update_report_card(
     report_card_id: str,
     report_card_update: ReportCardUpdate,
     current_admin: Admin = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    db_report_card = db.query(ReportCard).filter(ReportCard.id == report_card_id).first()
+    db_report_card = await db.scalar(select(ReportCard).where(ReportCard.id == report_card_id))
     
     if not db_report_card:
         raise HTTPException(
@@ -368,68 +536,104 @@ async def update_report_card(
             detail="Report card not found"
         )
     
-    # Update simple fields
-    update_fields = report_card_update.model_dump(exclude_unset=True, exclude={"subjects", "comments"})
+    old_class_key = (db_report_card.class_name, db_report_card.session, db_report_card.term)
+
+    # Update simple fields, positions are computed by the ranking engine.
+    # Null means "leave unchanged", as clients send every field
+    update_fields = report_card_update.model_dump(
+        exclude_none=True,
+        exclude={"subjects", "comments", "position_in_class", "total_students"}
+    )
     for field, value in update_fields.items():
         setattr(db_report_card, field, value)
+
+    # A new version invalidates cached renders of this report card
+    db_report_card.version = (db_report_card.version or 1) + 1
     
+    # Load all existing subjects and comments once, then diff in memory
+    existing_subjects = {
+        subject.subject_name: subject
+        for subject in (await db.scalars(
+            select(SubjectScore).where(SubjectScore.report_card_id == report_card_id)
+        )).all()
+    }
+    existing_comments = {
+        comment.comment_type: comment
+        for comment in (await db.scalars(
+            select(TeacherComment).where(TeacherComment.report_card_id == report_card_id)
+        )).all()
+    }
+
+    # Keyed by name so a subject repeated in the request is written once
+    subject_rows = {}
+    for subject_data in report_card_update.subjects or []:
+        existing_subject = existing_subjects.get(subject_data.subject_name)
+        row = {
+            "id": existing_subject.id if existing_subject else str(uuid.uuid4()),
+            "report_card_id": report_card_id,
+            "subject_name": subject_data.subject_name,
+            "ca_score": existing_subject.ca_score if existing_subject else 0,
+            "exam_score": existing_subject.exam_score if existing_subject else 0,
+            "grade": existing_subject.grade if existing_subject else None,
+            "teacher_remark": existing_subject.teacher_remark if existing_subject else None,
+        }
+        # Scores are stored as integers
+        if subject_data.ca_score is not None:
+            row["ca_score"] = round(subject_data.ca_score)
+        if subject_data.exam_score is not None:
+            row["exam_score"] = round(subject_data.exam_score)
+        if subject_data.grade is not None:
+            row["grade"] = subject_data.grade
+        if subject_data.teacher_remark is not None:
+            row["teacher_remark"] = subject_data.teacher_remark
+        row["total_score"] = (row["ca_score"] or 0) + (row["exam_score"] or 0)
+
+        # Skip subjects the update does not change
+        if existing_subject and all(getattr(existing_subject, column) == value for column, value in row.items()):
+            continue
+        subject_rows[subject_data.subject_name] = row
+
+    comment_rows = {}
+    for comment_data in report_card_update.comments or []:
+        existing_comment = existing_comments.get(comment_data.comment_type)
+        if existing_comment and existing_comment.comment == comment_data.comment:
+            continue
+        comment_rows[comment_data.comment_type] = {
+            "report_card_id": report_card_id,
+            "comment_type": comment_data.comment_type,
+            "comment": comment_data.comment,
+        }
+
     try:
-        # Handle subjects
-        if report_card_update.subjects:
-            for subject_data in report_card_update.subjects:
-                existing_subject = db.query(SubjectScore).filter(
-                    SubjectScore.report_card_id == report_card_id,
-                    SubjectScore.subject_name == subject_data.subject_name
-                ).first()
-                
-                if existing_subject:
-                    # Update existing subject
-                    if subject_data.ca_score is not None:
-                        existing_subject.ca_score = subject_data.ca_score
-                    if subject_data.exam_score is not None:
-                        existing_subject.exam_score = subject_data.exam_score
-                    if subject_data.grade is not None:
-                        existing_subject.grade = subject_data.grade
-                    if subject_data.teacher_remark is not None:
-                        existing_subject.teacher_remark = subject_data.teacher_remark
-                    existing_subject.total_score = (existing_subject.ca_score or 0) + (existing_subject.exam_score or 0)
-                else:
-                    # Add new subject
-                    new_subject = SubjectScore(
-                        id=str(uuid.uuid4()),
-                        report_card_id=report_card_id,
-                        subject_name=subject_data.subject_name,
-                        ca_score=subject_data.ca_score or 0,
-                        exam_score=subject_data.exam_score or 0,
-                        total_score=(subject_data.ca_score or 0) + (subject_data.exam_score or 0),
-                        grade=subject_data.grade,
-                        teacher_remark=subject_data.teacher_remark
-                    )
-                    db.add(new_subject)
+        if subject_rows:
+            await db.execute(upsert(
+                db, SubjectScore, list(subject_rows.values()),
+                conflict_columns=["report_card_id", "subject_name"],
+                update_columns=["ca_score", "exam_score", "total_score", "grade", "teacher_remark"]
+            ))
+
+        if comment_rows:
+            await db.execute(upsert(
+                db, TeacherComment, list(comment_rows.values()),
+                conflict_columns=["report_card_id", "comment_type"],
+                update_columns=["comment"]
+            ))
+
+        await db.flush()
+        class_key = (db_report_card.class_name, db_report_card.session, db_report_card.term)
+        if class_key != old_class_key:
+            # The card moved to another class or term, both need ranking again
+            for key in (old_class_key, class_key):
+                if None not in key:
+                    await recompute_class(db, *key)
+        elif subject_rows and None not in class_key:
+            await refresh_rankings(db, db_report_card, subject_rows.keys())
         
-        # Handle comments
-        if report_card_update.comments:
-            for comment_data in report_card_update.comments:
-                existing_comment = db.query(TeacherComment).filter(
-                    TeacherComment.report_card_id == report_card_id,
-                    TeacherComment.comment_type == comment_data.comment_type
-                ).first()
-                
-                if existing_comment:
-                    existing_comment.comment = comment_data.comment
-                else:
-                    new_comment = TeacherComment(
-                        report_card_id=report_card_id,
-                        comment_type=comment_data.comment_type,
-                        comment=comment_data.comment
-                    )
-                    db.add(new_comment)
-        
-        db.commit()
+        await db.commit()
         return {"message": "Report card updated successfully"}
     
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Update failed: {str(e)}"
@@ -439,15 +643,36 @@ async def update_report_card(
 @router.get("/admin/report-cards", response_model=List[ReportCardResponse])
 async def get_all_report_cards(
     current_admin: Admin = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
 ):
-    try:
-        report_cards = db.query(ReportCard)\
-            .options(joinedload(ReportCard.subjects))\
-            .order_by(ReportCard.date_generated.desc())\
-            .all()
+    selected_fields = parse_fields(fields, ReportCardResponse.model_fields)
+    order = [ReportCard.date_generated, ReportCard.id]
+    # Thousands of cards at once, so the page is built from plain rows
+    columns = schema_columns(ReportCard, ReportCardResponse, selected_fields)
+    query, limit = paginate(select(*with_columns(columns, order)), order, cursor, limit)
 
-        return report_cards
+    try:
+        rows, next_cursor = split_page((await db.execute(query)).all(), order, limit)
+        report_cards = row_dicts(rows, columns)
+
+        # Subjects are loaded per page, and only when they are returned
+        if rows and (selected_fields is None or "subjects" in selected_fields):
+            subject_columns = schema_columns(SubjectScore, SubjectScoreResponse)
+            subjects = {row.id: [] for row in rows}
+            subject_rows = (await db.execute(
+                select(SubjectScore.report_card_id, *subject_columns)
+                .where(SubjectScore.report_card_id.in_(list(subjects)))
+            )).all()
+            for row, subject in zip(subject_rows, row_dicts(subject_rows, subject_columns)):
+                subjects[row.report_card_id].append(subject)
+
+            for row, report_card in zip(rows, report_cards):
+                report_card["subjects"] = subjects[row.id]
+
+        return rows_response(report_cards, next_cursor)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -458,127 +683,177 @@ async def get_all_report_cards(
 @router.get("/admin/report-cards/{report_id}/download")
 async def download_report_card(
     report_id: str,
-    db: Session = Depends(get_db)
+    request: Request,
+    db: AsyncSession = Depends(get_db)
 ):
-    report_card = db.query(ReportCard)\
-        .options(joinedload(ReportCard.subjects))\
-        .filter(ReportCard.id == report_id)\
-        .first()
+    report_card = await db.scalar(select(ReportCard).where(ReportCard.id == report_id))
     
     if not report_card:
         raise HTTPException(status_code=404, detail="Report card not found")
     
-    student = db.query(Student).filter(Student.admission_number == report_card.student_id).first()
+    student = await db.scalar(select(Student).where(Student.admission_number == report_card.student_id))
     
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
     
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=20, leftMargin=20, topMargin=20, bottomMargin=20)
-    styles = getSampleStyleSheet()
-    elements = []
-
-    # SCHOOL HEADER
-    logo_path = "logo-bg.jpeg"  # Make sure the logo file exist
-    logo = Image(logo_path, width=100, height=100)
-    school_name = Paragraph("""<font size=30><b>MOTHER'S AID SCHOOLS</b></font><br/><font size=15>STUDENT'S OFFICIAL ACADEMIC REPORT</font><br/><font size=10>Achieving Intellectual and Personal Excellence</font>""", styles['Title'])
-    header_table = Table([[logo, school_name]], colWidths=[80, 500])
-    header_table.setStyle(TableStyle([
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('LEFTPADDING', (1, 0), (1, 0), 10),
-    ]))
-    elements.append(header_table)
-    elements.append(Spacer(1, 12))
-    # elements.append(Paragraph("<b>OFFICIAL ACADEMIC RESULT</b>", styles['Heading2']))
-
-    # Calculate student's age
-    today = datetime.now().date()
-    age = today.year - student.date_of_birth.year - (
-        (today.month, today.day) < (student.date_of_birth.month, student.date_of_birth.day)
+    cache_key = report_card_cache_key(report_card, student)
+    pdf = await get_cached_pdf(cache_key)
+
+    if pdf is None:
+        await db.refresh(report_card, attribute_names=["subjects"])
+        data = build_report_card_data(report_card, student)
+        pdf = await asyncio.to_thread(render_report_card, data)
+        await store_pdf(cache_key, pdf)
+    
+    return await binary_response(
+        request,
+        media_type='application/pdf',
+        cache_control=CACHE_REPORT_CARD,
+        content=pdf,
+        filename=f"report_card_{report_card.student_id}.pdf"
     )
 
-    # STUDENT INFO TABLE
-    student_info = [
-        ['NAME', student.full_name, 'GENDER', student.gender],
-        ['CLASS', report_card.class_name, 'SESSION', report_card.session],
-        ['D.O.B', student.date_of_birth, 'AGE', str(age)],
-        ['TERM', report_card.term, 'ADMISSION NO.', student.admission_number],
-    ]
-    student_table = Table(student_info, colWidths=[60, 150, 120, 150])
-    student_table.setStyle(TableStyle([
-        ('GRID', (0, 0), (-1, -1), 0.25, colors.black),
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey)
-    ]))
-    elements.append(student_table)
-    elements.append(Spacer(1, 10))
-
-    # SUBJECT SCORES TABLE (COGNITIVE DOMAIN)
-    subject_data = [['SUBJECTS', 'C.A', 'EXAM', 'TOTAL', 'GRADE', 'POSITION', 'REMARKS']]
-    for subject in report_card.subjects:
-        subject_data.append([
-            subject.subject_name,
-            subject.ca_score,
-            subject.exam_score,
-            subject.total_score,
-            subject.grade,
-            report_card.position_in_class,
-            subject.teacher_remark
-        ])
-    subject_table = Table(subject_data, colWidths=[150, 40, 40, 40, 50, 50, 130])
-    subject_table.setStyle(TableStyle([
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-        ('BACKGROUND', (0, 0), (-1, 0), colors.lightblue),
-        ('FONTSIZE', (0, 0), (-1, -1), 9),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('ALIGN', (1, 1), (-2, -1), 'CENTER')
-    ]))
-    elements.append(subject_table)
-    elements.append(Spacer(1, 12))
-
-    # Calculate average score from all subjects
-    total_score = 0
-    total_subjects = len(report_card.subjects)
-    
-    if total_subjects > 0:
-        for subject in report_card.subjects:
-            total_score += subject.total_score
-        average_score = round((total_score / (total_subjects * 100)) * 100, 2)
-    else:
-        average_score = 0
 
-    # AVERAGE & COMMENTS
-    summary_data = [
-        ["AVERAGE:", f"{average_score}%"],
-        ["POSITION IN CLASS:", f"{report_card.position_in_class}/{report_card.total_students}", "", ""]
+@router.post("/admin/class-results/refresh", response_model=ClassResultResponse)
+async def refresh_class_results(
+    class_term: ClassTerm,
+    current_admin: Admin = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    try:
+        await recompute_class(db, class_term.class_name, class_term.session, class_term.term)
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    return await get_class_results(class_term.class_name, class_term.session, class_term.term, current_admin, db)
+
+
+@router.get("/admin/class-results", response_model=ClassResultResponse)
+async def get_class_results(
+    class_name: str,
+    session: str,
+    term: str,
+    current_admin: Admin = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    class_result = await db.scalar(
+        select(ClassResult).where(
+            ClassResult.class_name == class_name,
+            ClassResult.session == session,
+            ClassResult.term == term
+        )
+    )
+    if not class_result:
+        raise HTTPException(status_code=404, detail="No results for this class")
+    return class_result
+
+
+@router.post("/admin/report-card-batches", response_model=dict)
+async def create_report_card_batch(
+    batch: ReportCardBatchCreate,
+    current_admin: Admin = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    report_cards = (await db.scalars(
+        select(ReportCard)
+        .options(selectinload(ReportCard.subjects), selectinload(ReportCard.student))
+        .where(
+            ReportCard.class_name == batch.class_name,
+            ReportCard.session == batch.session,
+            ReportCard.term == batch.term
+        )
+    )).all()
+
+    if not report_cards:
+        raise HTTPException(status_code=404, detail="No report cards found for this class")
+
+    cards = [
+        (
+            report_card_cache_key(report_card, report_card.student),
+            f"report_card_{report_card.student_id}.pdf",
+            build_report_card_data(report_card, report_card.student)
+        )
+        for report_card in sorted(report_cards, key=lambda card: card.student.full_name or "")
+        if report_card.student
     ]
-    summary_table = Table(summary_data, colWidths=[100, 80, 100, 80])
-    summary_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-    ]))
-    elements.append(summary_table)
-    elements.append(Spacer(1, 10))
-
-    # REMARKS
-    elements.append(Paragraph(f"TEACHER'S NAME: {report_card.teacher_name}", styles['Normal']))
-    elements.append(Paragraph(f"Teacher's Remark: {report_card.teacher_remark}", styles['Normal']))
-    elements.append(Spacer(1, 10))
-    elements.append(Paragraph(f"Principal's Remark: {report_card.principal_remark}", styles['Normal']))
-    elements.append(Paragraph(f"PRINCIPAL'S NAME: {report_card.principal_name}", styles['Normal']))
-    elements.append(Spacer(1, 10))
-    
 
-    doc.build(elements)
-    buffer.seek(0)
-    
+    job = await start_batch(db, batch.class_name, batch.session, batch.term, batch.output, cards)
+    return job.info()
+
+
+@router.get("/admin/report-card-batches/{job_id}", response_model=dict)
+async def get_report_card_batch(
+    job_id: str,
+    current_admin: Admin = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    job = report_batch_jobs.get(job_id)
+    if job:
+        return job.info()
+
+    # Started by another worker
+    batch = await get_batch(db, job_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return batch_info(batch)
+
+
+@router.get("/admin/report-card-batches/{job_id}/download")
+async def download_report_card_batch(
+    job_id: str,
+    request: Request,
+    current_admin: Admin = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    job = report_batch_jobs.get(job_id)
+    if not job:
+        return await _download_stored_batch(request, db, job_id)
+
+    filename = f"report_cards_{job.class_name}_{job.term}".replace(" ", "_")
+
+    if job.output == "pdf":
+        await job.wait_until_done()
+        if job.merged is None:
+            raise HTTPException(status_code=500, detail="Report card batch failed")
+        return Response(
+            job.merged,
+            media_type="application/pdf",
+            headers={'Content-Disposition': f'attachment; filename="{filename}.pdf"'}
+        )
+
     return StreamingResponse(
-        buffer,
-        media_type='application/pdf',
-        headers={
-            'Content-Disposition': f'attachment; filename="report_card_{report_card.student_id}.pdf"'
-        }
+        stream_zip(job),
+        media_type="application/zip",
+        headers={'Content-Disposition': f'attachment; filename="{filename}.zip"'}
+    )
+
+
+async def _download_stored_batch(request: Request, db: AsyncSession, job_id: str):
+    # The job ran on another worker, its result is in the blob store once it is complete
+    batch = await get_batch(db, job_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    if batch.status == "running":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Report card batch is still rendering",
+            headers={"Retry-After": "5"}
+        )
+    if batch.status != "completed" or not batch.result_key:
+        raise HTTPException(status_code=500, detail="Report card batch failed")
+
+    filename = f"report_cards_{batch.class_name}_{batch.term}".replace(" ", "_")
+    return await binary_response(
+        request,
+        media_type="application/pdf" if batch.output == "pdf" else "application/zip",
+        cache_control=CACHE_REPORT_CARD,
+        key=batch.result_key,
+        filename=f"{filename}.{batch.output}"
     )
 
 
@@ -592,7 +867,7 @@ async def create_reading_material(
     session: str = Form(...),
     file: UploadFile = File(...),
     current_admin: Admin = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     # Validate file type
     allowed_types = ["application/pdf", "application/msword", 
@@ -607,15 +882,16 @@ async def create_reading_material(
         )
 
     try:
-        # Read file content
-        file_content = await file.read()
+        # Store file content in chunks
+        blob = await blob_store.save(file)
         
         # Create reading material
         db_material = ReadingMaterial(
             id=str(uuid.uuid4()),
             title=title,
             description=description,
-            file_content=file_content,
+            file_hash=blob.key,
+            file_size=blob.size,
             file_type=file.content_type,
             file_name=file.filename,
             subject=subject,
@@ -626,13 +902,15 @@ async def create_reading_material(
         )
         
         db.add(db_material)
-        db.commit()
-        db.refresh(db_material)
+        await db.commit()
+        await db.refresh(db_material)
+        invalidate_dashboard()
+        invalidate_search_index()
         
         return {"message": "Reading material created successfully"}
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
@@ -640,33 +918,45 @@ async def create_reading_material(
 
 @router.get("/reading-materials/{material_id}/download")
 async def download_material(
-    material_id: int,
-    db: Session = Depends(get_db)
+    material_id: str,
+    request: Request,
+    db: AsyncSession = Depends(get_read_db)
 ):
-    material = db.query(ReadingMaterial).filter(ReadingMaterial.id == material_id).first()
+    material = await db.scalar(select(ReadingMaterial).where(ReadingMaterial.id == material_id))
     if not material:
         raise HTTPException(status_code=404, detail="Material not found")
+
+    content = None
+    if not material.file_hash:
+        # Materials uploaded before the blob store are still kept in the database
+        content = await db.scalar(select(ReadingMaterial.file_content).where(ReadingMaterial.id == material_id))
     
-    return StreamingResponse(
-        BytesIO(material.file_content),
+    return await binary_response(
+        request,
         media_type=material.file_type,
-        headers={
-            'Content-Disposition': f'attachment; filename="{material.file_name}"'
-        }
+        cache_control=CACHE_PUBLIC_MATERIAL,
+        key=material.file_hash,
+        content=content,
+        last_modified=material.upload_date,
+        filename=material.file_name
     )
 
 @router.get("/admin/reading-materials", response_model=List[dict])
 async def get_all_materials(
     current_admin: Admin = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
 ):
+    selected_fields = parse_fields(fields, MATERIAL_FIELDS)
+    order = [ReadingMaterial.upload_date, ReadingMaterial.id]
+    query, limit = paginate(select(ReadingMaterial).where(ReadingMaterial.is_active == True), order, cursor, limit)
+
     try:
-        materials = db.query(ReadingMaterial)\
-            .filter(ReadingMaterial.is_active == True)\
-            .order_by(ReadingMaterial.upload_date.desc())\
-            .all()
+        materials, next_cursor = split_page((await db.scalars(query)).all(), order, limit)
         
-        return [
+        return page_response([
             {
                 "id": material.id,
                 "title": material.title,
@@ -680,7 +970,7 @@ async def get_all_materials(
                 "upload_date": material.upload_date,
             }
             for material in materials
-        ]
+        ], fields=selected_fields, next_cursor=next_cursor)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -691,12 +981,14 @@ async def get_all_materials(
 async def delete_material(
     material_id: str,
     current_admin: Admin = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    material = db.query(ReadingMaterial).filter(
-        ReadingMaterial.id == material_id,
-        ReadingMaterial.is_active == True
-    ).first()
+    material = await db.scalar(
+        select(ReadingMaterial).where(
+            ReadingMaterial.id == material_id,
+            ReadingMaterial.is_active == True
+        )
+    )
     
     if not material:
         raise HTTPException(
@@ -706,10 +998,11 @@ async def delete_material(
     
     try:
         material.is_active = False  # Soft delete
-        db.commit()
+        await db.commit()
+        invalidate_search_index()
         return {"message": "Material deleted successfully"}
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
@@ -718,28 +1011,10 @@ async def delete_material(
 @router.get("/admin/students-info", response_model=DashboardInfo)
 async def get_all_dashboard_info(
     current_admin: Admin = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     try:
-        # Get total counts using aggregation
-        total_students = db.query(func.count(Student.admission_number)).scalar()
-        total_report_cards = db.query(func.count(ReportCard.id)).scalar()
-        total_materials = db.query(func.count(ReadingMaterial.id)).scalar()
-        total_news = db.query(func.count(News.id)).scalar()
-
-        # Get recent materials (last 5)
-        recent_materials = db.query(ReadingMaterial)\
-            .order_by(ReadingMaterial.upload_date.desc())\
-            .limit(5)\
-            .all()
-
-        return {
-            "total_students": total_students,
-            "total_report_cards": total_report_cards,
-            "total_materials": total_materials,
-            "total_news": total_news,
-            "recent_materials": recent_materials
-        }
+        return await get_dashboard(db)
 
     except Exception as e:
         raise HTTPException(
@@ -748,13 +1023,26 @@ async def get_all_dashboard_info(
         )
 
 
+@router.get("/admin/search", response_model=List[SearchResult])
+async def search_all(
+    q: str = Query(..., min_length=1, max_length=100),
+    types: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    current_admin: Admin = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Searches students, reading materials and news, best match first. `types` is a comma separated subset of student, material, news."""
+    selected_types = parse_fields(types, SEARCH_TYPES) or SEARCH_TYPES
+    return await search(db, q, selected_types, limit)
+
+
 @router.post("/admin/news", response_model=dict)
 async def create_news(
     title: str = Form(...),
     content: str = Form(...),
     cover_image: UploadFile = File(...),
     current_admin: Admin = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     # Validate image type
     allowed_types = ['image/jpeg', 'image/png', 'image/gif']
@@ -769,81 +1057,119 @@ async def create_news(
         )
 
     try:
-        # Read image content
-        image_content = await cover_image.read()
+        # Store image content in chunks, with its thumbnails
+        blob = await save_image(cover_image)
         
         # Create news
         db_news = News(
             title=title,
             content=content,
-            cover_image=image_content,
+            cover_image_hash=blob.key,
             image_type=cover_image.content_type,
             uploaded_by=current_admin.id
         )
         
         db.add(db_news)
-        db.commit()
-        db.refresh(db_news)
+        await db.commit()
+        await db.refresh(db_news)
+        invalidate_dashboard()
+        invalidate_search_index()
+        invalidate_news_cache()
         
         return {"message": "News created successfully", "id": db_news.id}
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
 
+def _with_image_url(news: News) -> News:
+    news.image_url = versioned_url(f"/admin/news/{news.id}/image", news.cover_image_hash)
+    return news
+
 @router.get("/admin/news", response_model=List[NewsResponse])
 async def get_all_news(
-    db: Session = Depends(get_db)
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
 ):
-    try:
-        news_items = db.query(News)\
-            .order_by(News.date_uploaded.desc())\
-            .all()
+    selected_fields = parse_fields(fields, NewsResponse.model_fields)
+    order = [News.date_uploaded, News.id]
+    query, limit = paginate(select(News), order, cursor, limit)
 
-        # Add image URL to each news item
-        for news in news_items:
-            news.image_url = f"/admin/news/{news.id}/image"
+    async def load(db: AsyncSession):
+        news_items, next_cursor = split_page((await db.scalars(query)).all(), order, limit)
+        news_items = [_with_image_url(news) for news in news_items]
+        return page_response(news_items, NewsResponse, selected_fields, next_cursor)
 
-        return news_items
+    try:
+        # Public and read by every visitor, so served from the news cache
+        key = ("list", limit, cursor, frozenset(selected_fields) if selected_fields else None)
+        return await cached_response(key, load, NEWS_CACHE_FEED_BYTES if limit is None else NEWS_CACHE_MAX_ENTRY_BYTES)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
         )
 
+@router.get("/admin/news/{news_id}", response_model=NewsResponse)
+async def get_news(news_id: str):
+    async def load(db: AsyncSession):
+        news = await db.scalar(select(News).where(News.id == news_id))
+        if not news:
+            raise HTTPException(status_code=404, detail="News not found")
+        return JSONResponse(NewsResponse.model_validate(_with_image_url(news)).model_dump(mode="json"))
+
+    return await cached_response(("article", news_id), load)
+
 @router.get("/admin/news/{news_id}/image")
 async def get_news_image(
     news_id: str,
-    db: Session = Depends(get_db)
+    request: Request,
+    size: Optional[Literal["small", "medium"]] = None,
+    v: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db)
 ):
-    news = db.query(News).filter(News.id == news_id).first()
+    news = await db.scalar(select(News).where(News.id == news_id))
     if not news:
         raise HTTPException(status_code=404, detail="News not found")
+
+    content = None
+    if not news.cover_image_hash:
+        content = await db.scalar(select(News.cover_image).where(News.id == news_id))
     
-    return StreamingResponse(
-        BytesIO(news.cover_image),
-        media_type=news.image_type
+    return await image_response(
+        request,
+        media_type=news.image_type,
+        cache_control=CACHE_NEWS_IMAGE,
+        immutable_cache_control=CACHE_IMMUTABLE_IMAGE,
+        key=news.cover_image_hash,
+        content=content,
+        size=size,
+        version=v
     )
 
 @router.delete("/admin/news/{news_id}", response_model=dict)
 async def delete_news(
     news_id: str,
     current_admin: Admin = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    news = db.query(News).filter(News.id == news_id).first()
+    news = await db.scalar(select(News).where(News.id == news_id))
     if not news:
         raise HTTPException(status_code=404, detail="News not found")
     
     try:
-        db.delete(news)
-        db.commit()
+        await db.delete(news)
+        await db.commit()
+        invalidate_dashboard()
+        invalidate_search_index()
+        invalidate_news_cache()
         return {"message": "News deleted successfully"}
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
@@ -856,9 +1182,9 @@ async def update_news(
     content: str = Form(...),
     cover_image: UploadFile = File(None),
     current_admin: Admin = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    news = db.query(News).filter(News.id == news_id).first()
+    news = await db.scalar(select(News).where(News.id == news_id))
     if not news:
         raise HTTPException(status_code=404, detail="News not found")
     
@@ -880,37 +1206,116 @@ async def update_news(
                     detail="Invalid image format. Please upload JPEG, PNG or GIF"
                 )
 
-            image_content = await cover_image.read()
-            news.cover_image = image_content
+            blob = await save_image(cover_image)
+            news.cover_image_hash = blob.key
+            news.cover_image = None
             news.image_type = cover_image.content_type
         
-        db.commit()
-        db.refresh(news)
+        await db.commit()
+        await db.refresh(news)
+        invalidate_search_index()
+        invalidate_news_cache()
 
         return { "message": "News updated successfully!" }
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
 
+@router.post("/admin/students/enroll", response_model=dict)
+async def enroll_students(
+    enrollment: StudentEnrollment,
+    current_admin: Admin = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    students = enrollment.students
+    if not students:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No students to enroll"
+        )
+    if len(students) > MAX_ENROLLMENT:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_ENROLLMENT} students can be enrolled at once"
+        )
+
+    # Hash before reserving numbers, the counter stays locked until commit
+    hashed_passwords = await hash_passwords([student.password for student in students])
+
+    try:
+        admission_numbers = await allocate_admission_numbers(db, len(students))
+        date_admitted = datetime.now().date()
+
+        await db.execute(insert(Student), [
+            {
+                "full_name": student.full_name,
+                "admission_number": admission_number,
+                "current_class": student.current_class,
+                "gender": student.gender,
+                "date_of_birth": student.date_of_birth,
+                "guardian_name": student.guardian_name,
+                "guardian_phone": student.guardian_phone,
+                "guardian_email": student.guardian_email,
+                "hashed_password": hashed_password,
+                "date_admitted": date_admitted,
+                "is_active": True,
+                "state_of_origin": student.state_of_origin,
+                "local_government": student.local_government,
+            }
+            for student, admission_number, hashed_password in zip(students, admission_numbers, hashed_passwords)
+        ])
+        await db.commit()
+        invalidate_dashboard()
+        invalidate_search_index()
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    await send_mails([
+        (student.guardian_email, welcome_email(student.full_name, admission_number))
+        for student, admission_number in zip(students, admission_numbers)
+    ])
+
+    return {
+        "message": f"{len(students)} students enrolled successfully",
+        "students": [
+            {"full_name": student.full_name, "admission_number": admission_number}
+            for student, admission_number in zip(students, admission_numbers)
+        ]
+    }
+
+
 @router.get("/admin/students", response_model=List[StudentResponse])
 async def get_all_students(
     current_admin: Admin = Depends(get_current_admin),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     search: Optional[str] = None,
     current_class: Optional[str] = None,
-    is_active: Optional[bool] = None
+    is_active: Optional[bool] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
 ):
+    selected_fields = parse_fields(fields, StudentResponse.model_fields)
+    order = [Student.date_admitted, Student.admission_number]
+    columns = schema_columns(Student, StudentResponse, selected_fields)
+    with_image_url = selected_fields is None or "image_url" in selected_fields
+    image_columns = [Student.admission_number, Student.profile_image_hash, Student.image_type] if with_image_url else []
+
     try:
-        query = db.query(Student)
+        query = select(*with_columns(columns, order + image_columns))
 
         # Apply filters if provided
         if search:
             search_term = f"%{search}%"
-            query = query.filter(
+            query = query.where(
                 or_(
                     Student.full_name.ilike(search_term),
                     Student.admission_number.ilike(search_term)
@@ -918,21 +1323,90 @@ async def get_all_students(
             )
         
         if current_class:
-            query = query.filter(Student.current_class == current_class)
+            query = query.where(Student.current_class == current_class)
         
         if is_active is not None:
-            query = query.filter(Student.is_active == is_active)
+            query = query.where(Student.is_active == is_active)
 
         # Order by admission date
-        students = query.order_by(Student.date_admitted.desc()).all()
-        
-        return students
+        query, limit = paginate(query, order, cursor, limit)
+        rows, next_cursor = split_page((await db.execute(query)).all(), order, limit)
+
+        items = row_dicts(rows, columns)
+        if with_image_url:
+            # Last field of the schema, so the keys keep the schema's order
+            for item, row in zip(items, rows):
+                item["image_url"] = student_image_url(row)
+        return rows_response(items, next_cursor)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
         )
 
+@router.get("/admin/export/students")
+async def export_students(
+    format: ExportFormat = "csv",
+    current_class: Optional[str] = None,
+    is_active: Optional[bool] = None,
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """Streams every student matching the filters as CSV or NDJSON."""
+    query = select(*schema_columns(Student, StudentResponse))
+
+    if current_class:
+        query = query.where(Student.current_class == current_class)
+    if is_active is not None:
+        query = query.where(Student.is_active == is_active)
+
+    query = query.order_by(Student.date_admitted, Student.admission_number)
+    return export_response(query, format, "students")
+
+@router.get("/admin/export/results")
+async def export_results(
+    format: ExportFormat = "csv",
+    class_name: Optional[str] = None,
+    session: Optional[str] = None,
+    term: Optional[str] = None,
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """Streams one row per subject score, with the student and report card it belongs to, as CSV or NDJSON."""
+    query = (
+        select(
+            ReportCard.student_id.label("admission_number"),
+            Student.full_name,
+            ReportCard.class_name,
+            ReportCard.session,
+            ReportCard.term,
+            SubjectScore.subject_name,
+            SubjectScore.ca_score,
+            SubjectScore.exam_score,
+            SubjectScore.total_score,
+            SubjectScore.grade,
+            SubjectScore.position.label("subject_position"),
+            ReportCard.total_score.label("overall_total"),
+            ReportCard.average_score,
+            ReportCard.position_in_class,
+            ReportCard.total_students
+        )
+        .select_from(SubjectScore)
+        .join(ReportCard, SubjectScore.report_card_id == ReportCard.id)
+        .join(Student, ReportCard.student_id == Student.admission_number)
+    )
+
+    if class_name:
+        query = query.where(ReportCard.class_name == class_name)
+    if session:
+        query = query.where(ReportCard.session == session)
+    if term:
+        query = query.where(ReportCard.term == term)
+
+    query = query.order_by(ReportCard.session, ReportCard.term, ReportCard.class_name, ReportCard.student_id, SubjectScore.subject_name)
+    filename = "_".join(["results", *[value.replace("/", "-") for value in (class_name, session, term) if value]])
+    return export_response(query, format, filename)
+
 @router.put("/admin/students/{admission_number}", response_model=StudentResponse)
 async def update_student(
     admission_number: str,
@@ -944,10 +1418,10 @@ async def update_student(
     is_active: bool = Form(...),
     profile_image: UploadFile = File(None),
     current_admin: Admin = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     # Find student
-    student = db.query(Student).filter(Student.admission_number == admission_number).first()
+    student = await db.scalar(select(Student).where(Student.admission_number == admission_number))
     if not student:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -971,16 +1445,20 @@ async def update_student(
                     detail="Invalid image format. Please upload JPEG, PNG or GIF"
                 )
             
-            image_content = await profile_image.read()
-            student.profile_image = image_content
+            blob = await save_image(profile_image)
+            student.profile_image_hash = blob.key
+            student.profile_image = None
             student.image_type = profile_image.content_type
 
-        db.commit()
-        db.refresh(student)
-        
+        await db.commit()
+        await db.refresh(student)
+        await invalidate_principal(Student, admission_number)
+        invalidate_search_index()
+
+        student.image_url = student_image_url(student)
         return student
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
@@ -989,15 +1467,32 @@ async def update_student(
 @router.get("/admin/students/{admission_number}/image")
 async def get_student_image(
     admission_number: str,
-    db: Session = Depends(get_db)
+    request: Request,
+    size: Optional[Literal["small", "medium"]] = None,
+    v: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db)
 ):
-    student = db.query(Student).filter(Student.admission_number == admission_number).first()
-    if not student or not student.profile_image:
+    student = await db.scalar(select(Student).where(Student.admission_number == admission_number))
+    if not student:
         raise HTTPException(status_code=404, detail="Image not found")
+
+    content = None
+    if not student.profile_image_hash:
+        content = await db.scalar(
+            select(Student.profile_image).where(Student.admission_number == admission_number)
+        )
+        if not content:
+            raise HTTPException(status_code=404, detail="Image not found")
     
-    return StreamingResponse(
-        BytesIO(student.profile_image),
-        media_type=student.image_type
+    return await image_response(
+        request,
+        media_type=student.image_type,
+        cache_control=CACHE_STUDENT_IMAGE,
+        immutable_cache_control=CACHE_IMMUTABLE_STUDENT_IMAGE,
+        key=student.profile_image_hash,
+        content=content,
+        size=size,
+        version=v
     )
 
 class StudentPasswordUpdate(BaseModel):
@@ -1008,23 +1503,25 @@ async def update_student_password(
     admission_number: str,
     password_update: StudentPasswordUpdate,
     current_admin: Admin = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    student = db.query(Student).filter(Student.admission_number == admission_number).first()
+    student = await db.scalar(select(Student).where(Student.admission_number == admission_number))
     if not student:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Student not found"
         )
 
+    hashed_password = await hash_password(password_update.new_password)
+
     try:
-        hashed_password = pwd_context.hash(password_update.new_password)
         student.hashed_password = hashed_password
 
-        db.commit()
+        await db.commit()
+        await invalidate_principal(Student, admission_number)
         return {"message": "Student password updated successfully"}
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
@@ -1034,9 +1531,9 @@ async def update_student_password(
 async def delete_student(
     admission_number: str,
     current_admin: Admin = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    student = db.query(Student).filter(Student.admission_number == admission_number).first()
+    student = await db.scalar(select(Student).where(Student.admission_number == admission_number))
     if not student:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -1044,11 +1541,14 @@ async def delete_student(
         )
 
     try:
-        db.delete(student)
-        db.commit()
+        await db.delete(student)
+        await db.commit()
+        await invalidate_principal(Student, admission_number)
+        invalidate_dashboard()
+        invalidate_search_index()
         return {"message": "Student deleted successfully"}
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
@@ -1057,12 +1557,19 @@ async def delete_student(
 @router.get("/admin/all-admin", response_model=List[AdminResponse])
 async def get_all_admin(
     current_admin: Admin = Depends(get_current_admin),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
 ):
+    selected_fields = parse_fields(fields, AdminResponse.model_fields)
+    order = [Admin.id]
+    query, limit = paginate(select(Admin), order, cursor, limit, descending=False)
+
     try:
-        query = db.query(Admin).all()
+        admins, next_cursor = split_page((await db.scalars(query)).all(), order, limit)
         
-        return query
+        return page_response(admins, AdminResponse, selected_fields, next_cursor)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -1077,7 +1584,7 @@ class AdminPasswordUpdate(BaseModel):
 async def update_admin_password(
     password_update: AdminPasswordUpdate,
     current_admin: Admin = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     # Check if current admin has admin role
     if current_admin.role != "admin":
@@ -1087,22 +1594,24 @@ async def update_admin_password(
         )
     
     # Find admin to update
-    admin = db.query(Admin).filter(Admin.username == password_update.username).first()
+    admin = await db.scalar(select(Admin).where(Admin.username == password_update.username))
     if not admin:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Admin not found"
         )
 
+    # Hash password outside the try block so a busy hashing pool surfaces as 503
+    hashed_password = await hash_password(password_update.new_password)
+
     try:
-        # Hash and update password
-        hashed_password = pwd_context.hash(password_update.new_password)
         admin.hashed_password = hashed_password
 
-        db.commit()
+        await db.commit()
+        await invalidate_principal(Admin, admin.username)
         return {"message": "Admin password updated successfully"}
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
@@ -1112,10 +1621,10 @@ async def update_admin_password(
 async def delete_admin(
     username: str,
     current_admin: Admin = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     # Check if admin exists
-    admin = db.query(Admin).filter(Admin.username == username).first()
+    admin = await db.scalar(select(Admin).where(Admin.username == username))
     if not admin:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -1130,11 +1639,12 @@ async def delete_admin(
         )
 
     try:
-        db.delete(admin)
-        db.commit()
+        await db.delete(admin)
+        await db.commit()
+        await invalidate_principal(Admin, username)
         return {"message": "Admin deleted successfully"}
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
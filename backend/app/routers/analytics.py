@@ -0,0 +1,113 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func
+from typing import List, Optional
+from app.utils.database import get_read_db
+from app.utils.models import Admin, Student, ReportCard, SubjectResult, SubjectGradeCount
+from app.utils.schemas import StudentSessionAnalytics, SubjectStatistics, SubjectPassRate
+from app.utils.analytics import subject_statistics, term_sort_key
+from app.routers.admin import get_current_admin
+from app.routers.student import get_current_student
+
+
+router = APIRouter(tags=["Analytics"])
+
+
+async def _session_analytics(db: AsyncSession, admission_number: str, session: str) -> dict:
+    report_cards = (await db.execute(
+        select(
+            ReportCard.term,
+            ReportCard.class_name,
+            ReportCard.average_score,
+            ReportCard.position_in_class,
+            ReportCard.total_students
+        ).where(ReportCard.student_id == admission_number, ReportCard.session == session)
+    )).all()
+
+    terms = sorted((report_card._asdict() for report_card in report_cards), key=lambda term: term_sort_key(term["term"]))
+    averages = [term["average_score"] for term in terms if term["average_score"] is not None]
+
+    return {
+        "admission_number": admission_number,
+        "session": session,
+        "terms": terms,
+        "cumulative_average": round(sum(averages) / len(averages), 2) if averages else None,
+    }
+
+
+@router.get("/admin/analytics/students/{admission_number}", response_model=StudentSessionAnalytics)
+async def get_student_analytics(
+    admission_number: str,
+    session: str,
+    current_admin: Admin = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_read_db)
+):
+    return await _session_analytics(db, admission_number, session)
+
+
+@router.get("/students/analytics", response_model=StudentSessionAnalytics)
+async def get_my_analytics(
+    session: str,
+    current_student: Student = Depends(get_current_student),
+    db: AsyncSession = Depends(get_read_db)
+):
+    return await _session_analytics(db, current_student.admission_number, session)
+
+
+@router.get("/admin/analytics/classes/subjects", response_model=List[SubjectStatistics])
+async def get_class_subject_statistics(
+    class_name: str,
+    session: str,
+    term: str,
+    current_admin: Admin = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_read_db)
+):
+    in_class = lambda model: (model.class_name == class_name, model.session == session, model.term == term)
+
+    results = (await db.scalars(
+        select(SubjectResult).where(*in_class(SubjectResult)).order_by(SubjectResult.subject_name)
+    )).all()
+    if not results:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No results for this class"
+        )
+
+    grades = {}
+    for grade_count in (await db.scalars(select(SubjectGradeCount).where(*in_class(SubjectGradeCount)))).all():
+        grades.setdefault(grade_count.subject_name, {})[grade_count.grade] = grade_count.count
+
+    return [subject_statistics(result, grades.get(result.subject_name, {})) for result in results]
+
+
+@router.get("/admin/analytics/subjects/pass-rates", response_model=List[SubjectPassRate])
+async def get_subject_pass_rates(
+    session: str,
+    term: Optional[str] = None,
+    class_name: Optional[str] = None,
+    current_admin: Admin = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_read_db)
+):
+    query = select(
+        SubjectResult.subject_name,
+        func.sum(SubjectResult.total_students).label("total_students"),
+        func.sum(SubjectResult.passed).label("passed")
+    ).where(SubjectResult.session == session)
+    if term:
+        query = query.where(SubjectResult.term == term)
+    if class_name:
+        query = query.where(SubjectResult.class_name == class_name)
+
+    rows = (await db.execute(
+        query.group_by(SubjectResult.subject_name).order_by(SubjectResult.subject_name)
+    )).all()
+
+    return [
+        {
+            "subject_name": row.subject_name,
+            "total_students": row.total_students,
+            "passed": row.passed,
+            "pass_rate": round(row.passed / row.total_students * 100, 2) if row.total_students else None,
+        }
+        for row in rows
+    ]
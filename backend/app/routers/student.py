@@ -1,31 +1,24 @@
-import os, json
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import joinedload
-from sqlalchemy.orm import Session
-from typing import Optional, List
+import json
+from fastapi import APIRouter, Depends, HTTPException, status, Request
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, List, Union
 from datetime import datetime
-from passlib.context import CryptContext
-from jose import JWTError, jwt
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from app.utils.database import get_db
+from app.utils.database import get_db, get_read_db
 from app.utils.models import Student, ReportCard, ReadingMaterial
-from app.utils.schemas import StudentCreate, Token, StudentProfile, SubjectScoreResponse, ReportCardResponse
-from app.utils.token import create_access_token
+from app.utils.schemas import StudentCreate, Token, StudentProfile, StudentProfileSummary, SubjectScoreResponse, ReportCardResponse
+from app.utils.token import create_access_token, decode_access_token
 from app.utils.email import send_mail
-from dotenv import load_dotenv
-from io import BytesIO
-
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-load_dotenv()
-
-# JWT settings
-JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY')
-ALGORITHM = os.getenv('ALGORITHM')
-ACCESS_TOKEN_EXPIRE_MINUTES = os.getenv('ACCESS_TOKEN_EXPIRE_MINUTES')
+from app.utils.hashing import hash_password, verify_password
+from app.utils.responses import binary_response, CACHE_MATERIAL
+from app.utils.principal_cache import get_principal, invalidate_principal
+from app.utils.admissions import allocate_admission_numbers, welcome_email
+from app.utils.thumbnails import student_image_url
+from app.utils.dashboard import invalidate_dashboard
+from app.utils.search import invalidate_search_index
 
 router = APIRouter(tags=["Students"])
 
@@ -33,83 +26,46 @@ class ResetStudentPassword(BaseModel):
     admission_number: Optional[str]
     new_password: str
 
-def generate_admission_number(db: Session) -> str:
-    """Generate a unique admission number based on year and sequential number"""
-    current_year = datetime.now().year
-    # Get the count of students admitted this year
-    year_prefix = str(current_year)[-2:]  # Last two digits of year
-    
-    # Query to get the last admission number for this year
-    last_student = db.query(Student).filter(
-        Student.admission_number.like(f"MAS{year_prefix}%")
-    ).order_by(Student.admission_number.desc()).first()
-    
-    if last_student:
-        last_number = int(last_student.admission_number[-3:])
-        new_number = str(last_number + 1).zfill(3)
-    else:
-        new_number = "001"
-    
-    return f"MAS{year_prefix}{new_number}"
-
-
 @router.post("/students/signup", response_model=dict)
-async def student_signup(student: StudentCreate, db: Session = Depends(get_db)):
-    # Generate admission number
-    admission_number = generate_admission_number(db)
-    
-    # Hash the password
-    hashed_password = pwd_context.hash(student.password)
-    
-    # Create new student
-    db_student = Student(
-        full_name=student.full_name,
-        admission_number=admission_number,
-        current_class=student.current_class,
-        gender=student.gender,
-        date_of_birth=student.date_of_birth,
-        guardian_name=student.guardian_name,
-        guardian_phone=student.guardian_phone,
-        guardian_email=student.guardian_email,
-        hashed_password=hashed_password,
-        date_admitted=datetime.now().date(),
-        is_active=True,
-        state_of_origin=student.state_of_origin,
-        local_government=student.local_government,
-    )
-    
+async def student_signup(student: StudentCreate, db: AsyncSession = Depends(get_db)):
+    # Hash the password first, the admission number counter stays locked until commit
+    hashed_password = await hash_password(student.password)
+
     try:
-        db.add(db_student)
-        db.commit()
-        db.refresh(db_student)
+        # Generate admission number
+        admission_number = (await allocate_admission_numbers(db))[0]
+
+        # Create new student
+        db_student = Student(
+            full_name=student.full_name,
+            admission_number=admission_number,
+            current_class=student.current_class,
+            gender=student.gender,
+            date_of_birth=student.date_of_birth,
+            guardian_name=student.guardian_name,
+            guardian_phone=student.guardian_phone,
+            guardian_email=student.guardian_email,
+            hashed_password=hashed_password,
+            date_admitted=datetime.now().date(),
+            is_active=True,
+            state_of_origin=student.state_of_origin,
+            local_government=student.local_government,
+        )
 
-        # Email content for successfule registration
-        content = f"""
-            <html>
-            <body>
-                <b>Hi, {student.full_name}</b></br>
-                <p>
-                    Welcome to <b>Mother's Aid Schools</b> portal, where you can find and manage anything
-                    related to your academics.
-                </p>
-                <p>
-                    Your admission number is <b>{admission_number}</b>, and you can use it to login to your portal.
-                </p>
-                <p>
-                    Now that you're registered, you can go ahead and login to have access to your portal.
-                </p>
-            </body>
-            </html>
-        """
+        db.add(db_student)
+        await db.commit()
+        await db.refresh(db_student)
+        invalidate_dashboard()
+        invalidate_search_index()
 
-        await send_mail(email=student.guardian_email, content=content)
+        await send_mail(email=student.guardian_email, content=welcome_email(student.full_name, admission_number))
 
         return {
             "message": "Student registered successfully",
             "admission_number": admission_number
         }
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Error creating student account"
@@ -117,14 +73,14 @@ async def student_signup(student: StudentCreate, db: Session = Depends(get_db)):
 
 
 @router.post("/students/login", response_model=Token)
-def student_login(
+async def student_login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     # Find student by admission number
-    student = db.query(Student).filter(
-        Student.admission_number == form_data.username
-    ).first()
+    student = await db.scalar(
+        select(Student).where(Student.admission_number == form_data.username)
+    )
     
     if not student:
         raise HTTPException(
@@ -134,7 +90,7 @@ def student_login(
         )
     
     # Verify password
-    if not pwd_context.verify(form_data.password, student.hashed_password):
+    if not await verify_password(form_data.password, student.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid admission number or password",
@@ -151,22 +107,21 @@ def student_login(
 
 async def get_current_student(
     token: str = Depends(OAuth2PasswordBearer(tokenUrl="students/login")),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> Student:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[ALGORITHM])
-        admission_number: str = payload.get("sub")
-        if admission_number is None:
-            raise credentials_exception
-    except JWTError:
+    payload = decode_access_token(token)
+    if payload is None:
+        raise credentials_exception
+    admission_number: str = payload.get("sub")
+    if admission_number is None:
         raise credentials_exception
 
-    student = db.query(Student).filter(Student.admission_number == admission_number).first()
+    student = await get_principal(db, Student, Student.admission_number, admission_number)
     if student is None:
         raise credentials_exception
     return student
@@ -180,47 +135,51 @@ def serialize_model(model):
     # Return a dict where the keys are the columns and the values are the model's values
     return {c: getattr(model, c) for c in columns}
 
-@router.get("/students/me", response_model=StudentProfile)
+@router.get("/students/me", response_model=Union[StudentProfile, StudentProfileSummary])
 async def get_profile(
+    summary: bool = False,
     current_student: Student = Depends(get_current_student),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    student = db.query(Student).options(
-        joinedload(Student.report_cards)
-    ).filter(
-        Student.admission_number == current_student.admission_number
-    ).first()
-    
-    if not student:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Student not found"
-        )
+    """
+    Returns the profile of the logged in student with their report cards.
+    With `summary=true` the subject scores of each card are left out.
+    """
+    # The student is already resolved by get_current_student, only the cards are loaded
+    query = select(ReportCard).where(ReportCard.student_id == current_student.admission_number)
+    if not summary:
+        query = query.options(selectinload(ReportCard.subjects))
+    report_cards = (await db.scalars(query.order_by(ReportCard.session, ReportCard.term))).all()
 
-    return student
+    schema = StudentProfileSummary if summary else StudentProfile
+    profile = {field: getattr(current_student, field) for field in schema.model_fields if field not in ("report_cards", "image_url")}
+    profile["image_url"] = student_image_url(current_student)
+    return schema.model_validate({**profile, "report_cards": report_cards}, from_attributes=True)
 
 
 @router.get("/students/academic-records", response_model=List[ReportCardResponse])
 async def get_academic_records(
     current_student: Student = Depends(get_current_student),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     term: Optional[str] = None,
     session: Optional[str] = None
 ):
     # Build the query
-    query = db.query(ReportCard).filter(ReportCard.student_id == current_student.admission_number)
+    query = select(ReportCard).options(
+        selectinload(ReportCard.subjects)
+    ).where(ReportCard.student_id == current_student.admission_number)
     
     # Add optional filters
     if term:
-        query = query.filter(ReportCard.term == term)
+        query = query.where(ReportCard.term == term)
     if session:
-        query = query.filter(ReportCard.session == session)
+        query = query.where(ReportCard.session == session)
     
     # Get report cards ordered by session and term
-    report_cards = query.order_by(
+    report_cards = (await db.scalars(query.order_by(
         ReportCard.session.desc(),
         ReportCard.term.desc()
-    ).all()
+    ))).all()
     
     if not report_cards:
         raise HTTPException(
@@ -234,12 +193,14 @@ async def get_academic_records(
 @router.get("/students/reading-materials")
 async def get_reading_materials(
     current_student: Student = Depends(get_current_student),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    materials = db.query(ReadingMaterial).filter(
-        ReadingMaterial.class_assigned == current_student.current_class,
-        ReadingMaterial.is_active == True
-    ).all()
+    materials = (await db.scalars(
+        select(ReadingMaterial).where(
+            ReadingMaterial.class_assigned == current_student.current_class,
+            ReadingMaterial.is_active == True
+        )
+    )).all()
     
     # Generate download URL for each material
     return {
@@ -262,15 +223,18 @@ async def get_reading_materials(
 @router.get("/students/reading-materials/{material_id}/download")
 async def download_material(
     material_id: str,
+    request: Request,
     current_student: Student = Depends(get_current_student),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     # Fetch the material
-    material = db.query(ReadingMaterial).filter(
-        ReadingMaterial.id == material_id,
-        ReadingMaterial.class_assigned == current_student.current_class,
-        ReadingMaterial.is_active == True
-    ).first()
+    material = await db.scalar(
+        select(ReadingMaterial).where(
+            ReadingMaterial.id == material_id,
+            ReadingMaterial.class_assigned == current_student.current_class,
+            ReadingMaterial.is_active == True
+        )
+    )
     
     if not material:
         raise HTTPException(
@@ -278,22 +242,26 @@ async def download_material(
             detail="Reading material not found"
         )
     
-    # Create file-like object from binary content
-    file_like = BytesIO(material.file_content)
+    content = None
+    if not material.file_hash:
+        # Materials uploaded before the blob store are still kept in the database
+        content = await db.scalar(select(ReadingMaterial.file_content).where(ReadingMaterial.id == material.id))
     
-    # Return streaming response with proper headers
-    return StreamingResponse(
-        file_like,
+    # Stream the file with validators so repeat and resumed downloads are cheap
+    return await binary_response(
+        request,
         media_type=material.file_type,
-        headers={
-            'Content-Disposition': f'attachment; filename="{material.file_name}"'
-        }
+        cache_control=CACHE_MATERIAL,
+        key=material.file_hash,
+        content=content,
+        last_modified=material.upload_date,
+        filename=material.file_name
     )
 
 @router.post("/student/reset-password")
-async def reset_student_password(request: ResetStudentPassword, db: Session = Depends(get_db)):
+async def reset_student_password(request: ResetStudentPassword, db: AsyncSession = Depends(get_db)):
         
-    student = db.query(Student).filter(Student.admission_number == request.admission_number).first()
+    student = await db.scalar(select(Student).where(Student.admission_number == request.admission_number))
     
     if not student:
         raise HTTPException(
@@ -302,11 +270,12 @@ async def reset_student_password(request: ResetStudentPassword, db: Session = De
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    hashed_password=pwd_context.hash(request.new_password)
+    hashed_password = await hash_password(request.new_password)
 
     student.hashed_password = hashed_password
 
-    db.commit()
-    db.refresh(student)
+    await db.commit()
+    await db.refresh(student)
+    await invalidate_principal(Student, student.admission_number)
 
     return { "message": "Password has been updated successfully! You can now login with your new password."}
@@ -0,0 +1,89 @@
+"""
+This module hands out admission numbers, e.g. MAS25001.
+
+Numbers come from a per-year counter row that is incremented with a
+single UPDATE ... RETURNING, so parallel signups (or a bulk
+enrollment reserving a block of numbers) never get the same number.
+The counter is part of the caller's transaction, a rolled back
+signup gives its number back.
+"""
+
+from datetime import datetime
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.utils.database import insert_ignore
+from app.utils.models import AdmissionSequence, Student
+
+
+ADMISSION_PREFIX = "MAS"
+
+
+def format_admission_number(year_prefix: str, number: int) -> str:
+    return f"{ADMISSION_PREFIX}{year_prefix}{str(number).zfill(3)}"
+
+
+async def _seed(db: AsyncSession, year_prefix: str):
+    """Creates the year's counter, starting after the highest number already given out."""
+    prefix = f"{ADMISSION_PREFIX}{year_prefix}"
+    admission_numbers = (await db.scalars(
+        select(Student.admission_number).where(Student.admission_number.like(f"{prefix}%"))
+    )).all()
+
+    suffixes = [number[len(prefix):] for number in admission_numbers]
+    last_number = max((int(suffix) for suffix in suffixes if suffix.isdigit()), default=0)
+
+    # Another request may create the counter first, its value wins
+    await db.execute(insert_ignore(
+        db, AdmissionSequence,
+        [{"year_prefix": year_prefix, "last_number": last_number}],
+        conflict_columns=["year_prefix"]
+    ))
+
+
+async def _reserve(db: AsyncSession, year_prefix: str, count: int):
+    return await db.scalar(
+        update(AdmissionSequence)
+        .where(AdmissionSequence.year_prefix == year_prefix)
+        .values(last_number=AdmissionSequence.last_number + count)
+        .returning(AdmissionSequence.last_number)
+    )
+
+
+async def allocate_admission_numbers(db: AsyncSession, count: int = 1) -> list:
+    """
+    Reserves `count` consecutive admission numbers for the current year.
+
+    The counter row stays locked until the caller commits, so do the
+    slow work (e.g. password hashing) before calling this.
+    """
+    year_prefix = str(datetime.now().year)[-2:]
+
+    last_number = await _reserve(db, year_prefix, count)
+    if last_number is None:
+        await _seed(db, year_prefix)
+        last_number = await _reserve(db, year_prefix, count)
+
+    return [
+        format_admission_number(year_prefix, number)
+        for number in range(last_number - count + 1, last_number + 1)
+    ]
+
+
+def welcome_email(full_name: str, admission_number: str) -> str:
+    return f"""
+        <html>
+        <body>
+            <b>Hi, {full_name}</b></br>
+            <p>
+                Welcome to <b>Mother's Aid Schools</b> portal, where you can find and manage anything
+                related to your academics.
+            </p>
+            <p>
+                Your admission number is <b>{admission_number}</b>, and you can use it to login to your portal.
+            </p>
+            <p>
+                Now that you're registered, you can go ahead and login to have access to your portal.
+            </p>
+        </body>
+        </html>
+    """
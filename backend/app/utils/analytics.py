@@ -0,0 +1,90 @@
+"""
+This module maintains the per subject aggregate tables behind the
+analytics API and reads them back as statistics.
+
+subject_results keeps the count, sum and sum of squares of each
+subject's scores in a class, so means and standard deviations are
+derived without reading the scores. Writes only refresh the subjects
+that changed (see app.utils.ranking), so the tables stay small and
+reads never scan report cards or subject scores.
+"""
+
+from typing import Iterable, Optional
+from sqlalchemy import select, insert, delete, func, case, literal
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.utils.models import ReportCard, SubjectScore, SubjectResult, SubjectGradeCount
+from app.utils.settings import settings
+import math
+
+
+# Lowest total score (out of 100) counted as a pass
+PASS_MARK = settings.pass_mark
+
+TERM_ORDER = {"first": 1, "second": 2, "third": 3}
+
+
+async def refresh_subject_results(db: AsyncSession, class_name: str, session: str, term: str, subject_names: Optional[Iterable[str]] = None):
+    """Rebuilds the aggregates of the class, limited to `subject_names` when given."""
+    subject_names = None if subject_names is None else list(subject_names)
+
+    def scoped(model):
+        conditions = [model.class_name == class_name, model.session == session, model.term == term]
+        if subject_names is not None:
+            conditions.append(model.subject_name.in_(subject_names))
+        return conditions
+
+    def scores(*columns):
+        query = select(literal(class_name), literal(session), literal(term), SubjectScore.subject_name, *columns)\
+            .select_from(SubjectScore)\
+            .join(ReportCard, ReportCard.id == SubjectScore.report_card_id)\
+            .where(ReportCard.class_name == class_name, ReportCard.session == session, ReportCard.term == term)
+        if subject_names is not None:
+            query = query.where(SubjectScore.subject_name.in_(subject_names))
+        return query
+
+    await db.execute(delete(SubjectResult).where(*scoped(SubjectResult)))
+    await db.execute(delete(SubjectGradeCount).where(*scoped(SubjectGradeCount)))
+
+    score = SubjectScore.total_score
+    await db.execute(insert(SubjectResult).from_select(
+        [
+            "class_name", "session", "term", "subject_name", "total_students",
+            "score_sum", "score_sum_squares", "passed", "highest_score", "lowest_score"
+        ],
+        scores(
+            func.count(),
+            func.coalesce(func.sum(score), 0),
+            func.coalesce(func.sum(score * score), 0),
+            func.sum(case((score >= PASS_MARK, 1), else_=0)),
+            func.max(score),
+            func.min(score)
+        ).group_by(SubjectScore.subject_name)
+    ))
+
+    grade = func.coalesce(SubjectScore.grade, "")
+    await db.execute(insert(SubjectGradeCount).from_select(
+        ["class_name", "session", "term", "subject_name", "grade", "count"],
+        scores(grade, func.count()).group_by(SubjectScore.subject_name, grade)
+    ))
+
+
+def subject_statistics(result: SubjectResult, grades: dict) -> dict:
+    count = result.total_students or 0
+    mean = result.score_sum / count if count else None
+    # Population standard deviation from the running sums, clamped against rounding
+    variance = max(result.score_sum_squares / count - mean * mean, 0) if count else None
+
+    return {
+        "subject_name": result.subject_name,
+        "total_students": count,
+        "mean": round(mean, 2) if mean is not None else None,
+        "standard_deviation": round(math.sqrt(variance), 2) if variance is not None else None,
+        "highest_score": result.highest_score,
+        "lowest_score": result.lowest_score,
+        "pass_rate": round(result.passed / count * 100, 2) if count else None,
+        "grades": grades,
+    }
+
+
+def term_sort_key(term: str) -> int:
+    return TERM_ORDER.get(term.strip().lower().split(" ")[0], len(TERM_ORDER) + 1)
@@ -0,0 +1,140 @@
+"""
+This module reads class broadsheets (CSV or XLSX) for the bulk
+report card import.
+
+A broadsheet has one row per student and these columns:
+    Admission Number, Attendance (required)
+    Teacher Name, Principal Name, Teacher Remark, Principal Remark
+    "<Subject> CA", "<Subject> Exam", "<Subject> Grade", "<Subject> Remark"
+    "Comment: <type>" for teacher comments
+
+A subject whose CA and exam cells are both empty is skipped for that
+student. Files are read row by row, never loaded whole into memory.
+"""
+
+from typing import IO, Iterator
+import codecs, csv, zipfile
+
+
+CARD_COLUMNS = (
+    "admission_number", "attendance", "teacher_name",
+    "principal_name", "teacher_remark", "principal_remark"
+)
+SUBJECT_COLUMNS = {"ca": "ca_score", "exam": "exam_score", "grade": "grade", "remark": "teacher_remark"}
+COMMENT_PREFIX = "comment:"
+
+
+class BroadsheetError(ValueError):
+    pass
+
+
+def _clean(value):
+    if isinstance(value, str):
+        value = value.strip()
+        return value or None
+    return value
+
+
+def _parse_header(header: list) -> list:
+    """
+    Maps every header cell to where its values go:
+    ("card", field), ("subject", name, field) or ("comment", type).
+    """
+    columns = []
+    for cell in header:
+        title = str(_clean(cell) or "")
+        key = title.lower().replace(" ", "_")
+
+        if key in CARD_COLUMNS:
+            columns.append(("card", key))
+        elif title.lower().startswith(COMMENT_PREFIX):
+            columns.append(("comment", title[len(COMMENT_PREFIX):].strip()))
+        elif " " in title and title.rsplit(" ", 1)[1].lower() in SUBJECT_COLUMNS:
+            subject_name, suffix = title.rsplit(" ", 1)
+            columns.append(("subject", subject_name.strip(), SUBJECT_COLUMNS[suffix.lower()]))
+        elif not title:
+            columns.append(None)
+        else:
+            raise BroadsheetError(f"Unknown column: {title}")
+
+    named = [column for column in columns if column]
+    if len(set(named)) != len(named):
+        raise BroadsheetError("The broadsheet has duplicate columns")
+
+    fields = {column[1] for column in named if column[0] == "card"}
+    for required in ("admission_number", "attendance"):
+        if required not in fields:
+            raise BroadsheetError(f"Missing column: {required.replace('_', ' ').title()}")
+    return columns
+
+
+def _to_record(columns: list, values) -> dict:
+    record = {field: None for field in CARD_COLUMNS}
+    subjects = {}
+    comments = []
+
+    for column, value in zip(columns, values):
+        value = _clean(value)
+        if column is None:
+            continue
+        if column[0] == "card":
+            record[column[1]] = value
+        elif column[0] == "subject":
+            subjects.setdefault(column[1], {"subject_name": column[1]})[column[2]] = value
+        elif value is not None:
+            comments.append({"comment_type": column[1], "comment": value})
+
+    record["subjects"] = []
+    for subject in subjects.values():
+        if subject.get("ca_score") is None and subject.get("exam_score") is None:
+            continue
+        # The remark column is optional
+        if subject.get("teacher_remark") is None:
+            subject["teacher_remark"] = ""
+        record["subjects"].append(subject)
+    record["comments"] = comments
+    return record
+
+
+def _csv_rows(file: IO[bytes]) -> Iterator[list]:
+    # utf-8-sig drops the byte order mark spreadsheet programs add
+    return csv.reader(codecs.iterdecode(file, "utf-8-sig"))
+
+
+def _xlsx_rows(file: IO[bytes]) -> Iterator[tuple]:
+    try:
+        import openpyxl  # Only needed for .xlsx broadsheets
+    except ImportError:
+        raise BroadsheetError("openpyxl is required to import .xlsx broadsheets")
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def read_broadsheet(file: IO[bytes], filename: str) -> Iterator[tuple]:
+    """
+    Yields (row_number, record) for every non empty row of a broadsheet,
+    where record has the fields of a report card create request
+    (without class, session and term). Raises BroadsheetError if the
+    file or its header can't be read.
+    """
+    if filename.lower().endswith(".xlsx"):
+        rows = _xlsx_rows(file)
+    elif filename.lower().endswith(".csv"):
+        rows = _csv_rows(file)
+    else:
+        raise BroadsheetError("Broadsheets must be .csv or .xlsx files")
+
+    try:
+        header = next(rows, None)
+        if header is None:
+            raise BroadsheetError("The broadsheet is empty")
+        columns = _parse_header(list(header))
+
+        for row_number, values in enumerate(rows, start=2):
+            if any(_clean(value) is not None for value in values):
+                yield row_number, _to_record(columns, values)
+    except (UnicodeDecodeError, csv.Error, zipfile.BadZipFile) as e:
+        raise BroadsheetError(f"Could not read the broadsheet: {e}")
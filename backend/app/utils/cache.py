@@ -0,0 +1,69 @@
+"""
+This module contains the in-process LRU cache
+used for rendered documents and other computed responses.
+"""
+
+from collections import OrderedDict
+import threading, time
+
+
+class LRUCache:
+    """
+    Least recently used cache bounded by the total size of its values.
+
+    Parameters:
+        max_size: the total size allowed before old entries are evicted.
+        sizeof: computes the size of a value, `len` by default (bytes).
+        ttl: seconds an entry stays valid, or None to keep it until evicted.
+    """
+
+    def __init__(self, max_size: int, sizeof=len, ttl: float = None):
+        self.max_size = max_size
+        self.sizeof = sizeof
+        self.ttl = ttl
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            value, size, expires_at = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                self._remove(key)
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        size = self.sizeof(value)
+        if size > self.max_size:
+            return
+
+        expires_at = None if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, expires_at)
+            self.size += size
+            while self.size > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.size -= size
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,65 @@
+"""
+This module builds the admin dashboard summary and caches it.
+
+The four counts come from one query and the recent materials from a
+projection that never touches the file columns. The summary is cached
+for DASHBOARD_CACHE_TTL seconds and dropped by the endpoints that add
+or remove students, report cards, materials or news; the TTL bounds
+how stale other workers can be.
+"""
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.utils.cache import LRUCache
+from app.utils.models import Student, ReportCard, ReadingMaterial, News
+from app.utils.settings import settings
+
+
+DASHBOARD_CACHE_TTL = settings.dashboard_cache_ttl
+
+RECENT_MATERIALS = 5
+
+_cache = LRUCache(1, sizeof=lambda value: 1, ttl=DASHBOARD_CACHE_TTL)
+
+
+def _count(column):
+    return select(func.count(column)).scalar_subquery()
+
+
+async def get_dashboard(db: AsyncSession) -> dict:
+    dashboard = _cache.get("dashboard")
+    if dashboard is not None:
+        return dashboard
+
+    counts = (await db.execute(select(
+        _count(Student.admission_number).label("total_students"),
+        _count(ReportCard.id).label("total_report_cards"),
+        _count(ReadingMaterial.id).label("total_materials"),
+        _count(News.id).label("total_news")
+    ))).one()
+
+    recent_materials = (await db.execute(
+        select(
+            ReadingMaterial.id,
+            ReadingMaterial.title,
+            ReadingMaterial.subject,
+            ReadingMaterial.class_assigned,
+            ReadingMaterial.upload_date,
+            ReadingMaterial.term,
+            ReadingMaterial.session,
+            ReadingMaterial.file_name
+        )
+        .order_by(ReadingMaterial.upload_date.desc())
+        .limit(RECENT_MATERIALS)
+    )).all()
+
+    dashboard = {
+        **counts._asdict(),
+        "recent_materials": [material._asdict() for material in recent_materials]
+    }
+    _cache.set("dashboard", dashboard)
+    return dashboard
+
+
+def invalidate_dashboard():
+    _cache.clear()
@@ -1,22 +1,199 @@
-from sqlalchemy import create_engine
+"""
+This module sets up the database engines and sessions.
+
+The primary engine's pool is sized and health checked from the
+environment (see DB_POOL_*). When DATABASE_REPLICA_URL is set,
+read-only endpoints use `get_read_db`, served by the replica, except
+for clients that wrote something in the last STICKY_PRIMARY_SECONDS,
+who keep reading from the primary so they see their own writes.
+"""
+
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from dotenv import load_dotenv
-import os
+from sqlalchemy.orm import Session
+from app.utils.cache import LRUCache
+from app.utils.metrics import Counter, Gauge
+from app.utils.settings import settings
+import hashlib
+
+# SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite:///./test.db"
+
+SQLALCHEMY_DATABASE_URL = settings.postgres_url
+DATABASE_REPLICA_URL = settings.database_replica_url
+
+# Connections kept per worker process, and extra ones allowed during bursts
+DB_POOL_SIZE = settings.db_pool_size
+DB_MAX_OVERFLOW = settings.db_max_overflow
+DB_POOL_TIMEOUT = settings.db_pool_timeout
+# Recycle connections before the server or a proxy drops them for idling
+DB_POOL_RECYCLE = settings.db_pool_recycle
+DB_POOL_PRE_PING = settings.db_pool_pre_ping
+# Per statement timeout in milliseconds, 0 to disable
+DB_STATEMENT_TIMEOUT = settings.db_statement_timeout
+STICKY_PRIMARY_SECONDS = settings.sticky_primary_seconds
+
+POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out",
+    "Connections currently checked out of the pool.",
+    labelnames=("engine",)
+)
+POOL_OVERFLOW = Gauge(
+    "db_pool_overflow",
+    "Connections open beyond the pool size.",
+    labelnames=("engine",)
+)
+POOL_CONNECTS = Counter(
+    "db_pool_connects_total",
+    "New database connections opened by the pool.",
+    labelnames=("engine",)
+)
+POOL_INVALIDATIONS = Counter(
+    "db_pool_invalidations_total",
+    "Connections discarded after an error or a failed pre-ping.",
+    labelnames=("engine",)
+)
+
+
+def get_async_url(database_url: str):
+    """
+    Maps a plain database url to its async driver.
+
+    postgres urls are served by asyncpg and sqlite urls (used for
+    local testing) by aiosqlite. asyncpg takes the libpq `sslmode`
+    values (disable, allow, prefer, require, verify-ca, verify-full)
+    as its `ssl` connect argument, so the mode is passed through
+    unchanged and keeps its certificate and hostname checks.
+    """
+    url = make_url(database_url)
+    connect_args = {}
+
+    if url.drivername in ("postgres", "postgresql", "postgresql+psycopg2"):
+        url = url.set(drivername="postgresql+asyncpg")
+        sslmode = url.query.get("sslmode")
+        if sslmode:
+            url = url.difference_update_query(["sslmode"])
+            connect_args["ssl"] = sslmode
+    elif url.drivername == "sqlite":
+        url = url.set(drivername="sqlite+aiosqlite")
 
-load_dotenv()
+    return url, connect_args
 
-# SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
 
-SQLALCHEMY_DATABASE_URL = os.getenv("POSTGRES_URL")
+def _instrument_pool(engine, name: str):
+    pool = engine.sync_engine.pool
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    def update_usage(*args):
+        POOL_CHECKED_OUT.labels(name).set(pool.checkedout())
+        POOL_OVERFLOW.labels(name).set(max(pool.overflow(), 0))
+
+    # Only queue pools (postgres) have a size to report
+    if hasattr(pool, "checkedout") and hasattr(pool, "overflow"):
+        event.listen(pool, "checkout", update_usage)
+        event.listen(pool, "checkin", update_usage)
+    event.listen(pool, "connect", lambda *args: POOL_CONNECTS.labels(name).inc())
+    event.listen(pool, "invalidate", lambda *args: POOL_INVALIDATIONS.labels(name).inc())
+
+
+def create_engine(database_url: str, name: str):
+    url, connect_args = get_async_url(database_url)
+    options = {}
+
+    if url.get_backend_name() == "postgresql":
+        options = {
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT,
+            "pool_recycle": DB_POOL_RECYCLE,
+            "pool_pre_ping": DB_POOL_PRE_PING,
+        }
+        if DB_STATEMENT_TIMEOUT:
+            connect_args["server_settings"] = {"statement_timeout": str(DB_STATEMENT_TIMEOUT)}
+
+    database_engine = create_async_engine(url, connect_args=connect_args, **options)
+    _instrument_pool(database_engine, name)
+    return database_engine
+
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, "primary")
+replica_engine = create_engine(DATABASE_REPLICA_URL, "replica") if DATABASE_REPLICA_URL else None
+
+SessionLocal = async_sessionmaker(bind=engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+ReplicaSessionLocal = async_sessionmaker(bind=replica_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False) if replica_engine else None
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
-    try:
+# Clients that wrote within the last STICKY_PRIMARY_SECONDS, by client key
+_recent_writers = LRUCache(100000, sizeof=lambda value: 1, ttl=STICKY_PRIMARY_SECONDS)
+
+
+def _client_key(request: Request) -> str:
+    # The bearer token identifies the user, anonymous clients fall back to their address
+    credentials = request.headers.get("authorization") or (request.client.host if request.client else "")
+    return hashlib.sha256(credentials.encode()).hexdigest()
+
+
+@event.listens_for(Session, "after_commit")
+def _remember_writer(session):
+    client = session.info.get("client")
+    if session.info.pop("wrote", False) and client:
+        _recent_writers.set(client, True)
+
+
+@event.listens_for(Session, "after_flush")
+def _flag_orm_write(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _flag_statement_write(orm_execute_state):
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info["wrote"] = True
+
+
+async def get_db(request: Request):
+    async with SessionLocal() as db:
+        db.sync_session.info["client"] = _client_key(request)
         yield db
-    finally:
-        db.close()
+
+
+async def get_read_db(request: Request):
+    """
+    Session for read-only endpoints: the replica when there is one,
+    unless the client wrote within the last STICKY_PRIMARY_SECONDS.
+    """
+    session_factory = ReplicaSessionLocal
+    if session_factory is None or _recent_writers.get(_client_key(request)):
+        session_factory = SessionLocal
+
+    async with session_factory() as db:
+        yield db
+
+
+def _dialect(db: AsyncSession):
+    return postgresql if db.bind.dialect.name == "postgresql" else sqlite
+
+
+def insert_ignore(db: AsyncSession, model, rows: list, conflict_columns: list):
+    """Builds one INSERT ... ON CONFLICT DO NOTHING statement for many rows."""
+    return _dialect(db).insert(model).values(rows).on_conflict_do_nothing(index_elements=conflict_columns)
+
+
+def upsert(db: AsyncSession, model, rows: list, conflict_columns: list, update_columns: list):
+    """
+    Builds one INSERT ... ON CONFLICT DO UPDATE statement for many rows.
+
+    Parameters:
+        db: the session the statement will run on, to pick the dialect.
+        model: the mapped class to insert into.
+        rows: list of dicts of column values.
+        conflict_columns: columns of the unique constraint rows may clash on.
+        update_columns: columns overwritten when a row already exists.
+    """
+    statement = _dialect(db).insert(model).values(rows)
+    return statement.on_conflict_do_update(
+        index_elements=conflict_columns,
+        set_={column: statement.excluded[column] for column in update_columns}
+    )
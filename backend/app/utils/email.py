@@ -1,50 +1,260 @@
 """
 This module contains logic for sending
 emails to users, using gmail smtp.
+
+Emails are not sent inline: `send_mail` stores them in the
+`email_outbox` table and background workers deliver them in
+batches over a pool of authenticated SMTP connections, retrying
+failures with exponential backoff. Pending emails survive restarts.
 """
 
-from email.message import EmailMessage
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-import ssl, smtplib
-from dotenv import load_dotenv
-import os
+from datetime import datetime, timedelta
+from sqlalchemy import select
+from app.utils.database import SessionLocal
+from app.utils.models import EmailOutbox
+from app.utils.settings import settings
+import queue, asyncio, logging
+
+
+EMAIL_SENDER = settings.email_sender
+EMAIL_PASSWORD = settings.email_password
+
+SMTP_HOST = settings.smtp_host
+SMTP_PORT = settings.smtp_port
+# Set to false to talk plain SMTP, e.g. to a local aiosmtpd server
+SMTP_USE_SSL = settings.smtp_use_ssl
+
+MAIL_WORKERS = settings.mail_workers
+MAIL_POOL_SIZE = settings.mail_pool_size or MAIL_WORKERS
+MAIL_BATCH_SIZE = settings.mail_batch_size
+MAIL_MAX_ATTEMPTS = settings.mail_max_attempts
+MAIL_POLL_INTERVAL = settings.mail_poll_interval
+MAIL_RETRY_BACKOFF = settings.mail_retry_backoff
+# How long a claimed email is hidden from other workers while it is being sent
+MAIL_CLAIM_TIMEOUT = timedelta(minutes=5)
+
+DEFAULT_SUBJECT = 'Welcome to Mother\'s Aid Schools Online Portal'
+
+logger = logging.getLogger(__name__)
+
+
+class SMTPConnectionPool:
+    """Keeps authenticated SMTP connections open for reuse between batches."""
+
+    def __init__(self, size: int):
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def _connect(self):
+        # Only loaded once mail is sent, like the MIME classes in build_message
+        import smtplib, ssl
+
+        if SMTP_USE_SSL:
+            smtp = smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT, context=ssl.create_default_context())
+        else:
+            smtp = smtplib.SMTP(SMTP_HOST, SMTP_PORT)
+        if EMAIL_PASSWORD:
+            smtp.login(EMAIL_SENDER, EMAIL_PASSWORD)
+        return smtp
+
+    def acquire(self):
+        import smtplib
+
+        while True:
+            try:
+                smtp = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            try:
+                # Drop connections the server has closed while idle
+                if smtp.noop()[0] == 250:
+                    return smtp
+            except smtplib.SMTPException:
+                pass
+            self.discard(smtp)
+
+    def release(self, smtp):
+        try:
+            self._idle.put_nowait(smtp)
+        except queue.Full:
+            self.discard(smtp)
 
+    def discard(self, smtp):
+        try:
+            smtp.quit()
+        except Exception:
+            smtp.close()
 
-load_dotenv()
+    def close(self):
+        while True:
+            try:
+                self.discard(self._idle.get_nowait())
+            except queue.Empty:
+                return
 
-EMAIL_SENDER = os.getenv('EMAIL_SENDER')
-EMAIL_PASSWORD = os.getenv('EMAIL_PASSWORD')
 
+pool = SMTPConnectionPool(MAIL_POOL_SIZE)
 
-async def send_mail(email: str, content: str):
+_wakeup = asyncio.Event()
+_workers = []
+
+
+def build_message(email: str, subject: str, content: str) -> str:
+    # The MIME classes pull in most of the email package, only load them once mail is sent
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+
+    em = MIMEMultipart()
+    em['From'] = EMAIL_SENDER
+    em['To'] = email
+    em['Subject'] = subject
+
+    em.attach(MIMEText(content, "html"))
+
+    return em.as_string()
+
+
+def deliver_batch(messages: list) -> dict:
     """
-    Sends email to users.
-    
+    Sends a batch of emails over one pooled connection.
+
+    Parameters:
+        messages: list of (id, recipient, subject, content) tuples.
+
+    Returns a dict of message id to error message, or None if sent.
+    """
+    import smtplib
+
+    results = {}
+    smtp = None
+
+    for message_id, recipient, subject, content in messages:
+        try:
+            if smtp is None:
+                smtp = pool.acquire()
+            smtp.sendmail(EMAIL_SENDER, recipient, build_message(recipient, subject, content))
+            results[message_id] = None
+        except smtplib.SMTPRecipientsRefused as e:
+            results[message_id] = str(e)
+        except (smtplib.SMTPException, OSError) as e:
+            results[message_id] = str(e)
+            # The connection may be broken, start the next message on a fresh one
+            if smtp is not None:
+                pool.discard(smtp)
+                smtp = None
+
+    if smtp is not None:
+        pool.release(smtp)
+
+    return results
+
+
+async def send_mail(email: str, content: str, subject: str = DEFAULT_SUBJECT):
+    """
+    Queues an email for delivery to users.
+
     Parameters:
         email: reciever's email address.
         content: the content of the email to be sent.
+        subject: the subject of the email.
     """
 
-    email_sender = EMAIL_SENDER
-    email_password = EMAIL_PASSWORD
-    email_reciever = email
+    await send_mails([(email, content)], subject=subject)
 
-    subject = 'Welcome to Mother\'s Aid Schools Online Portal'
 
-    em = MIMEMultipart()
-    em['From'] = email_sender
-    em['To'] = email_reciever
-    em['Subject'] = subject
+async def send_mails(messages: list, subject: str = DEFAULT_SUBJECT):
+    """
+    Queues many emails for delivery in one transaction.
 
-    em.attach(MIMEText(content, "html"))
+    Parameters:
+        messages: list of (email, content) tuples.
+        subject: the subject of the emails.
+    """
+
+    async with SessionLocal() as db:
+        db.add_all([
+            EmailOutbox(recipient=email, subject=subject, content=content)
+            for email, content in messages
+        ])
+        await db.commit()
+
+    _wakeup.set()
+
+
+async def _claim_batch() -> list:
+    now = datetime.now()
+
+    async with SessionLocal() as db:
+        outbox = (await db.scalars(
+            select(EmailOutbox)
+            .where(EmailOutbox.status == "pending", EmailOutbox.next_attempt_at <= now)
+            .order_by(EmailOutbox.next_attempt_at)
+            .limit(MAIL_BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+        )).all()
+
+        for message in outbox:
+            message.next_attempt_at = now + MAIL_CLAIM_TIMEOUT
+        await db.commit()
+
+        return [(m.id, m.recipient, m.subject, m.content) for m in outbox]
+
+
+async def _record_results(results: dict):
+    now = datetime.now()
+
+    async with SessionLocal() as db:
+        outbox = (await db.scalars(
+            select(EmailOutbox).where(EmailOutbox.id.in_(results.keys()))
+        )).all()
+
+        for message in outbox:
+            error = results[message.id]
+            message.attempts = (message.attempts or 0) + 1
+            if error is None:
+                message.status = "sent"
+                message.sent_at = now
+                message.last_error = None
+            elif message.attempts >= MAIL_MAX_ATTEMPTS:
+                message.status = "failed"
+                message.last_error = error
+                logger.error("Giving up on email %s to %s: %s", message.id, message.recipient, error)
+            else:
+                message.last_error = error
+                delay = MAIL_RETRY_BACKOFF * 2 ** (message.attempts - 1)
+                message.next_attempt_at = now + timedelta(seconds=delay)
+        await db.commit()
+
+
+async def _worker():
+    while True:
+        _wakeup.clear()
+        try:
+            messages = await _claim_batch()
+            if messages:
+                results = await asyncio.to_thread(deliver_batch, messages)
+                await _record_results(results)
+                continue
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Email worker failed to process the outbox")
+
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=MAIL_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def start_mail_workers():
+    """Starts the background workers that deliver queued emails."""
+    for _ in range(MAIL_WORKERS):
+        _workers.append(asyncio.create_task(_worker()))
 
-    context = ssl.create_default_context()
 
-    with smtplib.SMTP_SSL(
-        'smtp.gmail.com',
-        465,
-        context=context
-    ) as smtp:
-        smtp.login(email_sender, email_password)
-        smtp.sendmail(email_sender, email_reciever, em.as_string())
+async def stop_mail_workers():
+    """Stops the background workers, pending emails stay in the outbox."""
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+    await asyncio.to_thread(pool.close)
@@ -0,0 +1,109 @@
+"""
+This module runs bcrypt password hashing and
+verification in a bounded worker pool, off the event loop.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException, status
+from functools import lru_cache
+from app.utils.settings import settings
+from app.utils.metrics import Counter, Gauge, Histogram
+import asyncio, time
+
+
+# bcrypt releases the GIL while hashing, so a thread pool runs hashes in parallel
+HASHING_WORKERS = settings.hashing_workers
+# Number of hashes allowed to wait for a free worker before requests are rejected
+HASHING_QUEUE_LIMIT = settings.hashing_queue_limit
+
+
+@lru_cache(maxsize=1)
+def pwd_context():
+    # passlib and its bcrypt backend are loaded on the first hash, not at startup
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+executor = ThreadPoolExecutor(max_workers=HASHING_WORKERS, thread_name_prefix="password-hashing")
+
+HASHING_QUEUE_DEPTH = Gauge(
+    "password_hashing_queue_depth",
+    "Password hashing jobs queued or running in the worker pool."
+)
+HASHING_SECONDS = Histogram(
+    "password_hashing_seconds",
+    "Time spent computing a bcrypt hash or verification.",
+    labelnames=("operation",)
+)
+HASHING_REJECTED = Counter(
+    "password_hashing_rejected_total",
+    "Password hashing jobs rejected because the queue was full."
+)
+
+_pending = 0
+
+
+def _hash(password: str) -> str:
+    return pwd_context().hash(password)
+
+
+def _verify(password: str, hashed_password: str) -> bool:
+    return pwd_context().verify(password, hashed_password)
+
+
+def _timed(operation: str, func, *args):
+    start = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        HASHING_SECONDS.labels(operation).observe(time.perf_counter() - start)
+
+
+async def _submit(operation: str, func, *args):
+    global _pending
+
+    if _pending >= HASHING_WORKERS + HASHING_QUEUE_LIMIT:
+        HASHING_REJECTED.inc()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please try again shortly",
+            headers={"Retry-After": "1"},
+        )
+
+    _pending += 1
+    HASHING_QUEUE_DEPTH.set(_pending)
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, _timed, operation, func, *args)
+    finally:
+        _pending -= 1
+        HASHING_QUEUE_DEPTH.set(_pending)
+
+
+async def hash_password(password: str) -> str:
+    """
+    Hashes a password in the hashing pool.
+
+    Raises a 503 error when the pool queue is full.
+    """
+    return await _submit("hash", _hash, password)
+
+
+async def verify_password(password: str, hashed_password: str) -> bool:
+    """
+    Verifies a password against its hash in the hashing pool.
+
+    Raises a 503 error when the pool queue is full.
+    """
+    return await _submit("verify", _verify, password, hashed_password)
+
+
+async def hash_passwords(passwords: list) -> list:
+    """
+    Hashes many passwords in parallel, in waves of HASHING_WORKERS
+    so a bulk job never fills the queue shared with logins.
+    """
+    hashed = []
+    for start in range(0, len(passwords), HASHING_WORKERS):
+        wave = passwords[start:start + HASHING_WORKERS]
+        hashed.extend(await asyncio.gather(*(hash_password(password) for password in wave)))
+    return hashed
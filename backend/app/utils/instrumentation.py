@@ -0,0 +1,182 @@
+"""
+This module measures requests: latency and response size per route,
+the SQL queries each request runs (through engine event hooks) and
+the event loop lag. Everything is recorded in app.utils.metrics and
+served at /metrics.
+
+Requests slower than SLOW_REQUEST_SECONDS are logged together with
+the statements they executed.
+"""
+
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import event
+from app.utils.metrics import Counter, Gauge, Histogram
+from app.utils.settings import settings
+import asyncio, logging, time
+
+
+SLOW_REQUEST_SECONDS = settings.slow_request_seconds
+LOOP_LAG_INTERVAL = settings.loop_lag_interval
+
+# Statements kept per request for the slow request log
+MAX_LOGGED_STATEMENTS = 50
+
+logger = logging.getLogger(__name__)
+
+REQUEST_SECONDS = Histogram(
+    "http_request_seconds",
+    "Time spent handling a request, until the last byte of the response.",
+    labelnames=("method", "route", "status")
+)
+RESPONSE_BYTES = Histogram(
+    "http_response_bytes",
+    "Size of response bodies.",
+    labelnames=("method", "route"),
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "Requests being handled."
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries",
+    "Number of SQL statements executed by a request.",
+    labelnames=("method", "route"),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100)
+)
+REQUEST_DB_SECONDS = Histogram(
+    "http_request_db_seconds",
+    "Time a request spent waiting on SQL statements.",
+    labelnames=("method", "route")
+)
+QUERY_SECONDS = Histogram(
+    "db_query_seconds",
+    "Time spent executing a single SQL statement."
+)
+SLOW_REQUESTS = Counter(
+    "http_slow_requests_total",
+    "Requests slower than SLOW_REQUEST_SECONDS.",
+    labelnames=("method", "route")
+)
+LOOP_LAG = Gauge(
+    "event_loop_lag_seconds",
+    "How late the last event loop lag probe woke up."
+)
+LOOP_LAG_SECONDS = Histogram(
+    "event_loop_lag_probe_seconds",
+    "How late event loop lag probes wake up.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+
+
+class RequestStats:
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.statements = []
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    QUERY_SECONDS.observe(elapsed)
+
+    # SQLAlchemy runs the async drivers in a greenlet that shares the request's context
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+        if len(stats.statements) < MAX_LOGGED_STATEMENTS:
+            stats.statements.append((elapsed, statement))
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    starts = exception_context.connection.info.get("query_start") if exception_context.connection else None
+    if starts:
+        starts.pop()
+
+
+def instrument_engine(engine):
+    """Counts and times the statements run on an async engine."""
+    sync_engine = engine.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
+
+
+def _route(scope) -> str:
+    # The path template, so /admin/news/{news_id} is one series and not one per id
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI middleware, so streamed responses are timed and measured until their last chunk."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        start = time.perf_counter()
+        status_code = 500
+        response_bytes = 0
+
+        async def send_wrapper(message):
+            nonlocal status_code, response_bytes
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        REQUESTS_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_PROGRESS.dec()
+            _request_stats.reset(token)
+            self._record(scope, stats, status_code, response_bytes, time.perf_counter() - start)
+
+    def _record(self, scope, stats: RequestStats, status_code: int, response_bytes: int, elapsed: float):
+        method, route = scope["method"], _route(scope)
+
+        REQUEST_SECONDS.labels(method, route, status_code).observe(elapsed)
+        RESPONSE_BYTES.labels(method, route).observe(response_bytes)
+        REQUEST_QUERIES.labels(method, route).observe(stats.queries)
+        REQUEST_DB_SECONDS.labels(method, route).observe(stats.db_seconds)
+
+        if elapsed >= SLOW_REQUEST_SECONDS:
+            SLOW_REQUESTS.labels(method, route).inc()
+            statements = "\n".join(
+                f"  [{duration * 1000:.1f} ms] {' '.join(statement.split())}"
+                for duration, statement in stats.statements
+            )
+            logger.warning(
+                "Slow request %s %s (%s): %.3fs, %d queries taking %.3fs\n%s",
+                method, scope["path"], route, elapsed, stats.queries, stats.db_seconds, statements
+            )
+
+
+async def monitor_loop_lag():
+    """Sleeps LOOP_LAG_INTERVAL at a time and records how late it wakes up."""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        lag = max(loop.time() - start - LOOP_LAG_INTERVAL, 0)
+        LOOP_LAG.set(lag)
+        LOOP_LAG_SECONDS.observe(lag)
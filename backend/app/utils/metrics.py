@@ -0,0 +1,153 @@
+"""
+This module contains lightweight in-process metrics
+(counters, gauges and histograms) shared across the app.
+"""
+
+import threading
+
+
+REGISTRY = {}
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _CounterValue:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+
+class _GaugeValue(_CounterValue):
+    def set(self, value: float):
+        with self._lock:
+            self.value = value
+
+    def dec(self, amount: float = 1):
+        self.inc(-amount)
+
+
+class _HistogramValue:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self.sum += value
+            self.count += 1
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[index] += 1
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.children = {}
+        self._lock = threading.Lock()
+        REGISTRY[name] = self
+
+    def _new_value(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """Returns the value tracked for the given label values."""
+        key = tuple(str(value) for value in values)
+        with self._lock:
+            child = self.children.get(key)
+            if child is None:
+                child = self.children[key] = self._new_value()
+        return child
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_value(self):
+        return _CounterValue()
+
+    def inc(self, amount: float = 1):
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_value(self):
+        return _GaugeValue()
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+    def inc(self, amount: float = 1):
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1):
+        self.labels().dec(amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_value(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def render() -> str:
+    """Renders every registered metric in the Prometheus text format."""
+    lines = []
+    for metric in list(REGISTRY.values()):
+        documentation = metric.documentation.replace("\\", "\\\\").replace("\n", "\\n")
+        lines.append(f"# HELP {metric.name} {documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+
+        with metric._lock:
+            children = list(metric.children.items())
+        for values, child in children:
+            if isinstance(child, _HistogramValue):
+                with child._lock:
+                    counts, total, count = list(child.counts), child.sum, child.count
+                for bound, bucket_count in zip(child.buckets, counts):
+                    bucket_labels = _labels(metric.labelnames, values, 'le="%s"' % bound)
+                    lines.append(f"{metric.name}_bucket{bucket_labels} {bucket_count}")
+                bucket_labels = _labels(metric.labelnames, values, 'le="+Inf"')
+                lines.append(f"{metric.name}_bucket{bucket_labels} {count}")
+                lines.append(f"{metric.name}_sum{_labels(metric.labelnames, values)} {_number(total)}")
+                lines.append(f"{metric.name}_count{_labels(metric.labelnames, values)} {count}")
+            else:
+                lines.append(f"{metric.name}{_labels(metric.labelnames, values)} {_number(child.value)}")
+
+    return "\n".join(lines) + "\n"
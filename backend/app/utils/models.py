@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Date, Boolean, Text, DateTime, LargeBinary, Float
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, ForeignKey, Date, Boolean, Text, DateTime, LargeBinary, Float, Index, UniqueConstraint, DDL, event, func
+from sqlalchemy.orm import relationship, deferred
 from datetime import datetime
 from datetime import UTC
 from app.utils.database import Base
@@ -22,25 +22,41 @@ class Student(Base):
     date_admitted = Column(Date)
     hashed_password = Column(String)
     profile_image_url = Column(String, nullable=True)
-    profile_image = Column(LargeBinary, nullable=True)
+    # Blob columns are only loaded by the endpoints serving them (see `undefer`)
+    profile_image = deferred(Column(LargeBinary, nullable=True), raiseload=True)  # Legacy, see profile_image_hash
+    profile_image_hash = Column(String, nullable=True)  # Key in the blob store
     image_type = Column(String, nullable=True)
     state_of_origin = Column(String)
     local_government = Column(String)
 
     report_cards = relationship("ReportCard", back_populates="student")
 
+# Last admission number given out per year, maintained by app.utils.admissions
+class AdmissionSequence(Base):
+    __tablename__ = "admission_sequences"
+
+    year_prefix = Column(String, primary_key=True)  # e.g. "25" for 2025
+    last_number = Column(Integer, nullable=False)
+
 class ReportCard(Base):
     __tablename__ = "report_cards"
+    __table_args__ = (
+        Index("ix_report_cards_class_session_term", "class_name", "session", "term"),
+        Index("ix_report_cards_student_session", "student_id", "session"),
+    )
 
     id = Column(String(80), primary_key=True, index=True)
     student_id = Column(String, ForeignKey("students.admission_number"))
     term = Column(String)  # First, Second, Third
     session = Column(String)  # e.g. "2023/2024"
     class_name = Column(String)  # e.g. "JSS1", "SSS3"
-    position_in_class = Column(Integer, nullable=True)
-    total_students = Column(Integer, nullable=True)
+    position_in_class = Column(Integer, nullable=True)  # Computed by app.utils.ranking
+    total_students = Column(Integer, nullable=True)  # Computed by app.utils.ranking
+    total_score = Column(Integer, nullable=True)  # Computed by app.utils.ranking
+    average_score = Column(Float, nullable=True)  # Computed by app.utils.ranking
     attendance = Column(Integer)
     date_generated = Column(Date)
+    version = Column(Integer, default=1)  # Bumped on every edit to the card, its subjects or comments
 
     teacher_name = Column(String, nullable=True)
     principal_name = Column(String, nullable=True)
@@ -51,8 +67,50 @@ class ReportCard(Base):
     subjects = relationship("SubjectScore", back_populates="report_card")
     comments = relationship("TeacherComment", back_populates="report_card")
 
+# Class wide statistics for a term, maintained by app.utils.ranking
+class ClassResult(Base):
+    __tablename__ = "class_results"
+
+    class_name = Column(String, primary_key=True)
+    session = Column(String, primary_key=True)
+    term = Column(String, primary_key=True)
+    total_students = Column(Integer)
+    class_average = Column(Float, nullable=True)
+    highest_average = Column(Float, nullable=True)
+    lowest_average = Column(Float, nullable=True)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+# Per subject statistics of a class for a term, maintained by app.utils.analytics
+class SubjectResult(Base):
+    __tablename__ = "subject_results"
+
+    class_name = Column(String, primary_key=True)
+    session = Column(String, primary_key=True)
+    term = Column(String, primary_key=True)
+    subject_name = Column(String, primary_key=True)
+    total_students = Column(Integer)
+    score_sum = Column(Integer)
+    score_sum_squares = Column(Integer)  # For the standard deviation
+    passed = Column(Integer)
+    highest_score = Column(Integer)
+    lowest_score = Column(Integer)
+
+# Number of each grade given in a subject of a class for a term, maintained by app.utils.analytics
+class SubjectGradeCount(Base):
+    __tablename__ = "subject_grade_counts"
+
+    class_name = Column(String, primary_key=True)
+    session = Column(String, primary_key=True)
+    term = Column(String, primary_key=True)
+    subject_name = Column(String, primary_key=True)
+    grade = Column(String, primary_key=True)
+    count = Column(Integer)
+
 class SubjectScore(Base):
     __tablename__ = "subject_scores"
+    __table_args__ = (
+        UniqueConstraint("report_card_id", "subject_name", name="uq_subject_scores_report_card_subject"),
+    )
 
     id = Column(String(80), primary_key=True, index=True)
     report_card_id = Column(String, ForeignKey("report_cards.id"))
@@ -62,11 +120,15 @@ class SubjectScore(Base):
     total_score = Column(Integer)
     grade = Column(String)
     teacher_remark = Column(String)
+    position = Column(Integer, nullable=True)  # Position in the class for this subject
 
     report_card = relationship("ReportCard", back_populates="subjects")
 
 class TeacherComment(Base):
     __tablename__ = "teacher_comments"
+    __table_args__ = (
+        UniqueConstraint("report_card_id", "comment_type", name="uq_teacher_comments_report_card_type"),
+    )
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     report_card_id = Column(String, ForeignKey("report_cards.id"))
@@ -81,12 +143,14 @@ class ReadingMaterial(Base):
     id = Column(String, default=str(uuid.uuid4()), primary_key=True, index=True)
     title = Column(String, index=True)
     description = Column(Text)
-    file_content = Column(LargeBinary)  # Store file as binary
+    file_content = deferred(Column(LargeBinary), raiseload=True)  # Legacy, see file_hash
+    file_hash = Column(String, nullable=True)  # Key in the blob store
+    file_size = Column(Integer, nullable=True)
     file_type = Column(String)  # Store content type
     file_name = Column(String)
     subject = Column(String)
     class_assigned = Column(String)  # e.g. "JSS1", "SSS3"
-    upload_date = Column(DateTime, default=datetime.now(tz=UTC))
+    upload_date = Column(DateTime, default=lambda: datetime.now(tz=UTC).replace(tzinfo=None))  # UTC
     term = Column(String)
     session = Column(String)
     is_active = Column(Boolean, default=True)
@@ -110,10 +174,79 @@ class Admin(Base):
 class News(Base):
     __tablename__ = "news"
 
-    id = Column(String, default=str(uuid.uuid4()), primary_key=True, index=True)
+    id = Column(String, default=lambda: str(uuid.uuid4()), primary_key=True, index=True)
     title = Column(String, index=True)
     content = Column(Text)
-    cover_image = Column(LargeBinary)  # Store image as binary
+    cover_image = deferred(Column(LargeBinary), raiseload=True)  # Legacy, see cover_image_hash
+    cover_image_hash = Column(String, nullable=True)  # Key in the blob store
     image_type = Column(String)  # Store image mime type
     date_uploaded = Column(DateTime, default=datetime.now)
     uploaded_by = Column(Integer, ForeignKey("admin.id"))
+
+# Report card batch jobs, so every worker can report on them and serve their result (see app.utils.report_batches)
+class ReportBatch(Base):
+    __tablename__ = "report_batches"
+
+    id = Column(String, primary_key=True)
+    class_name = Column(String)
+    session = Column(String)
+    term = Column(String)
+    output = Column(String)  # "zip" or "pdf"
+    status = Column(String, default="running")  # "running", "completed", "failed"
+    total = Column(Integer)
+    completed = Column(Integer, default=0)
+    failed = Column(Text, default="[]")  # JSON list of error messages
+    result_key = Column(String, nullable=True)  # Key of the finished ZIP or merged PDF in the blob store
+    created_at = Column(DateTime, default=lambda: datetime.now(tz=UTC).replace(tzinfo=None))  # UTC
+
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        Index("ix_email_outbox_status_next_attempt", "status", "next_attempt_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    recipient = Column(String)
+    subject = Column(String)
+    content = Column(Text)
+    status = Column(String, default="pending")  # "pending", "sent", "failed"
+    attempts = Column(Integer, default=0)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.now)
+    next_attempt_at = Column(DateTime, default=datetime.now)
+    sent_at = Column(DateTime, nullable=True)
+
+
+# Search indexes, used by app.utils.search on postgres only
+event.listen(
+    Base.metadata, "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql")
+)
+
+
+def search_vector(*columns):
+    """The full text document of `columns`, the search queries must use the same expression."""
+    document = func.coalesce(columns[0], "")
+    for column in columns[1:]:
+        document = document + " " + func.coalesce(column, "")
+    return func.to_tsvector("simple", document)
+
+
+def _trigram_index(name: str, column):
+    return Index(name, column, postgresql_using="gin", postgresql_ops={column.key: "gin_trgm_ops"}).ddl_if(dialect="postgresql")
+
+
+_trigram_index("ix_students_full_name_trgm", Student.full_name)
+_trigram_index("ix_students_admission_number_trgm", Student.admission_number)
+_trigram_index("ix_reading_materials_title_trgm", ReadingMaterial.title)
+_trigram_index("ix_news_title_trgm", News.title)
+Index(
+    "ix_reading_materials_search",
+    search_vector(ReadingMaterial.title, ReadingMaterial.description),
+    postgresql_using="gin"
+).ddl_if(dialect="postgresql")
+Index(
+    "ix_news_search",
+    search_vector(News.title, News.content),
+    postgresql_using="gin"
+).ddl_if(dialect="postgresql")
@@ -0,0 +1,111 @@
+"""
+This module caches the public news responses (the listing pages
+and single articles) as serialized JSON bytes.
+
+An entry is fresh for NEWS_CACHE_TTL seconds. After that it is still
+served for up to NEWS_CACHE_STALE_SECONDS while one background task
+reloads it, so visitors never wait on a refresh. Concurrent misses
+for the same key share one load. The news write endpoints call
+`invalidate_news_cache`, which drops every entry and discards loads
+that started before the write.
+
+Loads always read from the primary: a fill right after a write must
+not pick up the replica's older rows and keep them for a whole TTL.
+"""
+
+from typing import Awaitable, Callable, Optional
+from fastapi import Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.utils.cache import LRUCache
+from app.utils.database import SessionLocal
+from app.utils.settings import settings
+import asyncio, logging, time
+
+
+NEWS_CACHE_TTL = settings.news_cache_ttl
+NEWS_CACHE_STALE_SECONDS = settings.news_cache_stale_seconds
+NEWS_CACHE_BYTES = settings.news_cache_bytes
+# Larger pages are served uncached
+NEWS_CACHE_MAX_ENTRY_BYTES = settings.news_cache_max_entry_bytes
+# Except the whole feed (a listing without a limit), the default of GET /admin/news
+NEWS_CACHE_FEED_BYTES = settings.news_cache_feed_bytes
+
+logger = logging.getLogger(__name__)
+
+
+class CachedResponse:
+    def __init__(self, body: bytes, headers: Optional[dict]):
+        self.body = body
+        self.headers = headers
+        self.loaded_at = time.monotonic()
+
+    def response(self) -> Response:
+        return Response(self.body, media_type="application/json", headers=self.headers)
+
+
+_cache = LRUCache(
+    NEWS_CACHE_BYTES,
+    sizeof=lambda entry: len(entry.body),
+    ttl=NEWS_CACHE_TTL + NEWS_CACHE_STALE_SECONDS
+)
+# Loads in progress per key, shared by concurrent misses and refreshes
+_loading = {}
+# Bumped by every invalidation, a load only stores its result if it is unchanged
+_generation = 0
+
+# Builds the response from the session it is given
+Loader = Callable[[AsyncSession], Awaitable[Response]]
+
+
+async def _load(key, loader: Loader, max_entry_bytes: int) -> CachedResponse:
+    generation = _generation
+    try:
+        async with SessionLocal() as db:
+            response = await loader(db)
+    finally:
+        if _loading.get(key) is asyncio.current_task():
+            del _loading[key]
+
+    headers = {
+        name: value for name, value in response.headers.items()
+        if name not in ("content-length", "content-type")
+    }
+    entry = CachedResponse(response.body, headers or None)
+    if (generation == _generation and response.status_code == 200
+            and len(entry.body) <= max_entry_bytes):
+        _cache.set(key, entry)
+    return entry
+
+
+def _start_load(key, loader: Loader, max_entry_bytes: int) -> asyncio.Task:
+    task = _loading.get(key)
+    if task is None:
+        task = _loading[key] = asyncio.create_task(_load(key, loader, max_entry_bytes))
+    return task
+
+
+def _log_refresh_error(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning("Refreshing a cached news response failed", exc_info=task.exception())
+
+
+async def cached_response(key, loader: Loader, max_entry_bytes: int = NEWS_CACHE_MAX_ENTRY_BYTES) -> Response:
+    """
+    Returns the cached response for `key`, calling `loader(db)` to
+    build it on a miss. Only 200 responses up to `max_entry_bytes` are
+    stored, and a loader raising HTTPException (e.g. a 404) caches nothing.
+    """
+    entry = _cache.get(key)
+    if entry is None:
+        # shield, so a visitor disconnecting does not cancel the load others wait on
+        entry = await asyncio.shield(_start_load(key, loader, max_entry_bytes))
+    elif time.monotonic() - entry.loaded_at > NEWS_CACHE_TTL and key not in _loading:
+        _start_load(key, loader, max_entry_bytes).add_done_callback(_log_refresh_error)
+    return entry.response()
+
+
+def invalidate_news_cache():
+    global _generation
+    _generation += 1
+    _cache.clear()
+    _loading.clear()
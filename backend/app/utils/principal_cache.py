@@ -0,0 +1,120 @@
+"""
+This module caches the admin and student rows resolved
+by the authentication dependencies, keyed by the token subject.
+
+Entries live for PRINCIPAL_CACHE_TTL seconds and are removed
+explicitly by the endpoints that change or delete a principal.
+By default the cache is in process; set PRINCIPAL_CACHE_URL to a
+redis url to share it (and its invalidations) between workers.
+"""
+
+from datetime import date, datetime
+from typing import Optional
+from sqlalchemy import select, inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.utils.cache import LRUCache
+from app.utils.settings import settings
+import json
+
+
+PRINCIPAL_CACHE_TTL = settings.principal_cache_ttl
+PRINCIPAL_CACHE_SIZE = settings.principal_cache_size
+PRINCIPAL_CACHE_URL = settings.principal_cache_url
+
+# Never copied into the cache
+EXCLUDED_COLUMNS = {"hashed_password"}
+
+
+class LocalPrincipalBackend:
+    def __init__(self, size: int, ttl: float):
+        self._cache = LRUCache(size, sizeof=lambda value: 1, ttl=ttl)
+
+    async def get(self, key: str) -> Optional[dict]:
+        return self._cache.get(key)
+
+    async def set(self, key: str, values: dict):
+        self._cache.set(key, values)
+
+    async def delete(self, key: str):
+        self._cache.delete(key)
+
+
+class RedisPrincipalBackend:
+    def __init__(self, url: str, ttl: float):
+        try:
+            import redis.asyncio as redis  # Only needed for the shared backend
+        except ImportError:
+            raise RuntimeError("redis is required when PRINCIPAL_CACHE_URL is set")
+        self._client = redis.from_url(url)
+        self._ttl = ttl
+
+    async def get(self, key: str) -> Optional[dict]:
+        value = await self._client.get(f"principal:{key}")
+        return None if value is None else json.loads(value)
+
+    async def set(self, key: str, values: dict):
+        await self._client.set(f"principal:{key}", json.dumps(values), px=int(self._ttl * 1000))
+
+    async def delete(self, key: str):
+        await self._client.delete(f"principal:{key}")
+
+
+def get_principal_backend():
+    if PRINCIPAL_CACHE_URL:
+        return RedisPrincipalBackend(PRINCIPAL_CACHE_URL, PRINCIPAL_CACHE_TTL)
+    return LocalPrincipalBackend(PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL)
+
+
+backend = get_principal_backend()
+
+
+def _cached_columns(model):
+    mapper = inspect(model)
+    return [
+        column for column in mapper.column_attrs
+        if column.key not in EXCLUDED_COLUMNS and not column.deferred
+    ]
+
+
+def _snapshot(instance) -> dict:
+    values = {}
+    for column in _cached_columns(type(instance)):
+        value = getattr(instance, column.key)
+        values[column.key] = value.isoformat() if isinstance(value, (date, datetime)) else value
+    return values
+
+
+def _restore(model, values: dict):
+    restored = {}
+    for column in _cached_columns(model):
+        value = values.get(column.key)
+        python_type = column.columns[0].type.python_type
+        if value is not None and python_type in (date, datetime):
+            value = python_type.fromisoformat(value)
+        restored[column.key] = value
+    # A detached copy, it is only read by the endpoints
+    return model(**restored)
+
+
+def _key(model, subject: str) -> str:
+    return f"{model.__tablename__}:{subject}"
+
+
+async def get_principal(db: AsyncSession, model, key_column, subject: str):
+    """
+    Returns the principal whose `key_column` equals the token subject,
+    from the cache when possible, or None if it does not exist.
+    """
+    values = await backend.get(_key(model, subject))
+    if values is not None:
+        return _restore(model, values)
+
+    principal = await db.scalar(select(model).where(key_column == subject))
+    if principal is not None:
+        await backend.set(_key(model, subject), _snapshot(principal))
+    return principal
+
+
+async def invalidate_principal(model, subject: str):
+    """Drops a cached principal after it is changed or deleted."""
+    await backend.delete(_key(model, subject))
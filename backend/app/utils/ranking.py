@@ -0,0 +1,158 @@
+"""
+This module computes report card totals, averages, class
+positions, per-subject positions and class statistics.
+
+Everything is done with set-based SQL (aggregates and RANK()
+window functions) so a class is ranked in a handful of statements.
+Ties share a position and the next one is skipped (1, 1, 3).
+
+When a subject score changes only that card's totals and the
+rankings of the changed subjects are recomputed; the overall
+positions are then re-ranked from the stored averages of the
+other cards instead of re-summing their subjects. Cards whose
+position changes get a new version so their cached PDFs are
+re-rendered. The subject aggregates of app.utils.analytics are
+refreshed alongside, for the same subjects.
+"""
+
+from datetime import datetime
+from typing import Iterable, Optional
+from sqlalchemy import select, update, func, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.utils.database import upsert
+from app.utils.models import ReportCard, SubjectScore, ClassResult
+from app.utils.analytics import refresh_subject_results
+
+
+def _in_class(class_name: str, session: str, term: str):
+    return (
+        ReportCard.class_name == class_name,
+        ReportCard.session == session,
+        ReportCard.term == term,
+    )
+
+
+async def refresh_card_totals(db: AsyncSession, report_card_ids: Optional[list] = None, class_key: Optional[tuple] = None):
+    """Recomputes total and average score of the given cards, or of a whole class."""
+    total = select(func.sum(SubjectScore.total_score))\
+        .where(SubjectScore.report_card_id == ReportCard.id)\
+        .scalar_subquery()
+    average = select(func.round(func.avg(SubjectScore.total_score), 2))\
+        .where(SubjectScore.report_card_id == ReportCard.id)\
+        .scalar_subquery()
+
+    statement = update(ReportCard).values(total_score=total, average_score=average)
+    if report_card_ids is not None:
+        statement = statement.where(ReportCard.id.in_(report_card_ids))
+    else:
+        statement = statement.where(*_in_class(*class_key))
+
+    await db.execute(statement.execution_options(synchronize_session=False))
+
+
+async def refresh_subject_positions(db: AsyncSession, class_name: str, session: str, term: str, subject_names: Optional[Iterable[str]] = None):
+    """Ranks the class on each subject, limited to `subject_names` when given."""
+    ranked = select(
+        SubjectScore.id,
+        func.rank().over(
+            partition_by=SubjectScore.subject_name,
+            order_by=SubjectScore.total_score.desc()
+        ).label("position")
+    ).join(ReportCard, ReportCard.id == SubjectScore.report_card_id)\
+        .where(*_in_class(class_name, session, term))
+    if subject_names is not None:
+        ranked = ranked.where(SubjectScore.subject_name.in_(list(subject_names)))
+    ranked = ranked.subquery()
+
+    changed_cards = (await db.execute(
+        update(SubjectScore)
+        .where(SubjectScore.id == ranked.c.id)
+        .where(SubjectScore.position.is_distinct_from(ranked.c.position))
+        .values(position=ranked.c.position)
+        .returning(SubjectScore.report_card_id)
+        .execution_options(synchronize_session=False)
+    )).scalars().all()
+
+    await _bump_versions(db, set(changed_cards))
+
+
+async def refresh_class_positions(db: AsyncSession, class_name: str, session: str, term: str):
+    """Ranks the class on the stored averages and refreshes the class statistics."""
+    ranked = select(
+        ReportCard.id,
+        func.rank().over(order_by=ReportCard.average_score.desc().nulls_last()).label("position"),
+        func.count().over().label("total_students")
+    ).where(*_in_class(class_name, session, term)).subquery()
+
+    changed_cards = (await db.execute(
+        update(ReportCard)
+        .where(ReportCard.id == ranked.c.id)
+        .where(or_(
+            ReportCard.position_in_class.is_distinct_from(ranked.c.position),
+            ReportCard.total_students.is_distinct_from(ranked.c.total_students)
+        ))
+        .values(position_in_class=ranked.c.position, total_students=ranked.c.total_students)
+        .returning(ReportCard.id)
+        .execution_options(synchronize_session=False)
+    )).scalars().all()
+
+    await _bump_versions(db, set(changed_cards))
+
+    stats = (await db.execute(
+        select(
+            func.count(ReportCard.id),
+            func.round(func.avg(ReportCard.average_score), 2),
+            func.max(ReportCard.average_score),
+            func.min(ReportCard.average_score)
+        ).where(*_in_class(class_name, session, term))
+    )).one()
+
+    await db.execute(upsert(
+        db, ClassResult,
+        [{
+            "class_name": class_name,
+            "session": session,
+            "term": term,
+            "total_students": stats[0],
+            "class_average": stats[1],
+            "highest_average": stats[2],
+            "lowest_average": stats[3],
+            "updated_at": datetime.now(),
+        }],
+        conflict_columns=["class_name", "session", "term"],
+        update_columns=["total_students", "class_average", "highest_average", "lowest_average", "updated_at"]
+    ))
+
+
+async def _bump_versions(db: AsyncSession, report_card_ids: set):
+    if report_card_ids:
+        await db.execute(
+            update(ReportCard)
+            .where(ReportCard.id.in_(report_card_ids))
+            .values(version=func.coalesce(ReportCard.version, 1) + 1)
+            .execution_options(synchronize_session=False)
+        )
+
+
+async def refresh_rankings(db: AsyncSession, report_card: ReportCard, subject_names: Optional[Iterable[str]] = None):
+    """
+    Incrementally refreshes rankings after a card's subjects changed.
+
+    Parameters:
+        report_card: the card whose subject scores changed.
+        subject_names: the subjects that changed, or None for all.
+    """
+    class_key = (report_card.class_name, report_card.session, report_card.term)
+
+    await refresh_card_totals(db, report_card_ids=[report_card.id])
+    await refresh_subject_positions(db, *class_key, subject_names=subject_names)
+    await refresh_class_positions(db, *class_key)
+    await refresh_subject_results(db, *class_key, subject_names=subject_names)
+
+
+async def recompute_class(db: AsyncSession, class_name: str, session: str, term: str):
+    """Recomputes every total, average and position of a class from scratch."""
+    await refresh_card_totals(db, class_key=(class_name, session, term))
+    await refresh_subject_positions(db, class_name, session, term)
+    await refresh_class_positions(db, class_name, session, term)
+    await refresh_subject_results(db, class_name, session, term)
@@ -0,0 +1,310 @@
+"""
+This module renders the report cards of a whole class in a
+process pool and tracks the progress of each batch job.
+
+Finished cards are collected as they come out of the pool, so a ZIP
+download from the worker running the job can stream them while the
+rest of the class is rendering.
+
+The job's progress is kept in the `report_batches` table and the
+finished ZIP or merged PDF in the blob store, so with several
+workers any of them can report on a job and serve its result once
+it is complete. Jobs are dropped after REPORT_BATCH_TTL seconds.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, UTC
+from io import BytesIO
+from typing import Optional
+from sqlalchemy import select, update, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.utils.database import SessionLocal
+from app.utils.models import ReportBatch
+from app.utils.report_pdf import render_report_card, get_cached_pdf, store_pdf
+from app.utils.storage import blob_store
+from app.utils.settings import settings
+import asyncio, hashlib, json, logging, multiprocessing, time, uuid, zipfile
+
+
+REPORT_RENDER_WORKERS = settings.report_render_workers
+REPORT_BATCH_TTL = settings.report_batch_ttl
+
+# Progress is written to the database at most this often, and when the job ends
+PROGRESS_INTERVAL = 1.0
+
+logger = logging.getLogger(__name__)
+
+# Jobs running or recently finished on this worker
+jobs = {}
+
+_executor = None
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn rather than fork, the server process has running threads and an event loop
+        _executor = ProcessPoolExecutor(
+            max_workers=REPORT_RENDER_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _executor
+
+
+def shutdown_render_pool():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(cancel_futures=True)
+        _executor = None
+
+
+def merge_pdfs(pdfs: list) -> bytes:
+    from pypdf import PdfWriter
+
+    writer = PdfWriter()
+    for pdf in pdfs:
+        writer.append(BytesIO(pdf))
+    buffer = BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+class ReportBatchJob:
+    def __init__(self, class_name: str, session: str, term: str, output: str, total: int):
+        self.id = str(uuid.uuid4())
+        self.class_name = class_name
+        self.session = session
+        self.term = term
+        self.output = output  # "zip" or "pdf"
+        self.total = total
+        self.files = []  # (position, filename, pdf) in the order they finished
+        self.failed = []
+        self.merged = None
+        self.result_key = None
+        self.status = "running"
+        self.created_at = time.monotonic()
+        self.saved_at = 0.0
+        self.task = None
+        self._condition = asyncio.Condition()
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("completed", "failed")
+
+    def info(self) -> dict:
+        return {
+            "job_id": self.id,
+            "class_name": self.class_name,
+            "session": self.session,
+            "term": self.term,
+            "output": self.output,
+            "status": self.status,
+            "total": self.total,
+            "completed": len(self.files),
+            "failed": self.failed,
+        }
+
+    def row(self) -> ReportBatch:
+        return ReportBatch(
+            id=self.id,
+            class_name=self.class_name,
+            session=self.session,
+            term=self.term,
+            output=self.output,
+            status=self.status,
+            total=self.total,
+            completed=0,
+            failed="[]"
+        )
+
+    async def _notify(self):
+        async with self._condition:
+            self._condition.notify_all()
+
+    async def wait_for_files(self, count: int):
+        """Waits until more than `count` files are rendered or the job is done."""
+        async with self._condition:
+            await self._condition.wait_for(lambda: len(self.files) > count or self.done)
+
+    async def wait_until_done(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.done)
+
+
+async def _render(position: int, cache_key: str, filename: str, data: dict):
+    pdf = await get_cached_pdf(cache_key)
+    if pdf is None:
+        loop = asyncio.get_running_loop()
+        pdf = await loop.run_in_executor(_get_executor(), render_report_card, data)
+        await store_pdf(cache_key, pdf)
+    return position, filename, pdf
+
+
+def build_zip(files: list) -> bytes:
+    buffer = BytesIO()
+    # PDFs are already compressed, storing them keeps zipping cheap
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as archive:
+        for _, filename, pdf in sorted(files):
+            archive.writestr(filename, pdf)
+    return buffer.getvalue()
+
+
+def result_key(job_id: str) -> str:
+    # One blob per job rather than by content, so expiring a job never removes another job's result
+    return hashlib.sha256(f"report-batch:{job_id}".encode()).hexdigest()
+
+
+async def _save_progress(job: ReportBatchJob, force: bool = False):
+    now = time.monotonic()
+    if not force and now - job.saved_at < PROGRESS_INTERVAL:
+        return
+    job.saved_at = now
+
+    try:
+        async with SessionLocal() as db:
+            await db.execute(
+                update(ReportBatch)
+                .where(ReportBatch.id == job.id)
+                .values(
+                    status=job.status,
+                    completed=len(job.files),
+                    failed=json.dumps(job.failed),
+                    result_key=job.result_key
+                )
+            )
+            await db.commit()
+    except Exception:
+        logger.exception("Failed to save the progress of report card batch %s", job.id)
+
+
+async def _run(job: ReportBatchJob, cards: list):
+    tasks = [
+        asyncio.create_task(_render(position, *card))
+        for position, card in enumerate(cards)
+    ]
+
+    try:
+        for task in asyncio.as_completed(tasks):
+            try:
+                job.files.append(await task)
+            except Exception as e:
+                logger.exception("Failed to render a report card in batch %s", job.id)
+                job.failed.append(str(e))
+            await job._notify()
+            await _save_progress(job)
+
+        if job.output == "pdf":
+            ordered = [pdf for _, _, pdf in sorted(job.files)]
+            job.merged = await asyncio.to_thread(merge_pdfs, ordered)
+            result = job.merged
+        else:
+            result = await asyncio.to_thread(build_zip, job.files)
+
+        # For the other workers, this one streams from memory
+        key = result_key(job.id)
+        await blob_store.save_bytes(key, result)
+        job.result_key = key
+        job.status = "completed"
+    except Exception:
+        logger.exception("Report card batch %s failed", job.id)
+        job.status = "failed"
+    finally:
+        await job._notify()
+        await _save_progress(job, force=True)
+
+
+async def _expire_jobs(db: AsyncSession):
+    now = time.monotonic()
+    for job_id, job in list(jobs.items()):
+        if job.done and now - job.created_at > REPORT_BATCH_TTL:
+            del jobs[job_id]
+
+    expired = datetime.now(tz=UTC).replace(tzinfo=None) - timedelta(seconds=REPORT_BATCH_TTL)
+    expired_batches = (await db.execute(
+        select(ReportBatch.id, ReportBatch.result_key)
+        .where(ReportBatch.created_at < expired, ReportBatch.status != "running")
+    )).all()
+    for batch in expired_batches:
+        if batch.result_key:
+            await blob_store.delete(batch.result_key)
+    if expired_batches:
+        await db.execute(delete(ReportBatch).where(ReportBatch.id.in_([batch.id for batch in expired_batches])))
+
+
+async def start_batch(db: AsyncSession, class_name: str, session: str, term: str, output: str, cards: list) -> ReportBatchJob:
+    """
+    Records a batch of report cards and starts rendering it in the background.
+
+    Parameters:
+        db: session the job's row is committed on.
+        cards: list of (cache_key, filename, data) tuples, where data
+            comes from `build_report_card_data`.
+    """
+    await _expire_jobs(db)
+
+    job = ReportBatchJob(class_name, session, term, output, len(cards))
+    db.add(job.row())
+    await db.commit()
+
+    jobs[job.id] = job
+    job.task = asyncio.create_task(_run(job, cards))
+    return job
+
+
+async def get_batch(db: AsyncSession, job_id: str) -> Optional[ReportBatch]:
+    """The stored state of a job, for jobs started by another worker."""
+    return await db.scalar(select(ReportBatch).where(ReportBatch.id == job_id))
+
+
+def batch_info(batch: ReportBatch) -> dict:
+    """Same shape as `ReportBatchJob.info`, from the stored state."""
+    return {
+        "job_id": batch.id,
+        "class_name": batch.class_name,
+        "session": batch.session,
+        "term": batch.term,
+        "output": batch.output,
+        "status": batch.status,
+        "total": batch.total,
+        "completed": batch.completed,
+        "failed": json.loads(batch.failed or "[]"),
+    }
+
+
+class _ZipStream:
+    """Write-only file object collecting zip output between yields."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+async def stream_zip(job: ReportBatchJob):
+    """Yields a ZIP of the job's report cards, adding each one as soon as it is rendered."""
+    stream = _ZipStream()
+
+    # PDFs are already compressed, storing them keeps zipping cheap
+    with zipfile.ZipFile(stream, "w", compression=zipfile.ZIP_STORED) as archive:
+        sent = 0
+        while True:
+            while sent < len(job.files):
+                _, filename, pdf = job.files[sent]
+                archive.writestr(filename, pdf)
+                sent += 1
+                yield stream.take()
+            if job.done:
+                break
+            await job.wait_for_files(sent)
+
+    yield stream.take()
@@ -0,0 +1,234 @@
+"""
+This module renders report card PDFs and caches the results.
+
+Rendered PDFs are cached in memory (LRU, bounded by total bytes) and
+optionally on disk, keyed by the report card's content version, so
+repeat downloads of an unchanged card skip rendering entirely.
+ReportLab is only imported when a card is actually rendered.
+"""
+
+from datetime import date, datetime
+from functools import lru_cache
+from io import BytesIO
+from typing import Optional
+from app.utils.cache import LRUCache
+from app.utils.settings import settings
+import asyncio, glob, hashlib, os
+
+
+REPORT_PDF_CACHE_BYTES = settings.report_pdf_cache_bytes
+# Optional second cache tier on disk, shared by workers on the same host
+REPORT_PDF_CACHE_DIR = settings.report_pdf_cache_dir
+
+LOGO_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "logo-bg.jpeg")
+
+pdf_cache = LRUCache(REPORT_PDF_CACHE_BYTES)
+
+
+@lru_cache(maxsize=1)
+def _logo() -> bytes:
+    with open(LOGO_PATH, "rb") as logo_file:
+        return logo_file.read()
+
+
+@lru_cache(maxsize=1)
+def _styles():
+    from reportlab.lib.styles import getSampleStyleSheet
+    return getSampleStyleSheet()
+
+
+def student_age(date_of_birth: date, today: Optional[date] = None) -> int:
+    today = today or datetime.now().date()
+    return today.year - date_of_birth.year - (
+        (today.month, today.day) < (date_of_birth.month, date_of_birth.day)
+    )
+
+
+def report_card_cache_key(report_card, student) -> str:
+    """
+    Builds the cache key for a report card PDF.
+
+    The key changes when the card's version is bumped (any edit to the
+    card, its subjects or comments) or when the student details printed
+    on the card change, including the student's age.
+    """
+    printed_student = "|".join(str(value) for value in (
+        student.full_name,
+        student.gender,
+        student.date_of_birth,
+        student.admission_number,
+        student_age(student.date_of_birth),
+    ))
+    digest = hashlib.sha256(printed_student.encode()).hexdigest()[:16]
+    return f"{report_card.id}_{report_card.version or 1}_{digest}"
+
+
+def build_report_card_data(report_card, student) -> dict:
+    """Copies what the PDF needs into plain data, so it can be rendered in another process."""
+    return {
+        "class_name": report_card.class_name,
+        "session": report_card.session,
+        "term": report_card.term,
+        "position_in_class": report_card.position_in_class,
+        "total_students": report_card.total_students,
+        "average_score": report_card.average_score,
+        "teacher_name": report_card.teacher_name,
+        "teacher_remark": report_card.teacher_remark,
+        "principal_name": report_card.principal_name,
+        "principal_remark": report_card.principal_remark,
+        "student": {
+            "full_name": student.full_name,
+            "gender": student.gender,
+            "date_of_birth": student.date_of_birth,
+            "admission_number": student.admission_number,
+            "age": student_age(student.date_of_birth),
+        },
+        "subjects": [
+            {
+                "subject_name": subject.subject_name,
+                "ca_score": subject.ca_score,
+                "exam_score": subject.exam_score,
+                "total_score": subject.total_score,
+                "grade": subject.grade,
+                "teacher_remark": subject.teacher_remark,
+                "position": subject.position,
+            }
+            for subject in report_card.subjects
+        ],
+    }
+
+
+def render_report_card(report_card: dict) -> bytes:
+    """Renders a report card built by `build_report_card_data` into PDF bytes."""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
+
+    student = report_card["student"]
+    subjects = report_card["subjects"]
+
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=20, leftMargin=20, topMargin=20, bottomMargin=20)
+    styles = _styles()
+    elements = []
+
+    # SCHOOL HEADER
+    logo = Image(BytesIO(_logo()), width=100, height=100)
+    school_name = Paragraph("""<font size=30><b>MOTHER'S AID SCHOOLS</b></font><br/><font size=15>STUDENT'S OFFICIAL ACADEMIC REPORT</font><br/><font size=10>Achieving Intellectual and Personal Excellence</font>""", styles['Title'])
+    header_table = Table([[logo, school_name]], colWidths=[80, 500])
+    header_table.setStyle(TableStyle([
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('LEFTPADDING', (1, 0), (1, 0), 10),
+    ]))
+    elements.append(header_table)
+    elements.append(Spacer(1, 12))
+
+    # STUDENT INFO TABLE
+    student_info = [
+        ['NAME', student["full_name"], 'GENDER', student["gender"]],
+        ['CLASS', report_card["class_name"], 'SESSION', report_card["session"]],
+        ['D.O.B', student["date_of_birth"], 'AGE', str(student["age"])],
+        ['TERM', report_card["term"], 'ADMISSION NO.', student["admission_number"]],
+    ]
+    student_table = Table(student_info, colWidths=[60, 150, 120, 150])
+    student_table.setStyle(TableStyle([
+        ('GRID', (0, 0), (-1, -1), 0.25, colors.black),
+        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey)
+    ]))
+    elements.append(student_table)
+    elements.append(Spacer(1, 10))
+
+    # SUBJECT SCORES TABLE (COGNITIVE DOMAIN)
+    subject_data = [['SUBJECTS', 'C.A', 'EXAM', 'TOTAL', 'GRADE', 'POSITION', 'REMARKS']]
+    for subject in subjects:
+        subject_data.append([
+            subject["subject_name"],
+            subject["ca_score"],
+            subject["exam_score"],
+            subject["total_score"],
+            subject["grade"],
+            subject.get("position") or "-",
+            subject["teacher_remark"]
+        ])
+    subject_table = Table(subject_data, colWidths=[150, 40, 40, 40, 50, 50, 130])
+    subject_table.setStyle(TableStyle([
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.lightblue),
+        ('FONTSIZE', (0, 0), (-1, -1), 9),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('ALIGN', (1, 1), (-2, -1), 'CENTER')
+    ]))
+    elements.append(subject_table)
+    elements.append(Spacer(1, 12))
+
+    # The average is computed by the ranking engine, older cards fall back to computing it here
+    average_score = report_card.get("average_score")
+    if average_score is None:
+        total_score = sum(subject["total_score"] for subject in subjects)
+        average_score = round(total_score / len(subjects), 2) if subjects else 0
+
+    # AVERAGE & COMMENTS
+    summary_data = [
+        ["AVERAGE:", f"{average_score}%"],
+        ["POSITION IN CLASS:", f"{report_card['position_in_class']}/{report_card['total_students']}", "", ""]
+    ]
+    summary_table = Table(summary_data, colWidths=[100, 80, 100, 80])
+    summary_table.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ]))
+    elements.append(summary_table)
+    elements.append(Spacer(1, 10))
+
+    # REMARKS
+    elements.append(Paragraph(f"TEACHER'S NAME: {report_card['teacher_name']}", styles['Normal']))
+    elements.append(Paragraph(f"Teacher's Remark: {report_card['teacher_remark']}", styles['Normal']))
+    elements.append(Spacer(1, 10))
+    elements.append(Paragraph(f"Principal's Remark: {report_card['principal_remark']}", styles['Normal']))
+    elements.append(Paragraph(f"PRINCIPAL'S NAME: {report_card['principal_name']}", styles['Normal']))
+    elements.append(Spacer(1, 10))
+
+    doc.build(elements)
+    return buffer.getvalue()
+
+
+def _disk_path(key: str) -> str:
+    return os.path.join(REPORT_PDF_CACHE_DIR, f"{key}.pdf")
+
+
+def _read_disk(key: str) -> Optional[bytes]:
+    try:
+        with open(_disk_path(key), "rb") as pdf_file:
+            return pdf_file.read()
+    except FileNotFoundError:
+        return None
+
+
+def _write_disk(key: str, pdf: bytes):
+    os.makedirs(REPORT_PDF_CACHE_DIR, exist_ok=True)
+    # Drop renders of older versions of the same report card
+    report_id = key.rsplit("_", 2)[0]
+    for stale_path in glob.glob(os.path.join(REPORT_PDF_CACHE_DIR, f"{glob.escape(report_id)}_*.pdf")):
+        os.remove(stale_path)
+
+    temp_path = f"{_disk_path(key)}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as pdf_file:
+        pdf_file.write(pdf)
+    os.replace(temp_path, _disk_path(key))
+
+
+async def get_cached_pdf(key: str) -> Optional[bytes]:
+    pdf = pdf_cache.get(key)
+    if pdf is None and REPORT_PDF_CACHE_DIR:
+        pdf = await asyncio.to_thread(_read_disk, key)
+        if pdf is not None:
+            pdf_cache.set(key, pdf)
+    return pdf
+
+
+async def store_pdf(key: str, pdf: bytes):
+    pdf_cache.set(key, pdf)
+    if REPORT_PDF_CACHE_DIR:
+        await asyncio.to_thread(_write_disk, key, pdf)
@@ -0,0 +1,166 @@
+"""
+This module builds responses for binary endpoints with HTTP
+validators: strong ETags from content hashes, 304 responses for
+conditional requests and 206 partial content for Range requests.
+"""
+
+from datetime import datetime, UTC
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+from fastapi import HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
+from app.utils.storage import blob_store
+import hashlib
+
+
+# Cache-Control policies per resource type
+CACHE_MATERIAL = "private, max-age=86400"
+CACHE_PUBLIC_MATERIAL = "public, max-age=86400"
+CACHE_NEWS_IMAGE = "public, max-age=600"
+CACHE_STUDENT_IMAGE = "private, max-age=600"
+# For URLs pinned to one version of an image (?v=), which never change
+CACHE_IMMUTABLE_IMAGE = "public, max-age=31536000, immutable"
+CACHE_IMMUTABLE_STUDENT_IMAGE = "private, max-age=31536000, immutable"
+# Rendered on demand, so always revalidate against the ETag
+CACHE_REPORT_CARD = "private, no-cache"
+
+
+def _http_date(value: datetime) -> str:
+    # Timestamps are stored without a timezone, in UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=UTC)
+    return format_datetime(value.astimezone(UTC), usegmt=True)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return etag in candidates
+
+
+def _not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        modified = last_modified if last_modified.tzinfo else last_modified.replace(tzinfo=UTC)
+        # HTTP dates have second precision
+        return modified.replace(microsecond=0) <= since
+
+    return False
+
+
+def parse_range(header: str, size: int):
+    """
+    Parses a single `bytes=` Range header.
+
+    Returns (start, end) inclusive, None when the header should be
+    ignored (multiple or malformed ranges), or raises ValueError
+    when the range cannot be satisfied.
+    """
+    unit, _, ranges = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        return None
+
+    start_text, _, end_text = ranges.strip().partition("-")
+    try:
+        if start_text == "":
+            # Suffix range, e.g. bytes=-500 for the last 500 bytes
+            suffix_length = int(end_text)
+            start, end = max(size - suffix_length, 0), size - 1
+        else:
+            start = int(start_text)
+            end = int(end_text) if end_text else size - 1
+    except ValueError:
+        return None
+
+    if start >= size or end < start:
+        raise ValueError("Range not satisfiable")
+    return start, min(end, size - 1)
+
+
+async def binary_response(
+    request: Request,
+    media_type: str,
+    cache_control: str,
+    key: Optional[str] = None,
+    content: Optional[bytes] = None,
+    last_modified: Optional[datetime] = None,
+    filename: Optional[str] = None,
+    vary: Optional[str] = None,
+) -> Response:
+    """
+    Serves a blob from the blob store (`key`) or from memory (`content`).
+
+    Parameters:
+        request: the incoming request, for its conditional and Range headers.
+        media_type: content type of the body.
+        cache_control: one of the CACHE_* policies.
+        key: blob store key, which is the SHA-256 of the content.
+        content: the raw bytes, for files kept outside the blob store.
+        last_modified: when the resource last changed.
+        filename: sent as an attachment with this name when given.
+        vary: request headers the body depends on, e.g. Accept.
+
+    Raises a 404 when there is neither, e.g. a legacy row whose file was never stored.
+    """
+    if key is None and content is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+    if key is None:
+        key = hashlib.sha256(content).hexdigest()
+        size = len(content)
+    else:
+        size = await blob_store.size(key)
+
+    etag = f'"{key}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": cache_control,
+        "Accept-Ranges": "bytes",
+    }
+    if last_modified:
+        headers["Last-Modified"] = _http_date(last_modified)
+    if filename:
+        headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    if vary:
+        headers["Vary"] = vary
+
+    if _not_modified(request, etag, last_modified):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    byte_range = None
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    # A stale If-Range validator means the client wants the whole new file
+    if range_header and (if_range is None or if_range.strip() == etag):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            return Response(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                headers={**headers, "Content-Range": f"bytes */{size}"},
+            )
+
+    start, end = byte_range or (0, size - 1)
+    status_code = status.HTTP_200_OK
+    if byte_range:
+        status_code = status.HTTP_206_PARTIAL_CONTENT
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(max(end - start + 1, 0))
+
+    if content is not None:
+        return Response(content[start:end + 1], status_code=status_code, media_type=media_type, headers=headers)
+
+    return StreamingResponse(
+        blob_store.stream(key, start, end),
+        status_code=status_code,
+        media_type=media_type,
+        headers=headers,
+    )
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import date, datetime
 
 class StudentCreate(BaseModel):
@@ -25,11 +25,12 @@ class SubjectScoreResponse(BaseModel):
     total_score: int
     grade: str
     teacher_remark: str
+    position: Optional[int] = None
 
     class Config:
         from_attributes = True
 
-class ReportCardResponse(BaseModel):
+class ReportCardSummary(BaseModel):
     id: str
     term: str
     session: str
@@ -39,17 +40,21 @@ class ReportCardResponse(BaseModel):
     total_students: int
     attendance: int
     date_generated: date
+    total_score: Optional[int] = None
+    average_score: Optional[float] = None
     teacher_name: Optional[str] = None
     principal_name: Optional[str] = None
     teacher_remark: Optional[str] = None
     principal_remark: Optional[str] = None
     # first_term_average: Optional[float] = None
-    subjects: List[SubjectScoreResponse]
 
     class Config:
         from_attributes = True
 
-class StudentProfile(BaseModel):
+class ReportCardResponse(ReportCardSummary):
+    subjects: List[SubjectScoreResponse]
+
+class StudentProfileSummary(BaseModel):
     full_name: str
     admission_number: str
     current_class: str
@@ -62,12 +67,16 @@ class StudentProfile(BaseModel):
     date_admitted: date
     state_of_origin: str
     local_government: str
-    report_cards: List[ReportCardResponse] = []
+    report_cards: List[ReportCardSummary] = []
     image_type: Optional[str] = None
+    image_url: Optional[str] = None
 
     class Config:
         from_attributes = True
 
+class StudentProfile(StudentProfileSummary):
+    report_cards: List[ReportCardResponse] = []
+
 
 class ReadingMaterialInfo(BaseModel):
     id: str
@@ -113,6 +122,7 @@ class StudentResponse(BaseModel):
     state_of_origin: str
     local_government: str
     image_type: Optional[str] = None
+    image_url: Optional[str] = None
 
     class Config:
         from_attributes = True
@@ -140,3 +150,51 @@ class StudentUpdate(BaseModel):
     date_admitted: date
     state_of_origin: str
     local_government: str
+
+class ClassResultResponse(BaseModel):
+    class_name: str
+    session: str
+    term: str
+    total_students: int
+    class_average: Optional[float] = None
+    highest_average: Optional[float] = None
+    lowest_average: Optional[float] = None
+
+    class Config:
+        from_attributes = True
+
+class TermAverage(BaseModel):
+    term: str
+    class_name: str
+    average_score: Optional[float] = None
+    position_in_class: Optional[int] = None
+    total_students: Optional[int] = None
+
+class StudentSessionAnalytics(BaseModel):
+    admission_number: str
+    session: str
+    terms: List[TermAverage]
+    cumulative_average: Optional[float] = None
+
+class SubjectStatistics(BaseModel):
+    subject_name: str
+    total_students: int
+    mean: Optional[float] = None
+    standard_deviation: Optional[float] = None
+    highest_score: Optional[int] = None
+    lowest_score: Optional[int] = None
+    pass_rate: Optional[float] = None
+    grades: Dict[str, int]
+
+class SubjectPassRate(BaseModel):
+    subject_name: str
+    total_students: int
+    passed: int
+    pass_rate: Optional[float] = None
+
+class SearchResult(BaseModel):
+    type: str  # "student", "material" or "news"
+    id: str
+    title: Optional[str] = None
+    subtitle: Optional[str] = None
+    score: float
@@ -0,0 +1,220 @@
+"""
+This module ranks students, reading materials and news for the
+admin search.
+
+On postgres it uses the trigram and full text indexes declared in
+app.utils.models: names and titles match on trigrams (substrings and
+typos), materials and news match their title and body with prefix
+tsqueries so results show up while the user is typing.
+
+Other databases (SQLite in local testing) use an in-process inverted
+index of word prefixes instead, built on first use and rebuilt after
+the endpoints that change searchable rows call `invalidate_search_index`.
+"""
+
+from bisect import bisect_left
+from typing import Iterable
+from sqlalchemy import select, func, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.utils.models import Student, ReadingMaterial, News, search_vector
+import asyncio, heapq, re
+
+
+SEARCH_TYPES = ("student", "material", "news")
+
+# Weight of a query word found in a title, against one found in the body
+TITLE_WEIGHT = 3
+BODY_WEIGHT = 1
+
+
+def tokenize(text) -> list:
+    return re.findall(r"\w+", (text or "").lower())
+
+
+def _escape_like(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+async def _search_postgres(db: AsyncSession, query: str, types: Iterable[str], limit: int) -> list:
+    words = tokenize(query)
+    tsquery = func.to_tsquery("simple", " & ".join(f"{word}:*" for word in words))
+    results = []
+
+    if "student" in types:
+        score = func.greatest(
+            func.word_similarity(query, Student.full_name),
+            func.similarity(Student.admission_number, query)
+        ).label("score")
+        rows = (await db.execute(
+            select(Student.admission_number, Student.full_name, Student.current_class, score)
+            .where(or_(
+                Student.full_name.ilike(f"%{_escape_like(query)}%", escape="\\"),
+                Student.admission_number.ilike(f"{_escape_like(query)}%", escape="\\"),
+                Student.full_name.op("%")(query)
+            ))
+            .order_by(score.desc())
+            .limit(limit)
+        )).all()
+        results += [
+            {"type": "student", "id": row.admission_number, "title": row.full_name, "subtitle": row.current_class, "score": row.score}
+            for row in rows
+        ]
+
+    if "material" in types:
+        vector = search_vector(ReadingMaterial.title, ReadingMaterial.description)
+        score = (func.ts_rank(vector, tsquery) + func.similarity(ReadingMaterial.title, query)).label("score")
+        rows = (await db.execute(
+            select(ReadingMaterial.id, ReadingMaterial.title, ReadingMaterial.subject, score)
+            .where(
+                ReadingMaterial.is_active == True,
+                or_(vector.op("@@")(tsquery), ReadingMaterial.title.op("%")(query))
+            )
+            .order_by(score.desc())
+            .limit(limit)
+        )).all()
+        results += [
+            {"type": "material", "id": row.id, "title": row.title, "subtitle": row.subject, "score": row.score}
+            for row in rows
+        ]
+
+    if "news" in types:
+        vector = search_vector(News.title, News.content)
+        score = (func.ts_rank(vector, tsquery) + func.similarity(News.title, query)).label("score")
+        rows = (await db.execute(
+            select(News.id, News.title, score)
+            .where(or_(vector.op("@@")(tsquery), News.title.op("%")(query)))
+            .order_by(score.desc())
+            .limit(limit)
+        )).all()
+        results += [
+            {"type": "news", "id": row.id, "title": row.title, "subtitle": None, "score": row.score}
+            for row in rows
+        ]
+
+    return results
+
+
+class SearchIndex:
+    """In-process inverted index of word prefixes, for databases without trigram search."""
+
+    def __init__(self):
+        self._documents = None  # list of result dicts
+        self._postings = {}  # word -> {document number: weight}
+        self._words = []  # sorted, for prefix lookups
+        self._generation = 0
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        self._generation += 1
+        self._documents = None
+
+    async def _build(self, db: AsyncSession):
+        generation = self._generation
+        documents, postings = [], {}
+
+        def add(result: dict, title: str, body: str = ""):
+            number = len(documents)
+            documents.append(result)
+            for weight, text in ((BODY_WEIGHT, body), (TITLE_WEIGHT, title)):
+                for word in tokenize(text):
+                    entry = postings.setdefault(word, {})
+                    entry[number] = max(entry.get(number, 0), weight)
+
+        for row in (await db.execute(select(Student.admission_number, Student.full_name, Student.current_class))).all():
+            add({"type": "student", "id": row.admission_number, "title": row.full_name, "subtitle": row.current_class}, f"{row.full_name} {row.admission_number}")
+        for row in (await db.execute(
+            select(ReadingMaterial.id, ReadingMaterial.title, ReadingMaterial.subject, ReadingMaterial.description)
+            .where(ReadingMaterial.is_active == True)
+        )).all():
+            add({"type": "material", "id": row.id, "title": row.title, "subtitle": row.subject}, row.title, row.description)
+        for row in (await db.execute(select(News.id, News.title, News.content))).all():
+            add({"type": "news", "id": row.id, "title": row.title, "subtitle": None}, row.title, row.content)
+
+        # A write during the build leaves the index to be rebuilt on the next search
+        if generation == self._generation:
+            self._documents, self._postings, self._words = documents, postings, sorted(postings)
+
+    def _prefixed(self, prefix: str) -> list:
+        """Indexed words starting with `prefix`."""
+        start = bisect_left(self._words, prefix)
+        end = start
+        while end < len(self._words) and self._words[end].startswith(prefix):
+            end += 1
+        return self._words[start:end]
+
+    def _matches(self, prefix: str, words: list, candidates: dict = None) -> dict:
+        """
+        Best weight of each document containing a word starting with
+        `prefix`, limited to the `candidates` documents when given.
+        """
+        matches = {}
+        for word in words:
+            # Whole words rank above prefixes
+            bonus = 1 if word == prefix else 0
+            postings = self._postings[word]
+            if candidates is not None and len(candidates) < len(postings):
+                # Look the few candidates up rather than walking a long posting list
+                items = ((number, postings[number]) for number in candidates if number in postings)
+            else:
+                items = postings.items()
+            for number, weight in items:
+                if candidates is None or number in candidates:
+                    matches[number] = max(matches.get(number, 0), weight + bonus)
+        return matches
+
+    async def search(self, db: AsyncSession, query: str, types: Iterable[str], limit: int) -> list:
+        if self._documents is None:
+            async with self._lock:
+                if self._documents is None:
+                    await self._build(db)
+        documents = self._documents or []
+
+        words = tokenize(query)
+        # Every query word has to match: start from the rarest, the others only score its documents
+        prefixes = sorted(
+            ((prefix, self._prefixed(prefix)) for prefix in words),
+            key=lambda entry: sum(len(self._postings[word]) for word in entry[1])
+        )
+        scores = None
+        for prefix, prefixed in prefixes:
+            matches = self._matches(prefix, prefixed, scores)
+            if scores is None:
+                scores = matches
+            else:
+                scores = {number: score + matches[number] for number, score in scores.items() if number in matches}
+
+        # Only the top `limit` are turned into results
+        best = heapq.nlargest(
+            limit,
+            (item for item in scores.items() if documents[item[0]]["type"] in types),
+            key=lambda item: item[1]
+        )
+        return [
+            {**documents[number], "score": score / (len(words) * (TITLE_WEIGHT + 1))}
+            for number, score in best
+        ]
+
+
+_index = SearchIndex()
+
+
+def invalidate_search_index():
+    _index.invalidate()
+
+
+async def search(db: AsyncSession, query: str, types: Iterable[str] = SEARCH_TYPES, limit: int = 20) -> list:
+    """
+    Returns up to `limit` results of the given types, best match first.
+    Each result has its type, id, title, subtitle and a score.
+    """
+    types = set(types)
+    if not tokenize(query):
+        return []
+
+    if db.bind.dialect.name == "postgresql":
+        results = await _search_postgres(db, query.strip(), types, limit)
+    else:
+        results = await _index.search(db, query, types, limit)
+
+    results.sort(key=lambda result: result["score"], reverse=True)
+    return results[:limit]
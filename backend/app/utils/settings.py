@@ -0,0 +1,85 @@
+"""
+This module loads the app configuration once, from the
+environment and the .env file, into a single settings object.
+
+Every module reads its configuration from `settings` instead of
+calling os.getenv, so the .env file is parsed a single time.
+"""
+
+from typing import Optional
+from pydantic import Field
+from pydantic_settings import BaseSettings
+from dotenv import load_dotenv
+import os
+
+
+# Also exported to os.environ, for libraries reading their own variables (e.g. boto3)
+load_dotenv()
+
+
+def _cpu_count() -> int:
+    return os.cpu_count() or 1
+
+
+class Settings(BaseSettings):
+    # Database, see app.utils.database
+    postgres_url: str
+    database_replica_url: Optional[str] = None
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    db_statement_timeout: int = 30000  # Milliseconds, 0 to disable
+    sticky_primary_seconds: float = 5
+
+    # Authentication
+    jwt_secret_key: Optional[str] = None
+    algorithm: Optional[str] = None
+    access_token_expire_days: float = 1
+    principal_cache_ttl: float = 60
+    principal_cache_size: int = 10000
+    principal_cache_url: Optional[str] = None
+    hashing_workers: int = Field(default_factory=_cpu_count)
+    hashing_queue_limit: int = 100
+
+    # Email, see app.utils.email
+    email_sender: Optional[str] = None
+    email_password: Optional[str] = None
+    smtp_host: str = "smtp.gmail.com"
+    smtp_port: int = 465
+    smtp_use_ssl: bool = True
+    mail_workers: int = 2
+    mail_pool_size: Optional[int] = None  # Defaults to mail_workers
+    mail_batch_size: int = 20
+    mail_max_attempts: int = 5
+    mail_poll_interval: float = 30
+    mail_retry_backoff: float = 30
+
+    # Files
+    blob_storage: str = "local"  # "local" or "s3"
+    blob_storage_path: str = "storage/blobs"
+    s3_bucket: Optional[str] = None
+    s3_endpoint_url: Optional[str] = None
+    s3_prefix: str = "blobs/"
+    thumbnail_workers: int = Field(default_factory=_cpu_count)
+
+    # Report cards
+    report_pdf_cache_bytes: int = 64 * 1024 * 1024
+    report_pdf_cache_dir: Optional[str] = None
+    report_render_workers: int = Field(default_factory=_cpu_count)
+    report_batch_ttl: int = 3600
+    pass_mark: int = 40
+
+    # Caches and monitoring
+    dashboard_cache_ttl: float = 30
+    news_cache_ttl: float = 30
+    news_cache_stale_seconds: float = 300
+    news_cache_bytes: int = 16 * 1024 * 1024
+    news_cache_max_entry_bytes: int = 1024 * 1024
+    news_cache_feed_bytes: int = 8 * 1024 * 1024
+    slow_request_seconds: float = 1.0
+    loop_lag_interval: float = 0.5
+
+
+settings = Settings()
@@ -0,0 +1,200 @@
+"""
+This module contains the blob storage used for uploaded files
+(reading materials, news cover images and student photos).
+
+Blobs are addressed by the SHA-256 digest of their content, so the
+same file uploaded twice is only stored once. Uploads are written
+and downloads are read in chunks, keeping memory use flat
+regardless of the file size.
+"""
+
+from typing import AsyncIterator, NamedTuple, Optional
+from fastapi import UploadFile
+from app.utils.settings import settings
+import asyncio, hashlib, os, tempfile
+
+
+BLOB_STORAGE = settings.blob_storage  # "local" or "s3"
+BLOB_STORAGE_PATH = settings.blob_storage_path
+S3_BUCKET = settings.s3_bucket
+# Point at a local stand-in (e.g. MinIO) to test without AWS
+S3_ENDPOINT_URL = settings.s3_endpoint_url
+S3_PREFIX = settings.s3_prefix
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class StoredBlob(NamedTuple):
+    key: str
+    size: int
+
+
+async def _spool_upload(upload: UploadFile, directory: Optional[str] = None):
+    """Copies an upload to a temporary file chunk by chunk while hashing it."""
+    digest = hashlib.sha256()
+    size = 0
+    fd, path = tempfile.mkstemp(dir=directory, prefix="upload-")
+
+    try:
+        with os.fdopen(fd, "wb") as temp_file:
+            while chunk := await upload.read(CHUNK_SIZE):
+                digest.update(chunk)
+                size += len(chunk)
+                await asyncio.to_thread(temp_file.write, chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+
+    return path, digest.hexdigest(), size
+
+
+class BlobStore:
+    """Interface shared by the storage backends."""
+
+    async def save(self, upload: UploadFile) -> StoredBlob:
+        raise NotImplementedError
+
+    async def save_bytes(self, key: str, data: bytes) -> StoredBlob:
+        """Stores generated content (e.g. thumbnails) under a key chosen by the caller."""
+        raise NotImplementedError
+
+    async def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    async def size(self, key: str) -> int:
+        raise NotImplementedError
+
+    def stream(self, key: str, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        """Yields the bytes of a blob from `start` up to and including `end`."""
+        raise NotImplementedError
+
+    async def delete(self, key: str):
+        raise NotImplementedError
+
+
+class LocalBlobStore(BlobStore):
+    def __init__(self, root: str):
+        self.root = root
+        self.temp_dir = os.path.join(root, "tmp")
+        os.makedirs(self.temp_dir, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key[2:4], key)
+
+    async def save(self, upload: UploadFile) -> StoredBlob:
+        temp_path, key, size = await _spool_upload(upload, self.temp_dir)
+        path = self._path(key)
+
+        if os.path.exists(path):
+            os.remove(temp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(temp_path, path)
+
+        return StoredBlob(key=key, size=size)
+
+    def _write(self, path: str, data: bytes):
+        fd, temp_path = tempfile.mkstemp(dir=self.temp_dir, prefix="upload-")
+        with os.fdopen(fd, "wb") as temp_file:
+            temp_file.write(data)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(temp_path, path)
+
+    async def save_bytes(self, key: str, data: bytes) -> StoredBlob:
+        await asyncio.to_thread(self._write, self._path(key), data)
+        return StoredBlob(key=key, size=len(data))
+
+    async def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    async def size(self, key: str) -> int:
+        return os.path.getsize(self._path(key))
+
+    async def stream(self, key: str, start: int = 0, end: Optional[int] = None):
+        remaining = None if end is None else end - start + 1
+
+        with open(self._path(key), "rb") as blob_file:
+            blob_file.seek(start)
+            while remaining is None or remaining > 0:
+                read_size = CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining)
+                chunk = await asyncio.to_thread(blob_file.read, read_size)
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    async def delete(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+class S3BlobStore(BlobStore):
+    """Stores blobs in any S3 compatible bucket."""
+
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: Optional[str] = None):
+        try:
+            import boto3  # Only needed for this backend, and slow to import
+        except ImportError:
+            raise RuntimeError("boto3 is required for the s3 blob storage backend")
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = boto3.client("s3", endpoint_url=endpoint_url)
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    async def exists(self, key: str) -> bool:
+        try:
+            await asyncio.to_thread(self.client.head_object, Bucket=self.bucket, Key=self._key(key))
+            return True
+        except self.client.exceptions.ClientError:
+            return False
+
+    async def save(self, upload: UploadFile) -> StoredBlob:
+        # The content address is only known once the whole file is read,
+        # so the upload is spooled to disk first and sent from there.
+        temp_path, key, size = await _spool_upload(upload)
+
+        try:
+            if not await self.exists(key):
+                await asyncio.to_thread(self.client.upload_file, temp_path, self.bucket, self._key(key))
+        finally:
+            os.remove(temp_path)
+
+        return StoredBlob(key=key, size=size)
+
+    async def save_bytes(self, key: str, data: bytes) -> StoredBlob:
+        await asyncio.to_thread(self.client.put_object, Bucket=self.bucket, Key=self._key(key), Body=data)
+        return StoredBlob(key=key, size=len(data))
+
+    async def size(self, key: str) -> int:
+        response = await asyncio.to_thread(self.client.head_object, Bucket=self.bucket, Key=self._key(key))
+        return response["ContentLength"]
+
+    async def stream(self, key: str, start: int = 0, end: Optional[int] = None):
+        byte_range = f"bytes={start}-{'' if end is None else end}"
+        response = await asyncio.to_thread(
+            self.client.get_object, Bucket=self.bucket, Key=self._key(key), Range=byte_range
+        )
+        body = response["Body"]
+
+        try:
+            while chunk := await asyncio.to_thread(body.read, CHUNK_SIZE):
+                yield chunk
+        finally:
+            body.close()
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(self.client.delete_object, Bucket=self.bucket, Key=self._key(key))
+
+
+def get_blob_store() -> BlobStore:
+    if BLOB_STORAGE == "s3":
+        return S3BlobStore(S3_BUCKET, prefix=S3_PREFIX, endpoint_url=S3_ENDPOINT_URL)
+    return LocalBlobStore(BLOB_STORAGE_PATH)
+
+
+blob_store = get_blob_store()
@@ -0,0 +1,152 @@
+"""
+This module makes the resized variants of uploaded images
+(student photos and news cover images).
+
+Variants are rendered once, when the image is uploaded, in a worker
+pool off the event loop, and stored in the blob store next to the
+original. Each size is kept as WebP and as JPEG for clients that
+don't accept WebP. A variant's key is derived from the original's
+content address, so no extra columns are needed to find it.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Optional
+from fastapi import Request, Response, UploadFile
+from app.utils.storage import blob_store, StoredBlob
+from app.utils.responses import binary_response
+from app.utils.settings import settings
+import asyncio, hashlib
+
+
+# Pillow releases the GIL while decoding, resizing and encoding, so threads run in parallel
+THUMBNAIL_WORKERS = settings.thumbnail_workers
+
+# Longest side in pixels of each variant
+THUMBNAIL_SIZES = {"small": 128, "medium": 480}
+THUMBNAIL_FORMATS = {"webp": "image/webp", "jpeg": "image/jpeg"}
+
+executor = ThreadPoolExecutor(max_workers=THUMBNAIL_WORKERS, thread_name_prefix="thumbnails")
+
+
+def variant_key(key: str, size: str, image_format: str) -> str:
+    return hashlib.sha256(f"{key}:{size}:{image_format}".encode()).hexdigest()
+
+
+def render_variants(data: bytes) -> dict:
+    """Returns {(size, format): bytes} for every size and format."""
+    from PIL import Image, ImageOps
+
+    with Image.open(BytesIO(data)) as image:
+        # Only the first frame of animated GIFs, and phone photos turned upright
+        image.seek(0)
+        image = ImageOps.exif_transpose(image)
+        image = image.convert("RGBA" if "A" in image.getbands() or "transparency" in image.info else "RGB")
+
+    variants = {}
+    for size, pixels in THUMBNAIL_SIZES.items():
+        resized = image.copy()
+        resized.thumbnail((pixels, pixels), Image.LANCZOS)
+
+        buffer = BytesIO()
+        resized.save(buffer, "WEBP", quality=80, method=4)
+        variants[(size, "webp")] = buffer.getvalue()
+
+        if resized.mode == "RGBA":
+            # JPEG has no transparency, flatten onto white
+            background = Image.new("RGB", resized.size, "white")
+            background.paste(resized, mask=resized.getchannel("A"))
+            resized = background
+        buffer = BytesIO()
+        resized.save(buffer, "JPEG", quality=85, optimize=True, progressive=True)
+        variants[(size, "jpeg")] = buffer.getvalue()
+
+    return variants
+
+
+async def create_thumbnails(key: str, data: bytes):
+    """Renders and stores the variants of the image stored under `key`."""
+    loop = asyncio.get_running_loop()
+    variants = await loop.run_in_executor(executor, render_variants, data)
+
+    await asyncio.gather(*(
+        blob_store.save_bytes(variant_key(key, size, image_format), variant)
+        for (size, image_format), variant in variants.items()
+    ))
+
+
+async def find_thumbnail(key: str, size: str, accept: Optional[str]) -> Optional[tuple]:
+    """
+    Returns (variant key, media type) of the best variant for the
+    client's Accept header, or None if the image has no variants
+    (uploaded before thumbnails existed).
+    """
+    image_format = "webp" if accept and "image/webp" in accept else "jpeg"
+    thumbnail_key = variant_key(key, size, image_format)
+    if not await blob_store.exists(thumbnail_key):
+        return None
+    return thumbnail_key, THUMBNAIL_FORMATS[image_format]
+
+
+def image_version(key: Optional[str]) -> Optional[str]:
+    """Short form of an image's content address, for the `v` parameter of image URLs."""
+    return key[:16] if key else None
+
+
+def versioned_url(path: str, key: Optional[str]) -> str:
+    """`path` of an image with its version, so the URL changes with the content and can be cached for good."""
+    return f"{path}?v={image_version(key)}" if key else path
+
+
+def student_image_url(student) -> Optional[str]:
+    """
+    URL of a student's photo, for a Student or a row holding its
+    admission_number, profile_image_hash and image_type. Photos saved
+    before the blob store have no version, students without one get None.
+    """
+    if not student.image_type:
+        return None
+    return versioned_url(f"/admin/students/{student.admission_number}/image", student.profile_image_hash)
+
+
+async def save_image(upload: UploadFile) -> StoredBlob:
+    """Stores an uploaded image and renders its variants."""
+    blob = await blob_store.save(upload)
+
+    await upload.seek(0)
+    await create_thumbnails(blob.key, await upload.read())
+    return blob
+
+
+async def image_response(
+    request: Request,
+    media_type: str,
+    cache_control: str,
+    immutable_cache_control: str,
+    key: Optional[str] = None,
+    content: Optional[bytes] = None,
+    size: Optional[str] = None,
+    version: Optional[str] = None,
+) -> Response:
+    """
+    Serves an image, or its `size` variant when there is one.
+
+    URLs carrying the current `version` of the image can be cached for
+    good, a new upload changes the version and so the URL.
+    """
+    if version and version == image_version(key):
+        cache_control = immutable_cache_control
+
+    if size and key:
+        thumbnail = await find_thumbnail(key, size, request.headers.get("accept"))
+        if thumbnail:
+            thumbnail_key, thumbnail_type = thumbnail
+            return await binary_response(
+                request,
+                media_type=thumbnail_type,
+                cache_control=cache_control,
+                key=thumbnail_key,
+                vary="Accept"
+            )
+
+    return await binary_response(request, media_type, cache_control, key=key, content=content)
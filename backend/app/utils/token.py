@@ -1,24 +1,32 @@
 """
-* Create access token.
+* Create and decode access tokens.
 
+python-jose is imported on first use, keeping it out of startup.
 """
 
-from dotenv import load_dotenv
-from jose import jwt
+from typing import Optional
+from app.utils.settings import settings
 import datetime
-import os
 
-# Load environment variables
-load_dotenv()
-
-JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
-ALGORITHM = os.getenv("ALGORITHM")
-ACCESS_TOKEN_EXPIRE_DAYS = os.getenv("ACCESS_TOKEN_EXPIRE_DAYS")
+JWT_SECRET_KEY = settings.jwt_secret_key
+ALGORITHM = settings.algorithm
+ACCESS_TOKEN_EXPIRE_DAYS = settings.access_token_expire_days
 
 # Function that generates access token for authenticated users
 def create_access_token(data: dict):
+    from jose import jwt
+
     to_encode = data.copy()
-    expire = datetime.datetime.now(tz=datetime.UTC) + datetime.timedelta(days=float(ACCESS_TOKEN_EXPIRE_DAYS))
+    expire = datetime.datetime.now(tz=datetime.UTC) + datetime.timedelta(days=ACCESS_TOKEN_EXPIRE_DAYS)
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, JWT_SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
+
+# Returns the claims of a valid token, or None if it is invalid or expired
+def decode_access_token(token: str) -> Optional[dict]:
+    from jose import JWTError, jwt
+
+    try:
+        return jwt.decode(token, JWT_SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
@@ -0,0 +1,44 @@
+"""
+Helpers shared by the benchmarks. They run against the same throwaway
+SQLite database as the tests; run one from backend/ with
+`python -m benchmarks.<name>`.
+"""
+
+import conftest  # noqa: F401, configures the database before the app is imported
+
+from contextlib import asynccontextmanager
+from httpx import ASGITransport, AsyncClient
+from main import app
+from app.utils.database import engine, Base, SessionLocal
+from app.utils.models import Admin
+from app.utils.token import create_access_token
+import time
+
+
+async def reset_database():
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+        await connection.run_sync(Base.metadata.create_all)
+
+    async with SessionLocal() as db:
+        db.add(Admin(username="admin", email="admin@example.com", full_name="Admin", hashed_password="", role="admin"))
+        await db.commit()
+
+
+@asynccontextmanager
+async def admin_client():
+    """Yields an HTTP client on the app and the headers of an admin."""
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'admin', 'role': 'admin'})}"}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test", timeout=None) as client:
+        yield client, headers
+    await engine.dispose()
+
+
+async def best_time(run, repeat: int = 5) -> float:
+    """Fastest of `repeat` runs of the coroutine function `run`, in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await run()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
@@ -0,0 +1,70 @@
+"""
+Memory and latency of the streamed student export for 10k and 100k
+rows: peak memory allocated by Python while it runs (tracemalloc),
+the time to the first chunk and the time to the last.
+
+The export query is the one GET /admin/export/students runs; the
+generator is consumed directly, since the test client buffers bodies.
+"""
+
+from benchmarks.common import reset_database
+from sqlalchemy import select, insert
+from app.utils.database import engine, SessionLocal
+from app.utils.exports import stream_rows
+from app.utils.models import Student
+from app.utils.pagination import schema_columns
+from app.utils.schemas import StudentResponse
+from datetime import date
+import asyncio, time, tracemalloc
+
+
+ROW_COUNTS = (10000, 100000)
+
+
+async def seed(numbers: range):
+    async with SessionLocal() as db:
+        await db.execute(insert(Student), [
+            {
+                "admission_number": f"MAS23{number:06}", "full_name": f"Student {number}", "current_class": "JSS1",
+                "gender": "Female", "date_of_birth": date(2012, 1, 1), "guardian_name": "Guardian",
+                "guardian_phone": "08000000000", "guardian_email": "guardian@example.com", "is_active": True,
+                "date_admitted": date(2023, 9, 1), "state_of_origin": "Lagos", "local_government": "Ikeja",
+                "hashed_password": "",
+            }
+            for number in numbers
+        ])
+        await db.commit()
+
+
+async def measure(export_format: str):
+    query = select(*schema_columns(Student, StudentResponse)).order_by(Student.date_admitted, Student.admission_number)
+    sent, first_chunk = 0, None
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    async for chunk in stream_rows(query, export_format):
+        first_chunk = first_chunk or time.perf_counter() - start
+        sent += len(chunk)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    print(f"{export_format:>7}: {sent / 2**20:6.1f} MB sent, peak {peak / 2**20:5.1f} MB, "
+          f"first chunk {first_chunk * 1000:6.1f} ms, total {elapsed * 1000:8.1f} ms")
+
+
+async def main():
+    await reset_database()
+    seeded = 0
+    for rows in ROW_COUNTS:
+        await seed(range(seeded, rows))
+        seeded = rows
+        print(f"{rows} students")
+        for export_format in ("csv", "ndjson"):
+            await measure(export_format)
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,41 @@
+"""
+Rows per second of the broadsheet import (POST /admin/report-cards/import)
+for a few class sizes, 12 subjects per student.
+"""
+
+from benchmarks.common import reset_database, admin_client
+from app.utils.database import SessionLocal
+from tests.conftest import make_student, broadsheet_csv
+import asyncio, time
+
+
+SUBJECTS = [f"Subject {number}" for number in range(12)]
+CLASS_SIZES = (40, 200, 1000)
+
+
+async def main():
+    for size in CLASS_SIZES:
+        await reset_database()
+        admission_numbers = [f"MAC/23/{number:05}" for number in range(size)]
+        async with SessionLocal() as db:
+            db.add_all(make_student(admission_number) for admission_number in admission_numbers)
+            await db.commit()
+
+        broadsheet = broadsheet_csv(admission_numbers, SUBJECTS)
+        async with admin_client() as (client, headers):
+            start = time.perf_counter()
+            response = await client.post(
+                "/admin/report-cards/import",
+                data={"class_name": "JSS1", "session": "2023/2024", "term": "First"},
+                files={"file": ("class.csv", broadsheet, "text/csv")},
+                headers=headers
+            )
+            elapsed = time.perf_counter() - start
+
+        assert response.status_code == 200, response.text
+        print(f"{size:>5} students: {elapsed * 1000:8.1f} ms, {size / elapsed:8.0f} rows/s, "
+              f"{size * len(SUBJECTS) / elapsed:8.0f} subject scores/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,97 @@
+"""
+Time to build GET /admin/students and GET /admin/report-cards bodies
+on the row path (plain columns encoded with orjson, what the endpoints
+do) against the ORM path (ORM objects rendered by page_response through
+the pydantic schema), for whole lists and a field selection.
+"""
+
+from benchmarks.common import reset_database, best_time
+from sqlalchemy import select, insert
+from sqlalchemy.orm import selectinload
+from app.routers.admin import get_all_students, get_all_report_cards
+from app.utils.database import engine, SessionLocal
+from app.utils.models import Student, ReportCard, SubjectScore
+from app.utils.pagination import page_response, parse_fields
+from app.utils.schemas import StudentResponse, ReportCardResponse
+from app.utils.thumbnails import student_image_url
+from datetime import date
+import asyncio
+
+
+STUDENTS, CARDS, SUBJECTS = 20000, 5000, 12
+
+
+async def seed():
+    async with SessionLocal() as db:
+        await db.execute(insert(Student), [
+            {
+                "admission_number": f"MAS23{number:05}", "full_name": f"Student {number}", "current_class": "JSS1",
+                "gender": "Female", "date_of_birth": date(2012, 1, 1), "guardian_name": "Guardian",
+                "guardian_phone": "08000000000", "guardian_email": "guardian@example.com", "is_active": True,
+                "date_admitted": date(2023, 9, 1), "state_of_origin": "Lagos", "local_government": "Ikeja",
+                "hashed_password": "", "profile_image_hash": f"{number:064}", "image_type": "image/png",
+            }
+            for number in range(STUDENTS)
+        ])
+        await db.execute(insert(ReportCard), [
+            {
+                "id": f"card-{number}", "student_id": f"MAS23{number:05}", "class_name": "JSS1",
+                "session": "2023/2024", "term": "First", "position_in_class": number % 40 + 1,
+                "total_students": 40, "attendance": 100, "date_generated": date(2024, 1, 1),
+                "total_score": 840, "average_score": 70.0, "teacher_name": "Teacher",
+            }
+            for number in range(CARDS)
+        ])
+        await db.execute(insert(SubjectScore), [
+            {
+                "id": f"card-{number}-{subject}", "report_card_id": f"card-{number}", "subject_name": f"Subject {subject}",
+                "ca_score": 30, "exam_score": 40, "total_score": 70, "grade": "A", "teacher_remark": "Good",
+            }
+            for number in range(CARDS) for subject in range(SUBJECTS)
+        ])
+        await db.commit()
+
+
+def with_image_url(student: Student) -> Student:
+    student.image_url = student_image_url(student)
+    return student
+
+
+async def orm_path(query, schema, fields, prepare=lambda item: item) -> bytes:
+    async with SessionLocal() as db:
+        items = [prepare(item) for item in (await db.scalars(query)).all()]
+        return page_response(items, schema, parse_fields(fields, schema.model_fields)).body
+
+
+async def row_path(endpoint, fields) -> bytes:
+    async with SessionLocal() as db:
+        response = await endpoint(current_admin=None, db=db, limit=None, cursor=None, fields=fields)
+        return response.body
+
+
+async def compare(name, endpoint, query, schema, fields, prepare=lambda item: item):
+    assert await row_path(endpoint, fields) == await orm_path(query, schema, fields, prepare)
+    orm = await best_time(lambda: orm_path(query, schema, fields, prepare))
+    rows = await best_time(lambda: row_path(endpoint, fields))
+    print(f"{name:<52}: ORM {orm * 1000:7.1f} ms, rows {rows * 1000:7.1f} ms, {orm / rows:4.1f}x")
+
+
+async def main():
+    await reset_database()
+    await seed()
+
+    students = select(Student).order_by(Student.date_admitted.desc(), Student.admission_number.desc())
+    cards = (
+        select(ReportCard).options(selectinload(ReportCard.subjects))
+        .order_by(ReportCard.date_generated.desc(), ReportCard.id.desc())
+    )
+    for fields in (None, "admission_number,full_name,image_url"):
+        await compare(f"{STUDENTS} students, fields={fields}", get_all_students, students, StudentResponse, fields, with_image_url)
+    for fields in (None, "id,term,session,average_score"):
+        await compare(f"{CARDS} cards, fields={fields}", get_all_report_cards, cards, ReportCardResponse, fields)
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,85 @@
+"""
+Latency of app.utils.search over 50k rows (students, reading materials
+and news), for whole words, as-you-type prefixes and multi-word queries.
+
+Runs on the in-process index with the default SQLite database. Point
+POSTGRES_URL at a scratch Postgres database (it is dropped and
+recreated) to measure the pg_trgm/tsvector path instead.
+"""
+
+from benchmarks.common import reset_database
+from sqlalchemy import insert
+from app.utils.database import engine, SessionLocal
+from app.utils.models import Student, ReadingMaterial, News
+from app.utils.search import search
+from datetime import date
+import asyncio, random, statistics, time
+
+
+STUDENTS, MATERIALS, NEWS = 30000, 10000, 10000
+QUERIES = ("adebayo", "ade", "mathematics past", "inter-house sports", "MAC/23/01", "zzz")
+RUNS = 50
+
+FIRST_NAMES = ["Adebayo", "Chiamaka", "Tunde", "Ngozi", "Ibrahim", "Funmilayo", "Emeka", "Aisha", "Segun", "Zainab"]
+LAST_NAMES = ["Okafor", "Adeyemi", "Bello", "Eze", "Olawale", "Musa", "Nwosu", "Ogunleye", "Danjuma", "Ibe"]
+SUBJECTS = ["Mathematics", "English", "Basic Science", "Civic Education", "Agricultural Science", "Yoruba"]
+NEWS_WORDS = ["inter-house", "sports", "graduation", "ceremony", "parents", "meeting", "excursion", "results", "holiday", "resumption"]
+
+
+async def seed():
+    rows = random.Random(0)
+    async with SessionLocal() as db:
+        await db.execute(insert(Student), [
+            {
+                "admission_number": f"MAC/23/{number:05}",
+                "full_name": f"{rows.choice(FIRST_NAMES)} {rows.choice(LAST_NAMES)}",
+                "current_class": f"JSS{number % 3 + 1}",
+                "date_admitted": date(2023, 9, 1),
+            }
+            for number in range(STUDENTS)
+        ])
+        await db.execute(insert(ReadingMaterial), [
+            {
+                "id": f"material-{number}",
+                "title": f"{rows.choice(SUBJECTS)} past questions {number}",
+                "description": f"{rows.choice(SUBJECTS)} revision for term {number % 3 + 1}",
+                "subject": rows.choice(SUBJECTS),
+                "is_active": True,
+            }
+            for number in range(MATERIALS)
+        ])
+        await db.execute(insert(News), [
+            {
+                "id": f"news-{number}",
+                "title": " ".join(rows.sample(NEWS_WORDS, 3)),
+                "content": " ".join(rows.choices(NEWS_WORDS, k=40)),
+            }
+            for number in range(NEWS)
+        ])
+        await db.commit()
+
+
+async def main():
+    await reset_database()
+    await seed()
+
+    async with SessionLocal() as db:
+        start = time.perf_counter()
+        await search(db, "warmup")
+        print(f"first search (builds the in-process index on SQLite): {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        for query in QUERIES:
+            timings = []
+            for _ in range(RUNS):
+                start = time.perf_counter()
+                results = await search(db, query)
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            print(f"{query!r:>22}: p50 {statistics.median(timings):6.2f} ms, "
+                  f"p95 {timings[int(len(timings) * 0.95)]:6.2f} ms, {len(results)} results")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,20 @@
+"""
+Configures the app for the test suite in tests/, before it is imported:
+a throwaway SQLite database (served by aiosqlite) and blob store.
+"""
+
+import os, tempfile
+
+
+_workdir = tempfile.mkdtemp(prefix="mac-tests-")
+
+os.environ.setdefault("POSTGRES_URL", f"sqlite:///{os.path.join(_workdir, 'test.db')}")
+os.environ.setdefault("BLOB_STORAGE_PATH", os.path.join(_workdir, "blobs"))
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("HASHING_WORKERS", "1")
+
+
+def pytest_configure(config):
+    # Async tests and fixtures run on pytest-asyncio without marking each one
+    config.option.asyncio_mode = "auto"
@@ -1,12 +1,33 @@
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import auth, admin, student
+from contextlib import asynccontextmanager
+from app.routers import auth, admin, student, analytics
+from app.utils.email import start_mail_workers, stop_mail_workers
+from app.utils.report_batches import shutdown_render_pool
+from app.utils.database import engine, replica_engine
+from app.utils.instrumentation import MetricsMiddleware, instrument_engine, monitor_loop_lag
+from app.utils import metrics
+import asyncio
 # from app.utils.database import engine, Base
 
 # Base.metadata.create_all(bind=engine)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await start_mail_workers()
+    loop_lag_monitor = asyncio.create_task(monitor_loop_lag())
+    yield
+    loop_lag_monitor.cancel()
+    await stop_mail_workers()
+    shutdown_render_pool()
+
+instrument_engine(engine)
+if replica_engine is not None:
+    instrument_engine(replica_engine)
+
+app = FastAPI(lifespan=lifespan)
 
 # Configure CORS for local testing
 app.add_middleware(
@@ -15,11 +36,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
+app.add_middleware(MetricsMiddleware)
 
 # app.include_router(auth.router)
 app.include_router(admin.router)
 app.include_router(student.router)
+app.include_router(analytics.router)
+
+@app.get('/metrics', include_in_schema=False)
+def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 @app.get('/')
 def read_root():
@@ -0,0 +1,140 @@
+"""
+Shared fixtures: a fresh schema per test, an HTTP client on the app,
+authenticated headers and a counter of the SQL statements executed.
+"""
+
+from contextlib import contextmanager
+from datetime import date
+from io import BytesIO
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import event
+import pytest_asyncio
+
+from main import app
+from app.utils import dashboard, database, news_cache, principal_cache, search
+from app.utils.database import engine, Base, SessionLocal
+from app.utils.models import Admin, Student, ReportCard, SubjectScore
+from app.utils.token import create_access_token
+
+
+@pytest_asyncio.fixture
+async def db():
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+        await connection.run_sync(Base.metadata.create_all)
+
+    principal_cache.backend = principal_cache.get_principal_backend()
+    database._recent_writers.clear()
+    dashboard.invalidate_dashboard()
+    news_cache.invalidate_news_cache()
+    search.invalidate_search_index()
+
+    async with SessionLocal() as session:
+        yield session
+
+    # Pooled connections belong to this test's event loop
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def client(db):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as http_client:
+        yield http_client
+
+
+@pytest_asyncio.fixture
+async def admin_headers(db):
+    db.add(Admin(username="admin", email="admin@example.com", full_name="Admin", hashed_password="", role="admin"))
+    await db.commit()
+    token = create_access_token({"sub": "admin", "role": "admin"})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def student_headers(admission_number: str) -> dict:
+    return {"Authorization": f"Bearer {create_access_token({'sub': admission_number})}"}
+
+
+def make_student(admission_number: str, current_class: str = "JSS1", **values) -> Student:
+    return Student(**{
+        "admission_number": admission_number,
+        "full_name": f"Student {admission_number}",
+        "current_class": current_class,
+        "gender": "Female",
+        "date_of_birth": date(2012, 1, 1),
+        "guardian_name": "Guardian",
+        "guardian_phone": "08000000000",
+        "guardian_email": "guardian@example.com",
+        "is_active": True,
+        "date_admitted": date(2023, 9, 1),
+        "state_of_origin": "Lagos",
+        "local_government": "Ikeja",
+        "hashed_password": "",
+        **values
+    })
+
+
+def make_report_card(card_id: str, student_id: str, scores: dict, class_name: str = "JSS1",
+                     session: str = "2023/2024", term: str = "First") -> ReportCard:
+    card = ReportCard(
+        id=card_id,
+        student_id=student_id,
+        class_name=class_name,
+        session=session,
+        term=term,
+        position_in_class=0,
+        total_students=0,
+        attendance=100,
+        date_generated=date(2024, 1, 1)
+    )
+    card.subjects = [
+        SubjectScore(
+            id=f"{card_id}-{subject}",
+            subject_name=subject,
+            ca_score=ca_score,
+            exam_score=exam_score,
+            total_score=ca_score + exam_score,
+            grade="A",
+            teacher_remark="Good"
+        )
+        for subject, (ca_score, exam_score) in scores.items()
+    ]
+    return card
+
+
+@contextmanager
+def count_queries():
+    """Collects the SQL statements executed inside the block."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+
+
+def broadsheet_csv(admission_numbers: list, subjects: list) -> bytes:
+    """A class broadsheet in the format read by app.utils.broadsheet."""
+    header = ["Admission Number", "Attendance", "Teacher Name", "Comment: Principal"]
+    for subject in subjects:
+        header += [f"{subject} CA", f"{subject} Exam", f"{subject} Grade", f"{subject} Remark"]
+
+    lines = [",".join(header)]
+    for number, admission_number in enumerate(admission_numbers):
+        row = [admission_number, "98", "Mrs Ade", "Good conduct"]
+        for subject_number, _ in enumerate(subjects):
+            row += [str(20 + (number + subject_number) % 20), str(30 + number % 40), "B", "Good"]
+        lines.append(",".join(row))
+    return ("\n".join(lines) + "\n").encode()
+
+
+def png_image(width: int = 64, height: int = 48) -> bytes:
+    from PIL import Image
+
+    buffer = BytesIO()
+    Image.new("RGB", (width, height), "teal").save(buffer, "PNG")
+    return buffer.getvalue()
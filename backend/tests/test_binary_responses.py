@@ -0,0 +1,20 @@
+from app.utils.models import News, ReadingMaterial
+
+
+async def seed(db):
+    # Legacy rows: nothing in the blob store and no bytes in the database
+    db.add(News(id="news-1", title="Inter-house sports", content="Body", image_type="image/png"))
+    db.add(ReadingMaterial(
+        id="material-1", title="Past questions", description="Notes", subject="Mathematics",
+        class_assigned="JSS1", term="First", session="2023/2024", file_name="notes.pdf",
+        file_type="application/pdf", is_active=True
+    ))
+    await db.commit()
+
+
+async def test_rows_without_a_stored_file_are_not_found(client, db):
+    await seed(db)
+
+    for path in ("/admin/news/news-1/image", "/admin/news/news-1/image?size=small", "/reading-materials/material-1/download"):
+        response = await client.get(path)
+        assert response.status_code == 404, (path, response.text)
@@ -0,0 +1,68 @@
+"""
+Image and file blobs are only loaded by the endpoints serving them.
+Listings and authentication must never select the blob columns.
+"""
+
+from app.utils.models import News, ReadingMaterial
+from tests.conftest import make_student, student_headers, count_queries
+import re
+
+
+BLOB_COLUMNS = re.compile(r"\b(profile_image|cover_image|file_content)\b")
+
+BLOB = b"\xff" * 4096
+
+
+async def seed(db):
+    for number in range(3):
+        db.add(make_student(f"MAC/23/{number:04}", profile_image=BLOB, image_type="image/jpeg"))
+        db.add(News(id=f"news-{number}", title=f"News {number}", content="Body", cover_image=BLOB, image_type="image/jpeg"))
+        db.add(ReadingMaterial(
+            id=f"material-{number}",
+            title=f"Material {number}",
+            description="Past questions",
+            file_content=BLOB,
+            file_type="application/pdf",
+            file_name="questions.pdf",
+            subject="Mathematics",
+            class_assigned="JSS1",
+            term="First",
+            session="2023/2024"
+        ))
+    await db.commit()
+
+
+def assert_no_blob_columns(statements: list):
+    assert statements
+    loaded = [statement for statement in statements if BLOB_COLUMNS.search(statement)]
+    assert not loaded, f"Blob columns selected by: {loaded}"
+
+
+async def test_admin_listings_skip_blob_columns(client, db, admin_headers):
+    await seed(db)
+
+    for path in [
+        "/admin/students",
+        "/admin/students?fields=full_name,image_type",
+        "/admin/news",
+        "/admin/news/news-1",
+        "/admin/reading-materials",
+        "/admin/students-info",
+        "/admin/export/students",
+        "/admin/search?q=news",
+    ]:
+        with count_queries() as statements:
+            response = await client.get(path, headers=admin_headers)
+        assert response.status_code == 200, (path, response.text)
+        assert_no_blob_columns(statements)
+
+
+async def test_student_endpoints_skip_blob_columns(client, db):
+    await seed(db)
+    headers = student_headers("MAC/23/0001")
+
+    for path in ["/students/me", "/students/me?summary=true", "/students/reading-materials"]:
+        with count_queries() as statements:
+            response = await client.get(path, headers=headers)
+        assert response.status_code == 200, (path, response.text)
+        assert_no_blob_columns(statements)
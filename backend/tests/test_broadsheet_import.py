@@ -0,0 +1,59 @@
+from sqlalchemy import select, func
+from app.utils.models import ReportCard, SubjectScore, TeacherComment
+from tests.conftest import make_student, broadsheet_csv, count_queries
+
+
+SUBJECTS = ["Mathematics", "English", "Basic Science", "Civic Education"]
+
+
+def without_auth(statements: list) -> list:
+    # The admin is only looked up by the first request, then cached
+    return [statement for statement in statements if "FROM admin" not in statement]
+
+
+async def import_class(client, headers, admission_numbers: list):
+    return await client.post(
+        "/admin/report-cards/import",
+        data={"class_name": "JSS1", "session": "2023/2024", "term": "First"},
+        files={"file": ("jss1.csv", broadsheet_csv(admission_numbers, SUBJECTS), "text/csv")},
+        headers=headers
+    )
+
+
+async def test_import_statement_count_does_not_grow_with_rows(client, db, admin_headers):
+    admission_numbers = [f"MAC/23/{number:04}" for number in range(40)]
+    db.add_all(make_student(admission_number) for admission_number in admission_numbers)
+    await db.commit()
+
+    with count_queries() as small_class:
+        response = await import_class(client, admin_headers, admission_numbers[:5])
+    assert response.status_code == 200, response.text
+
+    await db.execute(TeacherComment.__table__.delete())
+    await db.execute(SubjectScore.__table__.delete())
+    await db.execute(ReportCard.__table__.delete())
+    await db.commit()
+
+    with count_queries() as large_class:
+        response = await import_class(client, admin_headers, admission_numbers)
+    assert response.status_code == 200, response.text
+    assert response.json()["subjects"] == 40 * len(SUBJECTS)
+
+    # executemany runs one statement per table, whatever the number of rows
+    assert len(without_auth(large_class)) == len(without_auth(small_class))
+    assert await db.scalar(select(func.count(SubjectScore.id))) == 40 * len(SUBJECTS)
+    assert await db.scalar(select(func.count(ReportCard.id)).where(ReportCard.position_in_class.is_(None))) == 0
+
+
+async def test_invalid_rows_are_reported_and_nothing_is_written(client, db, admin_headers):
+    db.add(make_student("MAC/23/0000"))
+    await db.commit()
+
+    response = await import_class(client, admin_headers, ["MAC/23/0000", "MAC/23/9999", "MAC/23/0000"])
+
+    assert response.status_code == 422
+    assert response.json()["detail"]["errors"] == [
+        {"row": 3, "errors": ["Student not found"]},
+        {"row": 4, "errors": ["Student appears more than once"]},
+    ]
+    assert await db.scalar(select(func.count(ReportCard.id))) == 0
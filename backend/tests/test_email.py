@@ -0,0 +1,118 @@
+"""
+The email outbox, delivered to a local aiosmtpd server over plain SMTP
+(SMTP_USE_SSL=false), as in development.
+"""
+
+from datetime import datetime, timedelta
+from aiosmtpd.controller import Controller
+from sqlalchemy import select, update
+from app.utils import email
+from app.utils.models import EmailOutbox
+import asyncio, pytest, socket
+
+
+def free_port() -> int:
+    with socket.socket() as listener:
+        listener.bind(("127.0.0.1", 0))
+        return listener.getsockname()[1]
+
+
+class Inbox:
+    """aiosmtpd handler keeping what it receives, and the SMTP sessions it came over."""
+
+    def __init__(self):
+        self.messages = []
+        self.sessions = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((envelope.rcpt_tos, envelope.content.decode()))
+        if session not in self.sessions:
+            self.sessions.append(session)
+        return "250 OK"
+
+
+@pytest.fixture
+def smtp(monkeypatch):
+    port = free_port()
+    monkeypatch.setattr(email, "SMTP_HOST", "127.0.0.1")
+    monkeypatch.setattr(email, "SMTP_PORT", port)
+    monkeypatch.setattr(email, "SMTP_USE_SSL", False)
+    monkeypatch.setattr(email, "EMAIL_SENDER", "portal@example.com")
+    monkeypatch.setattr(email, "EMAIL_PASSWORD", None)
+    monkeypatch.setattr(email, "pool", email.SMTPConnectionPool(1))
+    # Bound to the event loop of the test that first waits on it
+    monkeypatch.setattr(email, "_wakeup", asyncio.Event())
+    yield port
+    email.pool.close()
+
+
+@pytest.fixture
+def inbox(smtp):
+    handler = Inbox()
+    controller = Controller(handler, hostname="127.0.0.1", port=smtp)
+    controller.start()
+    yield handler
+    controller.stop()
+
+
+async def outbox(db) -> list:
+    return (await db.scalars(select(EmailOutbox).order_by(EmailOutbox.id).execution_options(populate_existing=True))).all()
+
+
+async def deliver_pending():
+    """One pass of the worker loop."""
+    messages = await email._claim_batch()
+    await email._record_results(await asyncio.to_thread(email.deliver_batch, messages))
+
+
+async def test_queued_mails_are_delivered_in_batches(db, inbox, monkeypatch):
+    monkeypatch.setattr(email, "MAIL_BATCH_SIZE", 2)
+    await email.send_mails([(f"parent{number}@example.com", f"<p>Report {number}</p>") for number in range(3)], subject="Results")
+
+    worker = asyncio.create_task(email._worker())
+    try:
+        for _ in range(100):
+            if all(message.status == "sent" for message in await outbox(db)):
+                break
+            await asyncio.sleep(0.05)
+    finally:
+        worker.cancel()
+
+    assert [(message.status, message.attempts) for message in await outbox(db)] == [("sent", 1)] * 3
+    assert sorted(recipients for recipients, _ in inbox.messages) == [[f"parent{number}@example.com"] for number in range(3)]
+    assert "Subject: Results" in inbox.messages[0][1]
+    # Two batches over the one pooled connection
+    assert len(inbox.sessions) == 1
+
+
+async def test_a_refused_connection_is_retried_with_backoff(db, smtp):
+    await email.send_mail("parent@example.com", "<p>Welcome</p>")
+
+    for attempts in (1, 2, 3):
+        before = datetime.now()
+        await deliver_pending()
+        message, = await outbox(db)
+
+        delay = timedelta(seconds=email.MAIL_RETRY_BACKOFF * 2 ** (attempts - 1))
+        assert (message.status, message.attempts) == ("pending", attempts)
+        assert message.last_error
+        assert before + delay <= message.next_attempt_at <= datetime.now() + delay
+
+        # Due again
+        await db.execute(update(EmailOutbox).values(next_attempt_at=datetime.now()))
+        await db.commit()
+
+
+async def test_a_mail_fails_after_the_last_attempt(db, smtp):
+    await email.send_mail("parent@example.com", "<p>Welcome</p>")
+    await db.execute(update(EmailOutbox).values(attempts=email.MAIL_MAX_ATTEMPTS - 1))
+    await db.commit()
+
+    await deliver_pending()
+
+    message, = await outbox(db)
+    assert (message.status, message.attempts) == ("failed", email.MAIL_MAX_ATTEMPTS)
+    assert message.last_error
+
+    # Failed mails are not picked up again
+    assert await email._claim_batch() == []
@@ -0,0 +1,53 @@
+"""
+Exports are streamed batch by batch, so the memory they hold stays
+bounded by EXPORT_BATCH_SIZE rows however many rows are exported.
+"""
+
+from datetime import date
+from sqlalchemy import select, insert
+from app.utils.exports import stream_rows, EXPORT_BATCH_SIZE
+from app.utils.models import Student
+import pytest, tracemalloc
+
+
+async def seed(db, numbers: range):
+    await db.execute(insert(Student), [
+        {
+            "admission_number": f"MAS23{number:05}", "full_name": f"Student {number}", "current_class": "JSS1",
+            "gender": "Female", "date_of_birth": date(2012, 1, 1), "guardian_name": "Guardian",
+            "guardian_phone": "08000000000", "guardian_email": "guardian@example.com", "is_active": True,
+            "date_admitted": date(2023, 9, 1), "state_of_origin": "Lagos", "local_government": "Ikeja",
+            "hashed_password": "",
+        }
+        for number in numbers
+    ])
+    await db.commit()
+
+
+async def export_peak(export_format: str):
+    """Peak memory allocated while the export runs, the bytes it sent and the size of its largest chunk."""
+    query = select(Student.admission_number, Student.full_name, Student.date_of_birth).order_by(Student.admission_number)
+    sent = largest = 0
+
+    tracemalloc.start()
+    try:
+        async for chunk in stream_rows(query, export_format):
+            sent += len(chunk)
+            largest = max(largest, len(chunk))
+        return tracemalloc.get_traced_memory()[1], sent, largest
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.mark.parametrize("export_format", ["csv", "ndjson"])
+async def test_export_memory_does_not_grow_with_the_row_count(db, export_format):
+    await seed(db, range(2 * EXPORT_BATCH_SIZE))
+    small_peak, small_sent, _ = await export_peak(export_format)
+
+    await seed(db, range(2 * EXPORT_BATCH_SIZE, 16 * EXPORT_BATCH_SIZE))
+    large_peak, large_sent, largest_chunk = await export_peak(export_format)
+
+    # Eight times the rows in the same memory, sent in batches rather than one body
+    assert large_sent > 7 * small_sent
+    assert large_peak < 1.5 * small_peak, (small_peak, large_peak)
+    assert largest_chunk < large_sent / 8
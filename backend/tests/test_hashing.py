@@ -0,0 +1,28 @@
+from app.utils import hashing
+from tests.conftest import make_student
+import asyncio, threading
+
+
+async def test_logins_get_a_503_while_the_hashing_queue_is_full(client, db, monkeypatch):
+    db.add(make_student("MAS23001", hashed_password="not-a-hash"))
+    await db.commit()
+
+    # Hashes that run until released, one per worker plus one queued
+    release = threading.Event()
+    monkeypatch.setattr(hashing, "_hash", lambda password: release.wait(5) and "hashed")
+    monkeypatch.setattr(hashing, "_verify", lambda password, hashed_password: False)
+    monkeypatch.setattr(hashing, "HASHING_QUEUE_LIMIT", 1)
+    slow_hashes = [asyncio.create_task(hashing.hash_password("secret")) for _ in range(hashing.HASHING_WORKERS + 1)]
+    await asyncio.sleep(0.05)
+
+    try:
+        response = await client.post("/students/login", data={"username": "MAS23001", "password": "secret"})
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "1"
+    finally:
+        release.set()
+        await asyncio.gather(*slow_hashes)
+
+    # Room again once the queue drains
+    response = await client.post("/students/login", data={"username": "MAS23001", "password": "secret"})
+    assert response.status_code == 401
@@ -0,0 +1,37 @@
+"""
+Libraries only some requests (or deployments) need are imported on
+first use, keeping worker boot and reload time down. Checked in a
+fresh interpreter, since the test run itself imports all of them.
+"""
+
+from pathlib import Path
+import re, subprocess, sys
+
+
+DEFERRED_MODULES = ("reportlab", "jose", "passlib", "boto3", "redis", "openpyxl", "smtplib")
+
+# Cumulative `python -X importtime` of main, in microseconds. It measured
+# about 1.15 s on the reference machine, the budget leaves room for slower ones.
+STARTUP_BUDGET_US = 2_000_000
+
+BACKEND = Path(__file__).parent.parent
+
+
+def run_python(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *args], cwd=BACKEND, capture_output=True, text=True, check=True)
+
+
+def test_heavy_libraries_are_not_imported_at_startup():
+    loaded = run_python("-c", f"import main, sys; print(*[m for m in {DEFERRED_MODULES!r} if m in sys.modules])")
+    assert loaded.stdout.split() == []
+
+
+def test_startup_imports_fit_the_budget():
+    # Lines read "import time: <self> | <cumulative> | <module>", one per module
+    report = run_python("-X", "importtime", "-c", "import main").stderr
+    cumulative = int(re.search(r"^import time:\s+\d+ \|\s+(\d+) \| main$", report, re.MULTILINE).group(1))
+
+    assert cumulative < STARTUP_BUDGET_US, (
+        f"import main took {cumulative} us, over the {STARTUP_BUDGET_US} us budget; "
+        "run `python -X importtime -c 'import main'` to find the slow import"
+    )
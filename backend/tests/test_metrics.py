@@ -0,0 +1,30 @@
+from app.utils.models import News
+import re
+
+
+ROUTE = 'method="GET",route="/admin/news/{news_id}"'
+
+
+async def samples(client) -> dict:
+    response = await client.get("/metrics")
+    assert response.status_code == 200
+    return {name: float(value) for name, value in re.findall(r"^(\S+) (\S+)$", response.text, re.MULTILINE)}
+
+
+async def test_requests_are_measured_per_route(client, db):
+    db.add(News(id="news-1", title="Inter-house sports", content="Body"))
+    await db.commit()
+    # Metrics are process wide, so compare against what earlier tests recorded
+    before = await samples(client)
+
+    assert (await client.get("/admin/news/news-1")).status_code == 200
+
+    after = await samples(client)
+    increase = lambda name: after[name] - before.get(name, 0)
+
+    assert increase(f'http_request_seconds_count{{{ROUTE},status="200"}}') == 1
+    assert after[f'http_request_seconds_bucket{{{ROUTE},status="200",le="+Inf"}}'] == after[f'http_request_seconds_count{{{ROUTE},status="200"}}']
+    # The article is loaded with one statement, the news cache being cold
+    assert increase(f"http_request_db_queries_count{{{ROUTE}}}") == 1
+    assert increase(f"http_request_db_queries_sum{{{ROUTE}}}") == 1
+    assert increase(f'http_request_db_queries_bucket{{{ROUTE},le="1"}}') == 1
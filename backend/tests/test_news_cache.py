@@ -0,0 +1,18 @@
+from app.utils.models import News
+from app.utils.news_cache import NEWS_CACHE_MAX_ENTRY_BYTES
+from tests.conftest import count_queries
+
+
+async def test_the_whole_feed_is_cached_past_the_entry_limit(client, db):
+    content = "Inter-house sports " * 250
+    for number in range(NEWS_CACHE_MAX_ENTRY_BYTES // len(content) + 10):
+        db.add(News(id=f"news-{number}", title=f"News {number}", content=content))
+    await db.commit()
+
+    first = await client.get("/admin/news")
+    assert len(first.content) > NEWS_CACHE_MAX_ENTRY_BYTES
+
+    with count_queries() as statements:
+        second = await client.get("/admin/news")
+    assert statements == []
+    assert second.content == first.content
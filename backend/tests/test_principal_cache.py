@@ -0,0 +1,65 @@
+"""
+Authenticated admins and students are served from the principal
+cache, so every endpoint that changes one must invalidate its entry:
+the change shows on the very next request, not after the TTL.
+"""
+
+from sqlalchemy import update
+from app.utils.models import Admin
+from app.utils.principal_cache import invalidate_principal
+from app.utils.token import create_access_token
+from tests.conftest import make_student, student_headers, count_queries
+
+
+def headers_for(username: str) -> dict:
+    return {"Authorization": f"Bearer {create_access_token({'sub': username, 'role': 'admin'})}"}
+
+
+async def test_deactivating_a_student_shows_on_the_next_request(client, db, admin_headers):
+    db.add(make_student("MAS23001"))
+    await db.commit()
+
+    assert (await client.get("/students/me?summary=true", headers=student_headers("MAS23001"))).json()["is_active"] is True
+    # Cached: the next request does not look the student up again
+    with count_queries() as statements:
+        await client.get("/students/me?summary=true", headers=student_headers("MAS23001"))
+    assert not any("FROM students" in statement for statement in statements)
+
+    response = await client.put("/admin/students/MAS23001", data={
+        "full_name": "Student", "current_class": "JSS1", "guardian_name": "Guardian",
+        "guardian_phone": "08000000000", "guardian_email": "guardian@example.com", "is_active": "false"
+    }, headers=admin_headers)
+    assert response.status_code == 200, response.text
+
+    assert (await client.get("/students/me?summary=true", headers=student_headers("MAS23001"))).json()["is_active"] is False
+
+
+async def test_a_deleted_admin_is_rejected_on_the_next_request(client, db, admin_headers):
+    db.add(Admin(username="teacher", email="teacher@example.com", full_name="Teacher", hashed_password="", role="teacher", is_active=True))
+    await db.commit()
+    assert (await client.get("/admin/students", headers=headers_for("teacher"))).status_code == 200
+
+    response = await client.delete("/admin/delete-admin/teacher", headers=admin_headers)
+    assert response.status_code == 200, response.text
+
+    assert (await client.get("/admin/students", headers=headers_for("teacher"))).status_code == 401
+
+
+async def test_a_role_change_shows_once_the_entry_is_invalidated(client, db, admin_headers):
+    db.add(Admin(username="other", email="other@example.com", full_name="Other", hashed_password="", role="admin", is_active=True))
+    await db.commit()
+
+    async def update_password():
+        return await client.put(
+            "/admin/update-admin-password", json={"username": "admin", "new_password": "secret"}, headers=headers_for("other")
+        )
+
+    assert (await update_password()).status_code == 200
+
+    await db.execute(update(Admin).where(Admin.username == "other").values(role="teacher"))
+    await db.commit()
+    # Still the cached row until the writer invalidates it, as every endpoint changing an admin does
+    assert (await update_password()).status_code == 200
+
+    await invalidate_principal(Admin, "other")
+    assert (await update_password()).status_code == 403
@@ -0,0 +1,76 @@
+"""
+Statements executed per request by the list and profile endpoints,
+pinned so an N+1 query coming back fails here. Every count includes
+the lookup of the authenticated admin or student.
+"""
+
+from app.utils import dashboard, news_cache, principal_cache
+from app.utils.models import News, ReadingMaterial
+from tests.conftest import make_student, make_report_card, student_headers, count_queries
+import pytest
+
+
+ADMIN_QUERIES = {
+    "/admin/students": 2,
+    "/admin/report-cards": 3,  # Cards, then the subjects of the page
+    "/admin/report-cards?fields=id,term": 2,
+    "/admin/news": 1,  # Public
+    "/admin/reading-materials": 2,
+    "/admin/students-info": 3,
+    "/admin/all-admin": 2,
+}
+STUDENT_QUERIES = {
+    "/students/me": 3,  # Cards, then their subjects
+    "/students/me?summary=true": 2,
+    "/students/academic-records": 3,
+    "/students/reading-materials": 2,
+}
+
+TERMS = [(session, term) for session in ("2021/2022", "2022/2023", "2023/2024") for term in ("First", "Second", "Third")]
+
+
+async def seed(db, students: int):
+    for number in range(students):
+        admission_number = f"MAC/23/{number:04}"
+        db.add(make_student(admission_number))
+        for session, term in TERMS:
+            db.add(make_report_card(
+                f"card-{number}-{session}-{term}", admission_number,
+                {"Mathematics": (20, 50), "English": (25, 45), "Basic Science": (30, 40)},
+                session=session, term=term
+            ))
+        db.add(News(id=f"news-{number}", title=f"News {number}", content="Body"))
+        db.add(ReadingMaterial(
+            id=f"material-{number}", title=f"Material {number}", description="Notes", subject="Mathematics",
+            class_assigned="JSS1", term="First", session="2023/2024", file_name="notes.pdf",
+            file_type="application/pdf", is_active=True
+        ))
+    await db.commit()
+
+
+async def request_queries(client, path: str, headers: dict) -> int:
+    # Start every request cold, so the counts do not depend on the order
+    principal_cache.backend = principal_cache.get_principal_backend()
+    dashboard.invalidate_dashboard()
+    news_cache.invalidate_news_cache()
+
+    with count_queries() as statements:
+        response = await client.get(path, headers=headers)
+    assert response.status_code == 200, (path, response.text)
+    return len(statements)
+
+
+async def measure(client, admin_headers) -> dict:
+    counts = {}
+    for path in ADMIN_QUERIES:
+        counts[path] = await request_queries(client, path, admin_headers)
+    for path in STUDENT_QUERIES:
+        counts[path] = await request_queries(client, path, student_headers("MAC/23/0000"))
+    return counts
+
+
+@pytest.mark.parametrize("students", [2, 25])
+async def test_query_counts_are_pinned(client, db, admin_headers, students):
+    await seed(db, students)
+
+    assert await measure(client, admin_headers) == {**ADMIN_QUERIES, **STUDENT_QUERIES}
@@ -0,0 +1,65 @@
+"""
+Batch jobs are visible to every worker: their progress is stored in
+the database and the finished result in the blob store.
+"""
+
+from io import BytesIO
+from app.utils import report_batches
+from app.utils.models import ReportBatch
+from tests.conftest import make_student, make_report_card
+import pytest, zipfile
+
+
+@pytest.fixture(autouse=True)
+def render_pool():
+    yield
+    report_batches.shutdown_render_pool()
+    report_batches.jobs.clear()
+
+
+async def test_batch_is_served_by_a_worker_that_did_not_run_it(client, db, admin_headers):
+    for number in range(3):
+        admission_number = f"MAC/23/{number:04}"
+        db.add(make_student(admission_number))
+        db.add(make_report_card(f"card-{number}", admission_number, {"Mathematics": (30, 50 + number)}))
+    await db.commit()
+
+    response = await client.post(
+        "/admin/report-card-batches",
+        json={"class_name": "JSS1", "session": "2023/2024", "term": "First", "output": "zip"},
+        headers=admin_headers
+    )
+    assert response.status_code == 200, response.text
+    job_id = response.json()["job_id"]
+    await report_batches.jobs[job_id].task
+
+    # Another worker has no trace of the job in memory
+    report_batches.jobs.clear()
+
+    response = await client.get(f"/admin/report-card-batches/{job_id}", headers=admin_headers)
+    assert response.status_code == 200
+    assert response.json()["status"] == "completed"
+    assert response.json()["completed"] == 3
+
+    response = await client.get(f"/admin/report-card-batches/{job_id}/download", headers=admin_headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+    with zipfile.ZipFile(BytesIO(response.content)) as archive:
+        assert sorted(archive.namelist()) == [f"report_card_MAC/23/{number:04}.pdf" for number in range(3)]
+
+
+async def test_running_batch_on_another_worker_asks_to_retry(client, db, admin_headers):
+    db.add(ReportBatch(id="elsewhere", class_name="JSS1", session="2023/2024", term="First", output="zip", status="running", total=40))
+    await db.commit()
+
+    response = await client.get("/admin/report-card-batches/elsewhere", headers=admin_headers)
+    assert response.json()["status"] == "running"
+
+    response = await client.get("/admin/report-card-batches/elsewhere/download", headers=admin_headers)
+    assert response.status_code == 409
+    assert response.headers["retry-after"] == "5"
+
+
+async def test_unknown_batch_is_not_found(client, db, admin_headers):
+    response = await client.get("/admin/report-card-batches/missing", headers=admin_headers)
+    assert response.status_code == 404
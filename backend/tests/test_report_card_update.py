@@ -0,0 +1,94 @@
+from sqlalchemy import select
+from app.utils.models import ReportCard, SubjectScore, TeacherComment, ClassResult
+from tests.conftest import make_student, make_report_card, count_queries
+
+
+SUBJECTS = [f"Subject {number}" for number in range(15)]
+
+# Card, subjects and comments loaded once, one upsert each, then the
+# ranking refresh (one more statement when positions change)
+MAX_UPDATE_QUERIES = 17
+
+
+async def seed_class(db, cards: int = 3):
+    for number in range(cards):
+        admission_number = f"MAC/23/{number:04}"
+        db.add(make_student(admission_number))
+        db.add(make_report_card(f"card-{number}", admission_number, {subject: (20, 40 + number) for subject in SUBJECTS}))
+    await db.commit()
+
+
+def update_payload(**values) -> dict:
+    payload = {
+        "term": "First", "session": "2023/2024", "class_name": "JSS1", "position_in_class": None,
+        "total_students": None, "attendance": 100, "teacher_name": None,
+        "principal_name": None, "teacher_remark": None, "principal_remark": None,
+    }
+    payload.update(values)
+    return payload
+
+
+async def update_queries(client, headers, payload: dict) -> list:
+    with count_queries() as statements:
+        response = await client.put("/admin/report-cards/card-0", json=payload, headers=headers)
+    assert response.status_code == 200, response.text
+    # Only the statements of the update itself, not the admin lookup
+    return [statement for statement in statements if "FROM admin" not in statement]
+
+
+async def test_update_query_count_does_not_grow_with_subjects(client, db, admin_headers):
+    await seed_class(db)
+
+    one_subject = await update_queries(client, admin_headers, update_payload(
+        subjects=[{"subject_name": SUBJECTS[0], "exam_score": 70}],
+        comments=[{"comment_type": "Principal", "comment": "Good"}]
+    ))
+    all_subjects = await update_queries(client, admin_headers, update_payload(
+        subjects=[{"subject_name": subject, "exam_score": 75} for subject in SUBJECTS],
+        comments=[{"comment_type": "Principal", "comment": "Very good"}, {"comment_type": "Class Teacher", "comment": "Keep it up"}]
+    ))
+
+    assert len(one_subject) <= MAX_UPDATE_QUERIES
+    assert len(all_subjects) <= MAX_UPDATE_QUERIES
+
+    scores = (await db.scalars(select(SubjectScore.exam_score).where(SubjectScore.report_card_id == "card-0"))).all()
+    assert scores == [75] * len(SUBJECTS)
+    comments = (await db.scalars(select(TeacherComment.comment_type).where(TeacherComment.report_card_id == "card-0"))).all()
+    assert sorted(comments) == ["Class Teacher", "Principal"]
+
+
+async def test_unchanged_subjects_are_not_written(client, db, admin_headers):
+    await seed_class(db)
+
+    statements = await update_queries(client, admin_headers, update_payload(
+        subjects=[{"subject_name": subject, "ca_score": 20} for subject in SUBJECTS]
+    ))
+
+    assert not [statement for statement in statements if statement.startswith("INSERT INTO subject_scores")]
+
+
+async def test_null_fields_leave_the_card_unchanged(client, db, admin_headers):
+    await seed_class(db)
+    payload = {field: None for field in update_payload()}
+    payload["subjects"] = [{"subject_name": SUBJECTS[0], "exam_score": 100}]
+
+    response = await client.put("/admin/report-cards/card-0", json=payload, headers=admin_headers)
+    assert response.status_code == 200, response.text
+
+    card = (await db.execute(select(ReportCard).where(ReportCard.id == "card-0").execution_options(populate_existing=True))).scalar_one()
+    assert (card.class_name, card.session, card.term, card.attendance) == ("JSS1", "2023/2024", "First", 100)
+    # Card 0 had the lowest scores, the new exam score makes it first
+    assert card.position_in_class == 1
+
+
+async def test_moving_a_card_ranks_both_classes(client, db, admin_headers):
+    await seed_class(db)
+
+    response = await client.put("/admin/report-cards/card-2", json=update_payload(class_name="JSS2"), headers=admin_headers)
+    assert response.status_code == 200, response.text
+
+    positions = dict((await db.execute(select(ReportCard.id, ReportCard.position_in_class))).all())
+    assert positions == {"card-0": 2, "card-1": 1, "card-2": 1}
+
+    class_sizes = dict((await db.execute(select(ClassResult.class_name, ClassResult.total_students))).all())
+    assert class_sizes == {"JSS1": 2, "JSS2": 1}
@@ -0,0 +1,68 @@
+"""
+The large admin lists are built from plain rows and encoded with
+orjson (see app.utils.pagination). Their bodies must stay byte for
+byte what the pydantic path, page_response over the ORM objects,
+renders for the same page.
+"""
+
+from datetime import date
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+from app.utils.database import SessionLocal
+from app.utils.models import Student, ReportCard
+from app.utils.pagination import page_response, parse_fields
+from app.utils.schemas import StudentResponse, ReportCardResponse
+from app.utils.thumbnails import student_image_url
+from tests.conftest import make_student, make_report_card
+import pytest
+
+
+async def seed(db):
+    db.add(make_student("MAS23001", full_name="Adébáyọ̀ Ọkàfọ̀", profile_image_hash="ab" * 32, image_type="image/png"))
+    db.add(make_student("MAS23002", full_name='Ngozi "Zee" Eze', image_type="image/jpeg"))  # Legacy photo
+    db.add(make_student("MAS23003", date_admitted=date(2024, 1, 8), is_active=False))
+    for number, average in enumerate((66.66666666666667, 70.0, 0.1 + 0.2)):
+        card = make_report_card(
+            f"card-{number}", f"MAS2300{number + 1}",
+            {"Mathematics": (20, 50), "English": (25, 45), "Yorùbá": (30, 40)}
+        )
+        card.date_generated = date(2024, 1, number + 1)
+        card.total_score, card.average_score = 210, average
+        card.teacher_remark = None if number else "Ó dára púpọ̀ \U0001f44f"
+        db.add(card)
+    await db.commit()
+
+
+async def orm_page(query, schema, fields: str, prepare=lambda item: item) -> bytes:
+    """Body of the page rendered through the schema from ORM objects."""
+    async with SessionLocal() as db:
+        items = [prepare(item) for item in (await db.scalars(query)).all()]
+        return page_response(items, schema, parse_fields(fields, schema.model_fields)).body
+
+
+def with_image_url(student: Student) -> Student:
+    student.image_url = student_image_url(student)
+    return student
+
+
+@pytest.mark.parametrize("fields", [None, "admission_number,image_url", "full_name,date_admitted,is_active"])
+async def test_student_rows_match_the_schema(client, db, admin_headers, fields):
+    await seed(db)
+
+    response = await client.get("/admin/students", params={"fields": fields} if fields else None, headers=admin_headers)
+
+    query = select(Student).order_by(Student.date_admitted.desc(), Student.admission_number.desc())
+    assert response.content == await orm_page(query, StudentResponse, fields, with_image_url)
+
+
+@pytest.mark.parametrize("fields", [None, "id,term", "id,average_score,subjects,teacher_remark"])
+async def test_report_card_rows_match_the_schema(client, db, admin_headers, fields):
+    await seed(db)
+
+    response = await client.get("/admin/report-cards", params={"fields": fields} if fields else None, headers=admin_headers)
+
+    query = (
+        select(ReportCard).options(selectinload(ReportCard.subjects))
+        .order_by(ReportCard.date_generated.desc(), ReportCard.id.desc())
+    )
+    assert response.content == await orm_page(query, ReportCardResponse, fields)
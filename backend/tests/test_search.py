@@ -0,0 +1,59 @@
+from app.utils.models import News, ReadingMaterial
+from tests.conftest import make_student, png_image
+
+
+async def seed(db):
+    db.add(make_student("MAC/23/0001", full_name="Adebayo Okafor"))
+    db.add(make_student("MAC/23/0002", full_name="Adeola Bello"))
+    db.add(make_student("MAC/23/0003", full_name="Ngozi Eze"))
+    db.add(ReadingMaterial(id="material-1", title="Mathematics past questions", description="Algebra revision", subject="Mathematics", is_active=True))
+    db.add(News(id="news-1", title="Inter-house sports", content="Adebayo won the relay"))
+    await db.commit()
+
+
+async def search(client, headers, query: str, **params) -> list:
+    response = await client.get("/admin/search", params={"q": query, **params}, headers=headers)
+    assert response.status_code == 200, response.text
+    return [(result["type"], result["id"]) for result in response.json()]
+
+
+async def test_prefixes_match_as_you_type(client, db, admin_headers):
+    await seed(db)
+
+    assert await search(client, admin_headers, "ade") == [("student", "MAC/23/0001"), ("student", "MAC/23/0002"), ("news", "news-1")]
+    assert await search(client, admin_headers, "math past") == [("material", "material-1")]
+
+
+async def test_every_word_has_to_match(client, db, admin_headers):
+    await seed(db)
+
+    assert await search(client, admin_headers, "adebayo okafor") == [("student", "MAC/23/0001")]
+    assert await search(client, admin_headers, "adebayo geography") == []
+
+
+async def test_whole_words_and_titles_rank_first(client, db, admin_headers):
+    await seed(db)
+
+    # The student's name is a title match, the news only mentions it in the body
+    assert await search(client, admin_headers, "adebayo") == [("student", "MAC/23/0001"), ("news", "news-1")]
+
+
+async def test_types_and_limit(client, db, admin_headers):
+    await seed(db)
+
+    assert await search(client, admin_headers, "ade", types="news") == [("news", "news-1")]
+    assert len(await search(client, admin_headers, "ade", limit=1)) == 1
+
+
+async def test_new_rows_are_found_after_a_write(client, db, admin_headers):
+    await seed(db)
+    assert await search(client, admin_headers, "graduation") == []
+
+    response = await client.post(
+        "/admin/news",
+        data={"title": "Graduation ceremony", "content": "Parents are invited"},
+        files={"cover_image": ("cover.png", png_image(), "image/png")},
+        headers=admin_headers
+    )
+    assert response.status_code == 200, response.text
+    assert await search(client, admin_headers, "graduation") == [("news", response.json()["id"])]
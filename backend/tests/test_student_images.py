@@ -0,0 +1,51 @@
+from app.utils.responses import CACHE_IMMUTABLE_STUDENT_IMAGE, CACHE_STUDENT_IMAGE
+from tests.conftest import make_student, student_headers, png_image
+
+
+async def upload_photo(client, admin_headers, admission_number: str):
+    response = await client.put(
+        f"/admin/students/{admission_number}",
+        data={
+            "full_name": "Adebayo Okafor", "current_class": "JSS1", "guardian_name": "Guardian",
+            "guardian_phone": "08000000000", "guardian_email": "guardian@example.com", "is_active": "true"
+        },
+        files={"profile_image": ("photo.png", png_image(), "image/png")},
+        headers=admin_headers
+    )
+    assert response.status_code == 200, response.text
+    return response.json()["image_url"]
+
+
+async def test_student_responses_carry_a_versioned_image_url(client, db, admin_headers):
+    db.add(make_student("MAS23001"))
+    db.add(make_student("MAS23002"))
+    await db.commit()
+
+    image_url = await upload_photo(client, admin_headers, "MAS23001")
+    assert image_url.startswith("/admin/students/MAS23001/image?v=")
+
+    response = await client.get("/admin/students", headers=admin_headers)
+    assert {student["admission_number"]: student["image_url"] for student in response.json()} == {
+        "MAS23001": image_url, "MAS23002": None
+    }
+
+    response = await client.get("/admin/students?fields=admission_number,image_url", headers=admin_headers)
+    assert {"admission_number": "MAS23001", "image_url": image_url} in response.json()
+
+    for path in ("/students/me", "/students/me?summary=true"):
+        response = await client.get(path, headers=student_headers("MAS23001"))
+        assert response.json()["image_url"] == image_url
+
+
+async def test_versioned_image_urls_are_cached_for_good(client, db, admin_headers):
+    db.add(make_student("MAS23001"))
+    await db.commit()
+
+    image_url = await upload_photo(client, admin_headers, "MAS23001")
+
+    response = await client.get(f"{image_url}&size=small")
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == CACHE_IMMUTABLE_STUDENT_IMAGE
+
+    response = await client.get(image_url.split("?")[0])
+    assert response.headers["cache-control"] == CACHE_STUDENT_IMAGE